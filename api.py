@@ -0,0 +1,321 @@
+# api.py
+"""
+Headless HTTP API for retrieval, answering and ingestion.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+    (or: python api.py)
+
+Embedding, FAISS search, ingestion and LLM calls are blocking, so they run in
+a thread pool (config.API_WORKERS) and never on the event loop. At most
+config.API_MAX_CONCURRENCY requests are processed at once; up to
+config.API_MAX_QUEUE more wait for a slot and anything beyond that is
+rejected with 503. LLM_PROVIDER=fake swaps Groq for the local stub so
+throughput can be measured offline.
+
+Ingests go through the persistent job queue shared with the UI
+(utils.ingest_jobs): POST /ingest waits for its job unless "wait": false,
+GET /jobs[/{id}] reports progress and POST /jobs/{id}/cancel stops one.
+Only files below config.API_INGEST_ROOTS can be ingested, and a waiting
+/ingest gives its admission slot back once the job is queued.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, SystemMessage
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from config import config
+from models.llm import get_chat_model
+from utils.answer_cache import get_answer_cache
+from utils.collection import DEFAULT_COLLECTION, list_collections, validate_collection
+from utils.filters import make_filters
+from utils.ingest_jobs import CANCELLED, FAILED, FINISHED, QUEUED, RUNNING, get_job_queue
+from utils.response_formatter import build_system_prompt, clean_response
+from utils.tracing import span, traced
+from utils.warmup import get_warmup_status, start_warmup
+from utils.retriever import (
+    embed_queries,
+    get_index_version,
+    retrieve_collections,
+)
+
+
+# -------------------------------------------------
+# Request / response models
+# -------------------------------------------------
+class RetrieveRequest(BaseModel):
+    query: str
+    k: Optional[int] = Field(default=None, ge=1, le=50)
+    collections: Optional[List[str]] = None   # None / empty = all collections
+    doc_ids: Optional[List[str]] = None       # metadata filters, applied inside FAISS
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
+
+
+class AnswerRequest(RetrieveRequest):
+    mode: Literal["concise", "detailed"] = "concise"
+    use_cache: bool = True
+
+
+class IngestRequest(BaseModel):
+    paths: List[str]
+    incremental: bool = True
+    prune: bool = False
+    collection: str = DEFAULT_COLLECTION
+    wait: bool = True   # False: return the queued job at once and poll GET /jobs/{id}
+
+
+# -------------------------------------------------
+# Admission control
+# -------------------------------------------------
+class AdmissionController:
+    """
+    Bounds in-flight work: `limit` requests run at once, `max_waiting` more
+    may queue for a slot, everything beyond that is rejected immediately.
+    """
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self._sem = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_waiting and self._sem.locked():
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, retry later.", headers={"Retry-After": "1"})
+
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._sem.release()
+
+
+# -------------------------------------------------
+# Blocking work (runs in the executor)
+# -------------------------------------------------
+_chat_model_lock = threading.Lock()
+_chat_model = [None]
+
+
+def _get_chat_model():
+    with _chat_model_lock:
+        if _chat_model[0] is None:
+            _chat_model[0] = get_chat_model()
+        return _chat_model[0]
+
+
+@traced("api_retrieve")
+def _retrieve_sync(req: RetrieveRequest) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        for collection in req.collections or []:
+            validate_collection(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = make_filters(req.doc_ids, req.ingested_after, req.ingested_before)
+
+    query_vec = embed_queries([req.query])[0]
+    searched: Dict[str, Any] = {}
+    try:
+        retrieved = retrieve_collections(
+            req.query, req.collections, k=req.k, query_vector=query_vec, filters=filters, snapshots=searched
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=409, detail=f"Index not found — ingest documents first. ({e})")
+    return {
+        "results": retrieved,
+        "query_vec": query_vec,
+        "snapshots": searched,
+        "retrieve_seconds": time.perf_counter() - t0,
+    }
+
+
+@traced("api_answer")
+def _answer_sync(req: AnswerRequest) -> Dict[str, Any]:
+    found = _retrieve_sync(req)
+    retrieved, query_vec = found["results"], found["query_vec"]
+    timings = {"retrieve": found["retrieve_seconds"]}
+
+    answer_cache = None
+    chunk_ids = [(r["collection"], r["doc_id"], r["chunk_id"]) for r in retrieved]
+    if req.use_cache and config.ANSWER_CACHE_ENABLED and retrieved:
+        answer_cache = get_answer_cache()
+        # the snapshots the answer is built from, not whatever is published by now
+        index_version = get_index_version(snapshots=found["snapshots"])
+        cached = answer_cache.get(query_vec, chunk_ids, index_version, variant=req.mode)
+        if cached is not None:
+            return {"answer": cached, "cached": True, "snippets": retrieved, "timings": timings}
+
+    context_stats: Dict[str, int] = {}
+    system_prompt = build_system_prompt(retrieved, stats=context_stats)
+    if req.mode == "concise":
+        system_prompt += "\nRespond concisely."
+    else:
+        system_prompt += "\nProvide a detailed explanation."
+
+    t0 = time.perf_counter()
+    try:
+        chat_model = _get_chat_model()
+        with span("llm", streamed=False):
+            response = chat_model.invoke([SystemMessage(content=system_prompt), HumanMessage(content=req.query)])
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error generating response: {e}")
+    timings["llm"] = time.perf_counter() - t0
+
+    answer = clean_response(response.content)
+    if answer_cache is not None:
+        answer_cache.put(query_vec, chunk_ids, index_version, answer, variant=req.mode)
+
+    return {"answer": answer, "cached": False, "snippets": retrieved, "timings": timings, "context": context_stats}
+
+
+def _allowed_path(path: str) -> Optional[str]:
+    """Resolved `path` if it lies inside one of config.API_INGEST_ROOTS, else None."""
+    resolved = os.path.realpath(path)
+    for root in config.API_INGEST_ROOTS:
+        root = os.path.realpath(root)
+        if os.path.commonpath([resolved, root]) == root:
+            return resolved
+    return None
+
+
+@traced("api_ingest")
+def _ingest_sync(req: IngestRequest) -> Dict[str, Any]:
+    """Validate and queue the ingest; returns the queued job."""
+    resolved = [_allowed_path(p) for p in req.paths]
+    outside = [p for p, r in zip(req.paths, resolved) if r is None]
+    if outside:
+        raise HTTPException(status_code=400, detail=f"Paths outside the ingest roots: {outside}")
+    missing = [p for p in resolved if not os.path.isfile(p)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Files not found: {missing}")
+    try:
+        validate_collection(req.collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # queries keep being served from the published collections while the job runs
+    return get_job_queue().submit(resolved, collection=req.collection, incremental=req.incremental, prune=req.prune)
+
+
+def _job_sync(job_id: int, cancel: bool = False) -> Dict[str, Any]:
+    queue = get_job_queue()
+    job = queue.cancel(job_id) if cancel else queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job {job_id}.")
+    return job
+
+
+# -------------------------------------------------
+# App
+# -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.executor = ThreadPoolExecutor(max_workers=config.API_WORKERS or os.cpu_count() or 4)
+    app.state.admission = AdmissionController(config.API_MAX_CONCURRENCY, config.API_MAX_QUEUE)
+    if config.WARMUP_ENABLED:
+        start_warmup()
+    get_job_queue()   # starts this process's ingest worker
+    try:
+        yield
+    finally:
+        app.state.executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Compliance Helper API", lifespan=lifespan)
+
+
+async def _run(fn, *args):
+    """Admission-controlled call of a blocking function in the shared executor."""
+    async with app.state.admission.slot():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(app.state.executor, partial(fn, *args))
+
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    admission = app.state.admission
+    return {
+        "status": "ok",
+        "llm_provider": config.LLM_PROVIDER,
+        "running": admission.running,
+        "waiting": admission.waiting,
+        "rejected": admission.rejected,
+        "warmup": get_warmup_status(),
+        "collections": list_collections(),
+        "ingest_jobs": {state: n for state, n in get_job_queue().counts().items() if state in (QUEUED, RUNNING)},
+    }
+
+
+@app.post("/retrieve")
+async def retrieve_endpoint(req: RetrieveRequest) -> Dict[str, Any]:
+    found = await _run(_retrieve_sync, req)
+    return {"results": found["results"], "timings": {"retrieve": found["retrieve_seconds"]}}
+
+
+@app.post("/answer")
+async def answer_endpoint(req: AnswerRequest) -> Dict[str, Any]:
+    return await _run(_answer_sync, req)
+
+
+@app.post("/ingest")
+async def ingest_endpoint(req: IngestRequest) -> Dict[str, Any]:
+    job = await _run(_ingest_sync, req)
+    if not req.wait:
+        return {"job": job}
+
+    # the slot is released by now: an ingest can take minutes and must not starve queries
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+    while job["state"] not in FINISHED:
+        await asyncio.sleep(config.INGEST_JOB_POLL_SECONDS)
+        job = await loop.run_in_executor(app.state.executor, queue.get, job["id"])
+
+    if job["state"] == FAILED:
+        raise HTTPException(status_code=400, detail=job["error"])
+    if job["state"] == CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Ingest job {job['id']} was cancelled.")
+    return job["stats"]
+
+
+@app.get("/jobs")
+async def jobs_endpoint(limit: int = 20, collection: Optional[str] = None) -> Dict[str, Any]:
+    return {"jobs": await _run(partial(get_job_queue().list_jobs, limit=limit, collection=collection))}
+
+
+@app.get("/jobs/{job_id}")
+async def job_endpoint(job_id: int) -> Dict[str, Any]:
+    return await _run(_job_sync, job_id)
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: int) -> Dict[str, Any]:
+    return await _run(_job_sync, job_id, True)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
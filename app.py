@@ -2,45 +2,248 @@
 import streamlit as st
 import os
 import sys
+import time
+from datetime import timedelta
 from pathlib import Path
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 # Local imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), './')))
-from models.llm import get_chatgroq_model
-from utils.response_formatter import build_system_prompt
-from utils.retriever import load_index_and_meta, retrieve
-from utils.ingest import index_documents
+from models.llm import get_chat_model
+from utils.answer_cache import get_answer_cache
+from utils.history import compact_history, format_summary, new_history_state
+from utils.tracing import span, start_trace
+from utils.warmup import start_warmup
+from utils.response_formatter import build_system_prompt, clean_response
+from utils.collection import DEFAULT_COLLECTION, list_collections
+from utils.filters import make_filters
+from utils.retriever import (
+    embed_queries,
+    get_documents,
+    get_index_and_meta,
+    get_index_version,
+    retrieve_collections,
+)
+from utils.ingest_jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, get_job_queue
 from config import config
 
 
 # -------------------------------------------------
 # Function to call LLM with system + conversation
 # -------------------------------------------------
+def _to_langchain_messages(messages, system_prompt):
+    formatted = [SystemMessage(content=system_prompt)]
+
+    for msg in messages:
+        if msg["role"] == "user":
+            formatted.append(HumanMessage(content=msg["content"]))
+        else:
+            formatted.append(AIMessage(content=msg["content"]))
+
+    return formatted
+
+
 def get_chat_response(chat_model, messages, system_prompt):
     try:
-        formatted = [SystemMessage(content=system_prompt)]
-
-        for msg in messages:
-            if msg["role"] == "user":
-                formatted.append(HumanMessage(content=msg["content"]))
-            else:
-                formatted.append(AIMessage(content=msg["content"]))
+        formatted = _to_langchain_messages(messages, system_prompt)
 
         response = chat_model.invoke(formatted)
-        text = response.content
+        return clean_response(response.content)
 
-        # Optional cleanup
-        # Remove accidental repeated newlines, parentheses, messy chunks
-        import re
-        text = re.sub(r"\s{3,}", "\n\n", text)
-        text = re.sub(r"\((Snippet ID.*?)\)", "", text)
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
 
-        return text
+
+def stream_chat_response(chat_model, messages, system_prompt, timings):
+    """
+    Yield raw answer text as it streams from the model.
+    Fills `timings` with time_to_first_token and total (seconds),
+    plus error (message) if generation failed.
+    """
+    start = time.perf_counter()
+    try:
+        formatted = _to_langchain_messages(messages, system_prompt)
+
+        for chunk in chat_model.stream(formatted):
+            if not chunk.content:
+                continue
+            if "time_to_first_token" not in timings:
+                timings["time_to_first_token"] = time.perf_counter() - start
+            yield chunk.content
 
     except Exception as e:
-        return f"Error generating response: {str(e)}"
+        timings["error"] = str(e)
+        yield f"Error generating response: {str(e)}"
+
+    finally:
+        timings["total"] = time.perf_counter() - start
+
+
+def render_streamed_response(chat_model, messages, system_prompt):
+    """
+    Render tokens into the current chat message as they arrive (cleanup is
+    re-applied to the partial text) and return (final_text, timings).
+    """
+    timings = {}
+    placeholder = st.empty()
+    buffer = ""
+    last_render = 0.0
+
+    for delta in stream_chat_response(chat_model, messages, system_prompt, timings):
+        buffer += delta
+        now = time.perf_counter()
+        if now - last_render > 0.05:  # throttle re-renders
+            placeholder.markdown(clean_response(buffer) + "▌")
+            last_render = now
+
+    text = clean_response(buffer)
+    placeholder.markdown(text)
+    return text, timings
+
+
+def render_stage_timings(panel, breakdown):
+    """Per-stage table of the last traced chat turn (see utils.tracing)."""
+    with panel.container():
+        if not breakdown:
+            st.caption("No traced query yet.")
+            return
+        st.table([
+            {
+                "stage": "\u00a0\u00a0" * row["depth"] + row["stage"],
+                "ms": f"{row['ms']:.1f}",
+                "share": f"{row['share']:.0%}",
+            }
+            for row in breakdown
+        ])
+
+
+# -------------------------------------------------
+# One chat turn: retrieve -> prompt -> LLM (traced per stage)
+# -------------------------------------------------
+def answer_prompt(prompt, chat_model, mode, max_k, collections=None, filters=None):
+    st.session_state.messages.append({"role": "user", "content": prompt})
+    with st.chat_message("user"):
+        st.markdown(prompt)
+
+    # Make sure the indexes exist (shared across sessions, reloaded only when files change)
+    try:
+        with span("index_load"):
+            collections = collections or list_collections()
+            if not collections:
+                raise FileNotFoundError("FAISS index missing. Build index first.")
+            for collection in collections:
+                get_index_and_meta(collection)
+    except Exception as e:
+        st.error(f"Index not found — please upload documents and build index first. ({e})")
+        return
+
+    # Retrieval
+    query_vec = None
+    searched = {}   # snapshot of each collection the answer is built from
+    with st.spinner("Retrieving relevant policy snippets..."):
+        try:
+            with span("embed_query"):
+                query_vec = embed_queries([prompt])[0]
+            with span("retrieve", k=max_k, collections=len(collections), filtered=filters is not None):
+                retrieved = retrieve_collections(
+                    prompt, collections, k=max_k, query_vector=query_vec, filters=filters,
+                    snapshots=searched,
+                )
+        except Exception as e:
+            st.error(f"Retrieval error: {str(e)}")
+            retrieved = []
+
+    # Semantic answer cache: same chunks + near-identical question -> skip the LLM
+    answer_cache = None
+    cached_answer = None
+    chunk_ids = [(r["collection"], r["doc_id"], r["chunk_id"]) for r in retrieved]
+    if config.ANSWER_CACHE_ENABLED and retrieved and query_vec is not None:
+        try:
+            with span("answer_cache_lookup") as s:
+                answer_cache = get_answer_cache()
+                index_version = get_index_version(snapshots=searched)
+                cached_answer = answer_cache.get(query_vec, chunk_ids, index_version, variant=mode)
+                s.set(hit=cached_answer is not None)
+        except Exception as e:
+            answer_cache = None
+            st.warning(f"Answer cache unavailable: {e}")
+
+    # Build the strict system prompt
+    context_stats = {}
+    with span("prompt_build") as s:
+        system_prompt = build_system_prompt(retrieved, stats=context_stats)
+
+        if mode == "concise":
+            system_prompt += "\nRespond concisely."
+        else:
+            system_prompt += "\nProvide a detailed explanation."
+        s.set(context_tokens=context_stats.get("tokens_out", 0))
+
+    # Last turns verbatim + rolling summary of older ones (bounded tokens)
+    history = st.session_state.messages
+    if cached_answer is None and chat_model:
+        with span("history"):
+            history, summary = compact_history(
+                st.session_state.messages, st.session_state.history_state, chat_model
+            )
+            system_prompt += format_summary(summary)
+
+    # LLM Response
+    with st.chat_message("assistant"):
+        if cached_answer is not None:
+            response_text = cached_answer
+            st.markdown(response_text)
+            st.caption("Served from the answer cache (same snippets, similar question).")
+        elif not chat_model:
+            st.error("LLM not available. Check GROQ_API_KEY and model setup.")
+            return
+        elif config.STREAM_RESPONSES:
+            with span("llm", streamed=True) as s:
+                response_text, timings = render_streamed_response(
+                    chat_model, history, system_prompt
+                )
+                if "time_to_first_token" in timings:
+                    s.set(time_to_first_token_ms=timings["time_to_first_token"] * 1000)
+            st.session_state.last_llm_timings = timings
+            if "time_to_first_token" in timings:
+                st.caption(
+                    f"First token after {timings['time_to_first_token']:.2f}s · "
+                    f"full answer in {timings['total']:.2f}s"
+                )
+            if answer_cache is not None and "error" not in timings:
+                answer_cache.put(query_vec, chunk_ids, index_version, response_text, variant=mode)
+        else:
+            with st.spinner("Generating answer..."), span("llm", streamed=False):
+                response_text = get_chat_response(chat_model, history, system_prompt)
+                st.markdown(response_text)
+            if answer_cache is not None and not response_text.startswith("Error generating response"):
+                answer_cache.put(query_vec, chunk_ids, index_version, response_text, variant=mode)
+
+    st.session_state.messages.append({"role": "assistant", "content": response_text})
+
+    # Show retrieved snippets
+    st.markdown("---")
+    st.subheader("📌 Retrieved Policy Snippets")
+
+    if not retrieved:
+        st.write("No snippets retrieved.")
+    else:
+        st.caption(
+            f"Prompt context: {context_stats['tokens_out']} tokens from "
+            f"{context_stats['snippets_out']}/{context_stats['snippets_in']} snippets "
+            f"({context_stats['tokens_in']} before merging overlaps and budgeting)"
+        )
+        for r in retrieved:
+            where = "" if r["collection"] == DEFAULT_COLLECTION else f" _({r['collection']})_"
+            st.markdown(
+                f"**{r['doc_id']}#{r['chunk_id']}**{where} — score: {r['score']:.3f} "
+                f"(similarity: {r['semantic_score']:.3f}, lexical: {r['lexical_score']:.2f})"
+            )
+            if r.get("aliases"):
+                st.caption("Also in: " + ", ".join(f"{a['doc_id']}#{a['chunk_id']}" for a in r["aliases"]))
+            snippet = r["text"]
+            st.write(snippet[:1000] + ("..." if len(snippet) > 1000 else ""))
 
 
 # -------------------------------------------------
@@ -68,21 +271,73 @@ def instructions_page():
     st.markdown("---")
 
 
+_JOB_ICONS = {QUEUED: "⏳", RUNNING: "🔄", DONE: "✅", FAILED: "❌", CANCELLED: "⏹️"}
+
+
+def render_ingest_jobs():
+    """Recent background ingest jobs (all sessions) with progress and a cancel button."""
+    queue = get_job_queue()
+    jobs = queue.list_jobs(limit=5)
+    if not jobs:
+        return
+
+    st.caption("Ingest jobs")
+    for job in jobs:
+        p = job["progress"]
+        st.markdown(
+            f"{_JOB_ICONS[job['state']]} **#{job['id']}** → '{job['collection']}' "
+            f"({len(job['paths'])} files) — {job['state']}"
+        )
+
+        if job["state"] == RUNNING:
+            total = p.get("files_total") or 0
+            st.progress(p.get("files_done", 0) / total if total else 0.0, text=p.get("stage", "starting"))
+            st.caption(
+                f"{p.get('files_done', 0)}/{total} files, {p.get('pages', 0)} pages, "
+                f"{p.get('chunks', 0)} chunks, {p.get('batches', 0)} batches embedded"
+            )
+        elif job["state"] == DONE:
+            stats = job["stats"]
+            st.caption(
+                f"Indexed {stats['total_chunks']} chunks "
+                f"({stats['chunks_embedded']} chunks embedded, "
+                f"{stats['embedding_cache_hits']} of them from the embedding cache, "
+                f"{stats['docs_unchanged']} unchanged files skipped, "
+                f"{stats['chunks_deduplicated']} near-duplicate chunks aliased) in {stats['seconds']:.1f}s"
+            )
+            for name, info in stats["files"].items():
+                if info["error"]:
+                    st.warning(f"Could not extract {name}: {info['error']}")
+        elif job["state"] == FAILED:
+            st.error(f"Indexing failed: {job['error']}")
+
+        if job["state"] in (QUEUED, RUNNING):
+            if job["cancel_requested"]:
+                st.caption("Cancelling...")
+            elif st.button("Cancel", key=f"cancel-job-{job['id']}"):
+                queue.cancel(job["id"])
+
+    if not hasattr(st, "fragment"):
+        st.button("Refresh jobs")
+
+
+# Older Streamlit has no fragments: the panel then refreshes on the next rerun / "Refresh jobs"
+if hasattr(st, "fragment"):
+    render_ingest_jobs_live = st.fragment(run_every=config.INGEST_JOB_POLL_SECONDS)(render_ingest_jobs)
+else:
+    render_ingest_jobs_live = render_ingest_jobs
+
+
 # -------------------------------------------------
 # Main Chat Page
 # -------------------------------------------------
 def chat_page():
     st.title("🤖 Compliance Helper — Policy RAG Assistant")
 
-    # Initialize LLM
-    try:
-        chat_model = get_chatgroq_model()
-    except Exception as e:
-        chat_model = None
-        st.error(f"LLM initialization failed: {e}")
-
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "history_state" not in st.session_state:
+        st.session_state.history_state = new_history_state()
 
     # Sidebar
     with st.sidebar:
@@ -94,6 +349,26 @@ def chat_page():
             type=["pdf", "txt"]
         )
 
+        target_collection = st.text_input(
+            "Collection",
+            value=DEFAULT_COLLECTION,
+            help="Documents are indexed into this collection; other collections stay queryable while it rebuilds.",
+        ).strip() or DEFAULT_COLLECTION
+
+        incremental = st.checkbox(
+            "Incremental update (only embed new/changed files)",
+            value=False,
+            help="Unchecked: full rebuild from the uploaded files.",
+        )
+        prune = st.checkbox(
+            "Remove files not uploaded",
+            value=False,
+            disabled=not incremental,
+            help="Incremental only: drop indexed files that are not part of this upload.",
+        )
+        if incremental and not prune:
+            st.caption("Files indexed earlier but not uploaded now stay in the index.")
+
         if st.button("Build index"):
             if not uploaded:
                 st.error("Please upload at least one document.")
@@ -108,18 +383,49 @@ def chat_page():
                         fh.write(f.read())
                     file_paths.append(str(out_path))
 
+                # runs in the background worker; this session (and every other) keeps answering meanwhile
                 try:
-                    with st.spinner("Indexing... Please wait."):
-                        _, meta = index_documents(file_paths, save_index=True)
-                    st.success(f"Indexed {len(meta)} chunks from {len(file_paths)} files!")
+                    job = get_job_queue().submit(
+                        file_paths, collection=target_collection, incremental=incremental, prune=incremental and prune
+                    )
+                    st.info(f"Queued ingest job #{job['id']} for '{target_collection}'.")
                 except Exception as e:
                     st.error(f"Indexing failed: {str(e)}")
 
+        render_ingest_jobs_live()
+
         st.markdown("---")
         st.header("⚙️ Settings")
 
         mode = st.radio("Response mode", ["concise", "detailed"], index=0)
 
+        available = list_collections()
+        collections = st.multiselect(
+            "Search collections",
+            available,
+            default=available,
+            help="Queried in parallel; leave empty to search all.",
+        )
+
+        doc_names = set()
+        for collection in collections or available:
+            try:
+                doc_names.update(d["doc_id"] for d in get_documents(collection))
+            except Exception:
+                pass   # index missing or being rebuilt; the chat turn reports it
+        doc_filter = st.multiselect(
+            "Only search these documents",
+            sorted(doc_names),
+            help="Filtered inside FAISS; leave empty to search every document.",
+        )
+        ingested = st.date_input("Ingested between", value=(), help="Optional ingest-date range.")
+        ingested = tuple(ingested) if isinstance(ingested, (list, tuple)) else (ingested,)
+        filters = make_filters(
+            doc_ids=doc_filter,
+            ingested_after=ingested[0] if len(ingested) == 2 else None,
+            ingested_before=ingested[1] + timedelta(days=1) if len(ingested) == 2 else None,
+        )
+
         max_k = st.slider(
             "Snippets to retrieve (k)",
             min_value=1,
@@ -131,8 +437,12 @@ def chat_page():
 
         if st.button("Clear chat"):
             st.session_state.messages = []
+            st.session_state.history_state = new_history_state()
             return
 
+        show_stage_timings = st.checkbox("Show stage timings (last query)", value=False)
+        timings_panel = st.empty()
+
     # Chat history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -142,56 +452,20 @@ def chat_page():
     prompt = st.chat_input("Ask your compliance question...")
 
     if prompt:
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-
-        # Make sure index exists
-        try:
-            index, metadata = load_index_and_meta()
-        except Exception as e:
-            st.error(f"Index not found — please upload documents and build index first. ({e})")
-            return
-
-        # Retrieval
-        with st.spinner("Retrieving relevant policy snippets..."):
+        with start_trace("chat_turn", mode=mode, k=max_k, collections=len(collections)) as trace:
+            # Initialize LLM (on first question, so its import does not delay the first render)
             try:
-                retrieved = retrieve(prompt, index, metadata, k=max_k)
+                chat_model = get_chat_model()
             except Exception as e:
-                st.error(f"Retrieval error: {str(e)}")
-                retrieved = []
-
-        # Build the strict system prompt
-        system_prompt = build_system_prompt(retrieved)
-
-        if mode == "concise":
-            system_prompt += "\nRespond concisely."
-        else:
-            system_prompt += "\nProvide a detailed explanation."
-
-        # LLM Response
-        with st.chat_message("assistant"):
-            with st.spinner("Generating answer..."):
-                if not chat_model:
-                    st.error("LLM not available. Check GROQ_API_KEY and model setup.")
-                    return
-
-                response_text = get_chat_response(chat_model, st.session_state.messages, system_prompt)
-                st.markdown(response_text)
+                chat_model = None
+                st.error(f"LLM initialization failed: {e}")
 
-        st.session_state.messages.append({"role": "assistant", "content": response_text})
+            answer_prompt(prompt, chat_model, mode, max_k, collections, filters)
+        if trace is not None:
+            st.session_state.last_trace = trace.breakdown()
 
-        # Show retrieved snippets
-        st.markdown("---")
-        st.subheader("📌 Retrieved Policy Snippets")
-
-        if not retrieved:
-            st.write("No snippets retrieved.")
-        else:
-            for r in retrieved:
-                st.markdown(f"**{r['doc_id']}#{r['chunk_id']}** — similarity: {r['score']:.3f}")
-                snippet = r["text"]
-                st.write(snippet[:1000] + ("..." if len(snippet) > 1000 else ""))
+    if show_stage_timings:
+        render_stage_timings(timings_panel, st.session_state.get("last_trace"))
 
 
 # -------------------------------------------------
@@ -204,6 +478,10 @@ def main():
         layout="wide"
     )
 
+    # Load index + embedding model in the background while the page renders
+    if config.WARMUP_ENABLED:
+        start_warmup()
+
     with st.sidebar:
         st.title("Navigation")
         page = st.radio("Go to:", ["Chat", "Instructions"], index=0)
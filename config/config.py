@@ -78,17 +78,100 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 # Embedding model
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
+# Embedding backend: torch (sentence-transformers) | onnx | onnx-int8
+# ONNX models are created by scripts/export_onnx_embeddings.py
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", str(DATA_DIR / "onnx" / "all-MiniLM-L6-v2"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))        # intra-op threads, 0 = runtime default
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
 # LLM model: switched from Gemini Flash → Groq LLaMA 3.1
 # Available Groq models include:
 # - llama-3.1-8b-instant
 # - llama-3.1-70b-versatile
 LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
 
+# "groq" = ChatGroq, "fake" = local FakeStreamingChatModel (offline testing)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+FAKE_LLM_FIRST_TOKEN_DELAY = float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.2"))  # seconds
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))              # seconds
+
+# Stream answer tokens into the chat UI as they arrive
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Semantic answer cache: reuse an answer when a similar question (cosine >=
+# threshold) retrieved the same chunks; cleared whenever the index is rebuilt
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", str(DATA_DIR / "answer_cache.sqlite"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "604800"))  # 7 days, 0 = no expiry
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# Load index + embedding model in a background thread at start-up
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
 # ----------------------------
 # VECTOR STORE / FILE PATHS
 # ----------------------------
 VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", str(DATA_DIR / "faiss.index"))
 METADATA_PATH = os.getenv("METADATA_PATH", str(DATA_DIR / "metadata.json"))
+VECTORS_PATH = os.getenv("VECTORS_PATH", str(DATA_DIR / "vectors.f32"))  # raw float32 rows
+
+# Chunk metadata format: "binary" = memory-mapped store in CHUNK_STORE_DIR
+# (text decoded lazily per hit), "json" = legacy METADATA_PATH list
+METADATA_FORMAT = os.getenv("METADATA_FORMAT", "binary").lower()
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", str(DATA_DIR / "chunks"))
+BM25_PATH = os.getenv("BM25_PATH", str(DATA_DIR / "bm25"))  # lexical inverted index (.npy dir)
+
+# Collections: the paths above are the "default" collection; every other
+# collection keeps the same set of files in COLLECTIONS_DIR/<name>/
+COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", str(DATA_DIR / "collections"))
+
+# Published indexes are versioned snapshots (index + metadata + vectors + BM25 + manifest)
+# switched by an atomic pointer; the default collection's live in SNAPSHOTS_DIR, the
+# others' in COLLECTIONS_DIR/<name>/snapshots. The flat paths above are read only
+# until a collection's first snapshot.
+SNAPSHOTS_DIR = os.getenv("SNAPSHOTS_DIR", str(DATA_DIR / "snapshots"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))                        # retired versions kept for rollback
+SNAPSHOT_GRACE_SECONDS = float(os.getenv("SNAPSHOT_GRACE_SECONDS", "300"))  # before a retired version may be deleted
+
+# Persistent embedding cache used during ingestion (SQLite, LRU-evicted)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(DATA_DIR / "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# ----------------------------
+# FAISS INDEX TYPE
+# flat = exact brute force, ivf = IVF-Flat (trained), hnsw = HNSW graph
+# ----------------------------
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))           # clamped to ~n/39 for small corpora
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))           # lists scanned per query
+
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))   # candidates explored per query
+
+# Vector storage inside the index: none (float32) | fp16 | sq8 | pq | auto
+# auto = most precise encoding whose estimated size fits MAX_INDEX_MEMORY_MB
+INDEX_COMPRESSION = os.getenv("INDEX_COMPRESSION", "auto").lower()
+MAX_INDEX_MEMORY_MB = int(os.getenv("MAX_INDEX_MEMORY_MB", "1024"))
+PQ_M = int(os.getenv("PQ_M", "48"))                        # sub-quantizers (384 / 48 = 8 dims each)
+
+# Compressed indexes: over-fetch RERANK_FACTOR x candidates and re-score them
+# exactly against the full-precision vectors kept on disk (memory-mapped)
+EXACT_RERANK = os.getenv("EXACT_RERANK", "true").lower() == "true"
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+
+# Training sample for IVF / PQ / SQ and block size for index.add,
+# so indexes can be built from a memory-mapped vector file of any size
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", "100000"))
+INDEX_ADD_BLOCK = int(os.getenv("INDEX_ADD_BLOCK", "65536"))
+
+# recall@k vs exact search, printed after building an approximate index
+RECALL_REPORT_K = int(os.getenv("RECALL_REPORT_K", "10"))
+RECALL_REPORT_QUERIES = int(os.getenv("RECALL_REPORT_QUERIES", "200"))
 
 # ----------------------------
 # CHUNKING PARAMETERS
@@ -97,10 +180,79 @@ METADATA_PATH = os.getenv("METADATA_PATH", str(DATA_DIR / "metadata.json"))
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1200"))         # characters
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))    # characters
 
+# ----------------------------
+# INGEST PARALLELISM
+# ----------------------------
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))          # 0 = os.cpu_count()
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))  # page range per worker task
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))    # chunks per embed/add/write batch
+
+# ----------------------------
+# BACKGROUND INGEST JOBS (persistent queue shared by the UI and the API)
+# ----------------------------
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", str(DATA_DIR / "ingest_jobs.sqlite"))
+INGEST_JOB_POLL_SECONDS = float(os.getenv("INGEST_JOB_POLL_SECONDS", "1.0"))  # worker idle poll / UI refresh
+INGEST_JOBS_KEEP = int(os.getenv("INGEST_JOBS_KEEP", "200"))                  # finished jobs kept for display
+
+# ----------------------------
+# NEAR-DUPLICATE CHUNKS (MinHash + LSH, binary metadata only)
+# duplicates are not embedded / indexed but recorded as aliases of the kept chunk
+# ----------------------------
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))   # estimated Jaccard of word shingles
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))        # signature length (stored per chunk)
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "8"))               # LSH bands, must divide DEDUP_NUM_PERM
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))  # words per shingle
+
 # ----------------------------
 # RETRIEVAL CONFIG
 # ----------------------------
 MAX_RETRIEVALS = int(os.getenv("MAX_RETRIEVALS", "8"))
+COLLECTION_SEARCH_WORKERS = int(os.getenv("COLLECTION_SEARCH_WORKERS", "0"))  # fan-out threads, 0 = auto
+
+# Prompt context: adjacent chunks are merged (shared overlap sent once) and
+# the snippet section is capped at CONTEXT_TOKEN_BUDGET tokens (0 = unlimited)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")     # tiktoken encoding
+CONTEXT_MIN_OVERLAP = int(os.getenv("CONTEXT_MIN_OVERLAP", "20"))     # chars; shorter matches are kept
+CONTEXT_MIN_TAIL_TOKENS = int(os.getenv("CONTEXT_MIN_TAIL_TOKENS", "40"))  # drop smaller truncated tails
+
+# Hybrid retrieval: BM25 channel fused with FAISS by reciprocal rank fusion
+BM25_ENABLED = os.getenv("BM25_ENABLED", "true").lower() == "true"
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# ----------------------------
+# CONVERSATION HISTORY
+# last HISTORY_KEEP_TURNS turns are sent verbatim, older ones as a rolling summary
+# ----------------------------
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+HISTORY_SUMMARY_REFRESH_TURNS = int(os.getenv("HISTORY_SUMMARY_REFRESH_TURNS", "2"))  # re-summarize every N aged-out turns
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "1500"))  # summary + messages, 0 = unlimited
+
+# ----------------------------
+# HTTP API (api.py)
+# ----------------------------
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "0"))                # executor threads, 0 = os.cpu_count()
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))  # requests processed at once
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))           # waiting requests before 503
+# POST /ingest only accepts files below these directories (comma-separated)
+API_INGEST_ROOTS = [
+    p.strip() for p in os.getenv("API_INGEST_ROOTS", str(DATA_DIR / "uploaded")).split(",") if p.strip()
+]
+
+# ----------------------------
+# TRACING
+# per-stage spans for chat turns, retrieval, ingestion and API calls
+# ----------------------------
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")        # e.g. data/traces.jsonl, "" = off
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # e.g. http://localhost:4318/v1/traces
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "compliance-helper")
 
 # ----------------------------
 # WEB SEARCH FALLBACK (optional)
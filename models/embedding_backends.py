@@ -0,0 +1,183 @@
+# models/embedding_backends.py
+"""
+Interchangeable encoders for all-MiniLM-L6-v2, selected by config.EMBEDDING_BACKEND:
+
+  torch      sentence-transformers on PyTorch (reference)
+  onnx       the same transformer exported to ONNX, run with ONNX Runtime
+  onnx-int8  the ONNX export with dynamically int8-quantized weights
+
+All return L2-normalized float32 vectors of the same dimension, so any backend
+can query an index built by another. Maximum observed deviation from the torch
+vectors (1 - cosine) allowed by scripts/export_onnx_embeddings.py:
+COSINE_TOLERANCE below.
+"""
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from config import config
+
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+HF_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256   # sentence-transformers default for this model
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+TOKENIZER_FILE = "tokenizer.json"
+
+# max (1 - cosine) vs the torch backend over the comparison corpus
+COSINE_TOLERANCE = {"torch": 0.0, "onnx": 1e-4, "onnx-int8": 2e-2}
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return (x / np.maximum(norms, 1e-12)).astype("float32")
+
+
+# ----------------------------
+# PYTORCH
+# ----------------------------
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, threads: int = 0):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(HF_MODEL_ID, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            list(texts),
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,   # normalizes automatically → great for FAISS L2/IP
+        ).astype("float32", copy=False)
+
+
+# ----------------------------
+# ONNX RUNTIME
+# ----------------------------
+class OnnxBackend:
+    """
+    BERT forward pass in ONNX Runtime + the same mean pooling / L2 norm that
+    sentence-transformers applies. Needs no torch at runtime.
+    """
+
+    def __init__(self, variant: str = "onnx", model_dir: Optional[str] = None, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir or config.EMBEDDING_ONNX_DIR)
+        model_path = model_dir / ONNX_FILES[variant]
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} not found. Export it first with:\n\n"
+                "    python scripts/export_onnx_embeddings.py\n"
+            )
+
+        self.name = variant
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype="int64")
+        mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+
+        token_embeddings = self.session.run(None, feed)[0]           # (b, seq, dim)
+        m = mask[:, :, None].astype("float32")
+        pooled = (token_embeddings * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+        return _normalize(pooled)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype="float32")
+
+        # length-sorted batches keep padding (and wasted compute) small
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        step = config.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(texts), step):
+            rows = order[start : start + step]
+            out[rows] = self._encode_batch([texts[i] for i in rows])
+        return out
+
+
+def load_backend(name: Optional[str] = None):
+    """Instantiate the encoder named by config.EMBEDDING_BACKEND (or `name`)."""
+    name = (name or config.EMBEDDING_BACKEND).lower()
+    threads = config.EMBEDDING_THREADS
+    if name == "torch":
+        return TorchBackend(threads=threads)
+    if name in ONNX_FILES:
+        return OnnxBackend(name, threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}'. Expected one of {BACKENDS}.")
+
+
+# ----------------------------
+# EXPORT
+# ----------------------------
+def export_onnx(out_dir: Optional[str] = None, quantize: bool = True) -> Path:
+    """
+    Export the PyTorch transformer to ONNX (dynamic batch / sequence axes),
+    save its fast tokenizer and, with quantize=True, a dynamically
+    int8-quantized copy. Returns the output directory.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out = Path(out_dir or config.EMBEDDING_ONNX_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(HF_MODEL_ID, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    transformer.config.return_dict = False   # plain tuple outputs for the tracer
+    st_model.tokenizer.backend_tokenizer.save(str(out / TOKENIZER_FILE))
+
+    dummy = st_model.tokenizer(["export"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    args = tuple(dummy[n] for n in names)
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            args,
+            str(out / ONNX_FILES["onnx"]),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+            do_constant_folding=True,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(out / ONNX_FILES["onnx"]),
+            str(out / ONNX_FILES["onnx-int8"]),
+            weight_type=QuantType.QInt8,
+        )
+
+    return out
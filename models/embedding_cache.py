@@ -0,0 +1,113 @@
+# models/embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache stored in a single SQLite file.
+
+    key   = blake2b(model name + normalized text), 16 bytes
+    value = raw float32 vector bytes
+
+    Least-recently-used rows are evicted once `max_entries` is exceeded.
+    """
+
+    _BATCH = 500  # stay well below SQLite's bound-parameter limit
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vec BLOB NOT NULL,"
+            " used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings(used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> bytes:
+        """Whitespace/unicode-normalized text, so cosmetic re-extraction changes still hit."""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        h = hashlib.blake2b(digest_size=16)
+        h.update(model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(normalized.encode("utf-8"))
+        return h.digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return {key: vector} for the keys present; refreshes their LRU timestamp."""
+        found: Dict[bytes, np.ndarray] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            for i in range(0, len(keys), self._BATCH):
+                batch = keys[i : i + self._BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[bytes(key)] = np.frombuffer(blob, dtype="float32")
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]) -> None:
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype="float32").tobytes(), now) for k, v in items]
+        if not rows:
+            return
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vec, used) VALUES (?, ?, ?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
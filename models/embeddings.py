@@ -2,8 +2,11 @@
 from typing import List
 import threading
 
-# Hugging Face encoder
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from config import config
+from models.embedding_backends import load_backend
+from models.embedding_cache import EmbeddingCache
 
 # ------------------------
 # GLOBAL MODEL LOADER (singleton)
@@ -14,31 +17,102 @@ _embedding_model = [None]
 
 def _load_embedding_model():
     """
-    Loads the sentence-transformers embedding model once (singleton).
+    Loads the embedding backend (config.EMBEDDING_BACKEND) once (singleton).
     """
     with _model_lock:
         if _embedding_model[0] is None:
-            _embedding_model[0] = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            _embedding_model[0] = load_backend()
         return _embedding_model[0]
-        return _embedding_model
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def _cache_model_name() -> str:
+    """Cache namespace: quantized / exported vectors never mix with the torch ones."""
+    if config.EMBEDDING_BACKEND == "torch":
+        return config.EMBEDDING_MODEL
+    return f"{config.EMBEDDING_MODEL}+{config.EMBEDDING_BACKEND}"
+
+
+# ------------------------
+# PERSISTENT EMBEDDING CACHE (singleton)
+# ------------------------
+_cache_lock = threading.Lock()
+_embedding_cache = [None]
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Opens the on-disk embedding cache once (singleton).
+    """
+    with _cache_lock:
+        if _embedding_cache[0] is None:
+            _embedding_cache[0] = EmbeddingCache(
+                config.EMBEDDING_CACHE_PATH,
+                max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            )
+        return _embedding_cache[0]
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    model = _load_embedding_model()
+
+    # L2-normalized float32 (n, dim), whichever backend is active
+    return model.encode(list(texts))
+
+
+def _encode_with_cache(texts: List[str]) -> np.ndarray:
     """
-    Returns embeddings using HuggingFace sentence-transformers.
+    Look every text up in the embedding cache and only run the model on misses.
+    Hits and fresh rows are written straight into one (n, dim) output array.
+    """
+    cache = get_embedding_cache()
+    model_name = _cache_model_name()
+    keys = [cache.make_key(model_name, t) for t in texts]
+    found = cache.get_many(keys)
+
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    fresh = _encode([texts[i] for i in missing]) if missing else None
+    if fresh is not None:
+        cache.put_many((keys[i], vec) for i, vec in zip(missing, fresh))
+
+    dim = fresh.shape[1] if fresh is not None else len(next(iter(found.values())))
+    out = np.empty((len(texts), dim), dtype="float32")
+    if fresh is not None:
+        out[missing] = fresh
+    for i, key in enumerate(keys):
+        if key in found:
+            out[i] = found[key]
+    return out
+
+
+def embed_array(texts: List[str], use_cache: bool = False) -> np.ndarray:
+    """
+    Embeddings from the configured backend (sentence-transformers on PyTorch,
+    or its ONNX / int8 ONNX export) as one C-contiguous float32 (n, dim)
+    array, already L2-normalized, so it can go to FAISS as is.
     Runs completely local, no API needed.
+
+    use_cache=True serves unchanged texts from the persistent embedding cache
+    (see get_embedding_cache().hits / .misses for counts).
     """
     if not isinstance(texts, (list, tuple)):
-        raise ValueError("embed_texts expects a list of strings")
+        raise ValueError("embed_array expects a list of strings")
+    if not texts:
+        # (0, dim), so callers can vstack it or index.add() it like any other batch
+        return np.zeros((0, _load_embedding_model().dim), dtype="float32")
 
-    model = _load_embedding_model()
+    if use_cache and config.EMBEDDING_CACHE_ENABLED:
+        vectors = _encode_with_cache(texts)
+    else:
+        vectors = _encode(texts)
 
-    # Encode (convert to numpy array)
-    vectors = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True   # normalizes automatically → great for FAISS L2/IP
-    )
+    # no copy when the backend already returned contiguous float32 (all of ours do)
+    return np.ascontiguousarray(vectors, dtype="float32")
 
-    # Convert numpy -> Python lists (FAISS expects float32)
-    return vectors.tolist()
\ No newline at end of file
+
+def embed_texts(texts: List[str], use_cache: bool = False) -> List[List[float]]:
+    """
+    embed_array() as nested Python lists, for callers that want plain lists.
+    The ingest and query paths use embed_array() directly.
+    """
+    if not isinstance(texts, (list, tuple)):
+        raise ValueError("embed_texts expects a list of strings")
+    return embed_array(texts, use_cache=use_cache).tolist()
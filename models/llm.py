@@ -103,15 +103,13 @@
 
 # models/llm.py
 import os
-from config import config
+import re
+import time
+from typing import Iterator, List
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
 
-try:
-    from langchain_groq import ChatGroq
-except ImportError as e:
-    raise RuntimeError(
-        "langchain-groq not installed. Install it with:\n\n"
-        "    pip install langchain-groq\n"
-    ) from e
+from config import config
 
 
 def get_chatgroq_model(temperature: float = 0.2):
@@ -119,6 +117,15 @@ def get_chatgroq_model(temperature: float = 0.2):
     Returns a LangChain ChatGroq instance using LLaMA 3.1 on Groq.
     Compatible with langchain_core.messages (SystemMessage, HumanMessage, AIMessage).
     """
+    # imported here: langchain_groq is slow to import and unused with LLM_PROVIDER=fake
+    try:
+        from langchain_groq import ChatGroq
+    except ImportError:
+        raise RuntimeError(
+            "langchain-groq not installed. Install it with:\n\n"
+            "    pip install langchain-groq\n"
+        )
+
     api_key = os.getenv("GROQ_API_KEY") or config.GROQ_API_KEY
     if not api_key:
         raise RuntimeError(
@@ -134,3 +141,45 @@ def get_chatgroq_model(temperature: float = 0.2):
         temperature=temperature,
     )
     return chat
+
+
+class FakeStreamingChatModel:
+    """
+    Offline stand-in for ChatGroq with the same invoke() / stream() surface.
+    Answers by quoting the first sentence of the first snippet in the system
+    prompt, emitted word by word with configurable delays.
+    """
+
+    NOT_FOUND = "This information is not available in the provided policy documents."
+
+    def __init__(self, first_token_delay: float = None, token_delay: float = None):
+        self.first_token_delay = config.FAKE_LLM_FIRST_TOKEN_DELAY if first_token_delay is None else first_token_delay
+        self.token_delay = config.FAKE_LLM_TOKEN_DELAY if token_delay is None else token_delay
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        system = messages[0].content if messages else ""
+        m = re.search(r"\[Snippet ID: ([^\]]+)\]\s*(\S.*)", system)
+        if not m:
+            return self.NOT_FOUND
+        sentence = re.split(r"(?<=[.!?])\s", m.group(2).strip(), maxsplit=1)[0][:300]
+        return f"{sentence} [{m.group(1)}]"
+
+    def stream(self, messages: List[BaseMessage]) -> Iterator[AIMessageChunk]:
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(re.findall(r"\S+\s*", self._answer(messages))):
+            if i:
+                time.sleep(self.token_delay)
+            yield AIMessageChunk(content=token)
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        return AIMessage(content="".join(c.content for c in self.stream(messages)))
+
+
+def get_chat_model(temperature: float = 0.2):
+    """
+    Chat model selected by config.LLM_PROVIDER:
+      "groq" -> ChatGroq (default), "fake" -> FakeStreamingChatModel (offline)
+    """
+    if config.LLM_PROVIDER == "fake":
+        return FakeStreamingChatModel()
+    return get_chatgroq_model(temperature=temperature)
@@ -0,0 +1,563 @@
+# scripts/benchmark.py
+"""
+End-to-end benchmarks for the ingest and query paths.
+
+    python scripts/benchmark.py                          # PDF + 10k / 100k / 1M synthetic chunks
+    python scripts/benchmark.py --sizes 10000 --queries 100
+    python scripts/benchmark.py --compare old.json new.json
+
+Scenarios:
+  pdf        index_documents() on the bundled Terms of Service PDF (cold and
+             warm embedding cache) + query latencies against that index
+  synthetic  corpora of N chunks written straight to the on-disk formats
+             (clustered random vectors, text drawn from the PDF vocabulary,
+             no embedding model) + query latencies against them
+Both query benchmarks also compare one retrieve_many() call with the same
+queries through retrieve() one by one, for batches of BATCH_SIZES queries.
+  embed_output
+             cost of handing encoder output to FAISS for large batches, with
+             a fixed-output stand-in for the model: the old round-trip
+             (np.array(embed_texts()) -> normalize_L2) vs embed_array(),
+             time and peak allocation
+
+Every scenario runs in its own spawned process inside a temporary DATA_DIR,
+so the live index is never touched and peak RSS is per scenario. Results are
+written as JSON (default bench_results/<commit>.json); --compare prints the
+p50 / p95 / p99 change between two result files.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_PDF = ROOT / "data" / "uploaded" / "Terms of Service Twitter.pdf"
+
+BATCH_SIZES = (1, 16, 64)   # retrieve_many() vs N x retrieve() comparison
+
+QUERIES = [
+    "What is the minimum age to use the service?",
+    "Can I share my password with someone else?",
+    "How long is my data retained after I delete my account?",
+    "Who owns the content I post?",
+    "Can the company terminate my account without notice?",
+    "Which law governs disputes?",
+    "Am I allowed to scrape the service?",
+    "How are changes to these terms communicated?",
+]
+
+
+# ----------------------------
+# HELPERS
+# ----------------------------
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    ms = np.asarray(samples, dtype="float64") * 1000.0
+    if not len(ms):
+        return {"n": 0}
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def _time_calls(fn: Callable[[int], Any], n: int) -> List[float]:
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def _use_data_dir(data_dir: Path) -> None:
+    """Point every on-disk artifact in config at `data_dir`."""
+    from config import config
+
+    config.DATA_DIR = data_dir
+    config.VECTOR_STORE_PATH = str(data_dir / "faiss.index")
+    config.METADATA_PATH = str(data_dir / "metadata.json")
+    config.VECTORS_PATH = str(data_dir / "vectors.f32")
+    config.CHUNK_STORE_DIR = str(data_dir / "chunks")
+    config.BM25_PATH = str(data_dir / "bm25")
+    config.COLLECTIONS_DIR = str(data_dir / "collections")
+    config.SNAPSHOTS_DIR = str(data_dir / "snapshots")
+    config.EMBEDDING_CACHE_PATH = str(data_dir / "embedding_cache.sqlite")
+    config.ANSWER_CACHE_PATH = str(data_dir / "answer_cache.sqlite")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ----------------------------
+# QUERY PATH
+# ----------------------------
+def _bench_queries(query_texts: List[str], query_vecs: np.ndarray, n_queries: int, k: int) -> Dict[str, Any]:
+    """
+    Latencies of each retrieval stage against the index in the current DATA_DIR,
+    with the same parameters retrieve() uses.
+    """
+    from config import config
+    from utils.retriever import (
+        _fuse_rrf,
+        _rerank_overlap,
+        get_bm25_index,
+        get_full_vectors,
+        get_index_and_meta,
+        load_index_and_meta,
+        retrieve,
+        retrieve_many,
+    )
+    from utils.vector_index import exact_rerank, index_is_lossy, make_search_params
+    import tracemalloc
+
+    out: Dict[str, Any] = {}
+
+    loads = min(n_queries, 20)
+    out["load_index_and_meta"] = _percentiles(_time_calls(lambda i: load_index_and_meta(), loads))
+
+    index, metadata = get_index_and_meta()
+    vectors = get_full_vectors()
+    bm25 = get_bm25_index()
+
+    search_k = max(k * 2, 12)
+    rerank = (
+        config.EXACT_RERANK and vectors is not None
+        and len(vectors) == index.ntotal and index_is_lossy(index)
+    )
+    fetch_k = search_k * config.RERANK_FACTOR if rerank else search_k
+    params = make_search_params(index)
+    use_bm25 = bm25 is not None and len(bm25) == len(metadata)
+
+    search_s, rerank_s, retrieve_s = [], [], []
+    for i in range(n_queries):
+        text = query_texts[i % len(query_texts)]
+        xq = query_vecs[i % len(query_vecs)][None, :]
+
+        t0 = time.perf_counter()
+        distances, indices = index.search(xq, fetch_k, params=params)
+        t1 = time.perf_counter()
+        if rerank:
+            distances, indices = exact_rerank(xq, indices, vectors, search_k)
+        if use_bm25:
+            _fuse_rrf([text], xq, distances, indices, bm25, metadata, vectors, search_k, k)
+        else:
+            _rerank_overlap([text], 1.0 / (1.0 + distances.astype("float64")), indices, metadata, k)
+        t2 = time.perf_counter()
+        retrieve(text, index, metadata, k=k, vectors=vectors, bm25=bm25, query_vector=xq[0])
+        t3 = time.perf_counter()
+
+        search_s.append(t1 - t0)
+        rerank_s.append(t2 - t1)
+        retrieve_s.append(t3 - t2)
+
+    out["index_search"] = _percentiles(search_s)
+    out["rerank"] = _percentiles(rerank_s)
+    out["retrieve_without_embedding"] = _percentiles(retrieve_s)
+
+    # one retrieve_many() call vs the same queries through retrieve() one by one
+    out["batch"] = {}
+    for batch in BATCH_SIZES:
+        texts = [query_texts[i % len(query_texts)] for i in range(batch)]
+        vecs = np.stack([query_vecs[i % len(query_vecs)] for i in range(batch)])
+        rounds = max(1, n_queries // batch)
+
+        def loop(_):
+            for text, vec in zip(texts, vecs):
+                retrieve(text, index, metadata, k=k, vectors=vectors, bm25=bm25, query_vector=vec)
+
+        def batched(_):
+            retrieve_many(texts, index, metadata, k=k, vectors=vectors, bm25=bm25, query_vectors=vecs)
+
+        loop_s = min(_time_calls(loop, rounds))
+        many_s = min(_time_calls(batched, rounds))
+        tracemalloc.start()
+        batched(0)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out["batch"][f"batch_{batch}"] = {
+            "retrieve_loop_queries_per_s": batch / loop_s,
+            "retrieve_many_queries_per_s": batch / many_s,
+            "speedup": loop_s / many_s,
+            "retrieve_many_peak_alloc_mb": peak / 1e6,
+        }
+    out["index"] = {
+        "ntotal": int(index.ntotal),
+        "type": config.INDEX_TYPE,
+        "lossy": bool(index_is_lossy(index)),
+        "exact_rerank": bool(rerank),
+        "bm25": bool(use_bm25),
+    }
+    return out
+
+
+# ----------------------------
+# SCENARIOS (run in child processes)
+# ----------------------------
+def _scenario_pdf(pdf: str, n_queries: int, k: int) -> Dict[str, Any]:
+    from models.embeddings import embed_array, embed_texts
+    from utils.ingest import get_last_ingest_stats, index_documents
+    from utils.retriever import embed_queries
+
+    t0 = time.perf_counter()
+    embed_texts(["warm-up"])
+    result: Dict[str, Any] = {"model_load_seconds": time.perf_counter() - t0}
+
+    for label in ("cold_cache", "warm_cache"):
+        t0 = time.perf_counter()
+        index_documents([pdf], save_index=True, incremental=False)
+        seconds = time.perf_counter() - t0
+        stats = get_last_ingest_stats()
+        pages = sum(f["pages"] for f in stats["files"].values())
+        embedded = stats["chunks_embedded"]
+        result[f"ingest_{label}"] = {
+            "seconds": seconds,
+            "pages": pages,
+            "chunks": stats["total_chunks"],
+            "chunks_embedded": embedded,
+            "embedding_cache_hits": stats["embedding_cache_hits"],
+            "pages_per_s": pages / seconds,
+            "chunks_per_s": stats["total_chunks"] / seconds,
+            "chunks_embedded_per_s": embedded / seconds,
+        }
+
+    result["embed_texts_single_query"] = _percentiles(
+        _time_calls(lambda i: embed_texts([QUERIES[i % len(QUERIES)]]), n_queries)
+    )
+    batch = [QUERIES[i % len(QUERIES)] + f" ({i})" for i in range(256)]
+    t0 = time.perf_counter()
+    embed_texts(batch)
+    result["embed_texts_batch_256_per_s"] = len(batch) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    embed_array(batch)
+    result["embed_array_batch_256_per_s"] = len(batch) / (time.perf_counter() - t0)
+
+    result["query"] = _bench_queries(QUERIES, embed_queries(QUERIES), n_queries, k)
+    return result
+
+
+def _synthetic_vocab(pdf: str) -> List[str]:
+    """Words of the bundled PDF (so BM25 postings look realistic), else a fixed list."""
+    import re
+
+    try:
+        from utils.ingest import extract_text_from_pdf
+
+        words = re.findall(r"[A-Za-z]{3,}", extract_text_from_pdf(pdf).lower())
+    except Exception:
+        words = []
+    if len(set(words)) < 200:
+        words = [f"term{i}" for i in range(5000)]
+    return sorted(set(words))
+
+
+def _scenario_synthetic(n_chunks: int, pdf: str, n_queries: int, k: int, dim: int = 384) -> Dict[str, Any]:
+    import faiss
+    from config import config
+    from utils.ingest import _IngestSink, _staged_paths
+    from utils.collection import DEFAULT_COLLECTION
+    from utils.snapshots import begin_snapshot, publish_snapshot
+    from utils.vector_index import build_faiss_index, load_vectors
+
+    rng = np.random.default_rng(42)
+    vocab = np.array(_synthetic_vocab(pdf))
+    # Zipf-like word frequencies
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    centroids = rng.standard_normal((256, dim)).astype("float32")
+
+    def make_vectors(n: int) -> np.ndarray:
+        xb = centroids[rng.integers(0, len(centroids), n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+        faiss.normalize_L2(xb)
+        return xb
+
+    # 1) write chunk store / vectors / BM25 exactly like index_documents() does
+    t0 = time.perf_counter()
+    stage_dir = begin_snapshot()
+    staged = _staged_paths(stage_dir)
+    sink = _IngestSink(staged)
+    batch = config.INGEST_BATCH_SIZE
+    words_per_chunk = max(20, config.CHUNK_SIZE // 7)
+    for start in range(0, n_chunks, batch):
+        n = min(batch, n_chunks - start)
+        words = vocab[rng.choice(len(vocab), size=(n, words_per_chunk), p=weights)]
+        chunks = [
+            {
+                "doc_id": f"synthetic-{(start + j) // 1000:05d}.txt",
+                "chunk_id": (start + j) % 1000,
+                "doc_hash": "synthetic",
+                "text": " ".join(row),
+            }
+            for j, row in enumerate(words)
+        ]
+        sink.add(chunks, make_vectors(n))
+    sink.close()
+    write_seconds = time.perf_counter() - t0
+
+    # 2) FAISS index from the memory-mapped vector file
+    t0 = time.perf_counter()
+    index = build_faiss_index(load_vectors(dim, staged["vectors"]))
+    faiss.write_index(index, staged["index"])
+    index_seconds = time.perf_counter() - t0
+    del index
+
+    # 3) manifest checksums + pointer swap
+    t0 = time.perf_counter()
+    publish_snapshot(DEFAULT_COLLECTION, stage_dir, {"chunks": n_chunks})
+    publish_seconds = time.perf_counter() - t0
+
+    result: Dict[str, Any] = {
+        "chunks": n_chunks,
+        "write_seconds": write_seconds,
+        "write_chunks_per_s": n_chunks / write_seconds,
+        "index_build_seconds": index_seconds,
+        "publish_seconds": publish_seconds,
+    }
+
+    query_texts = [" ".join(vocab[rng.choice(len(vocab), size=6, p=weights)]) for _ in range(64)]
+    result["query"] = _bench_queries(query_texts, make_vectors(64), n_queries, k)
+    return result
+
+
+class _FixedEncoder:
+    """Backend stand-in returning a fresh copy of precomputed normalized rows, like encode() would."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.dim = vectors.shape[1]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.vectors[: len(texts)].copy()
+
+
+def _scenario_embed_output(batch_sizes: List[int], dim: int = 384, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Model-free: the embedding backend is replaced by _FixedEncoder, so only
+    what happens after encode() is measured, through the real functions.
+    "lists" is the former path (np.array(embed_texts(...), float32) +
+    faiss.normalize_L2), "array" is embed_array().
+    """
+    import tracemalloc
+
+    import faiss
+
+    from models import embeddings
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((max(batch_sizes), dim)).astype("float32")
+    faiss.normalize_L2(x)
+    embeddings._embedding_model[0] = _FixedEncoder(x)
+
+    def lists(texts: List[str]) -> np.ndarray:
+        xb = np.array(embeddings.embed_texts(texts), dtype="float32")
+        faiss.normalize_L2(xb)
+        return xb
+
+    def array(texts: List[str]) -> np.ndarray:
+        return embeddings.embed_array(texts)
+
+    result: Dict[str, Any] = {"dim": dim}
+    for n in batch_sizes:
+        texts = [f"chunk {i}" for i in range(n)]
+        row: Dict[str, Any] = {}
+        for name, fn in (("lists", lists), ("array", array)):
+            seconds = min(_time_calls(lambda i: fn(texts), repeats))
+            tracemalloc.start()
+            fn(texts)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            row[name] = {"seconds": seconds, "peak_alloc_mb": peak / 1e6}
+        row["saved_seconds"] = row["lists"]["seconds"] - row["array"]["seconds"]
+        row["saved_alloc_mb"] = row["lists"]["peak_alloc_mb"] - row["array"]["peak_alloc_mb"]
+        result[f"batch_{n}"] = row
+    return result
+
+
+def _child(conn, name: str, args: tuple) -> None:
+    data_dir = Path(tempfile.mkdtemp(prefix="bench-"))
+    try:
+        _use_data_dir(data_dir)
+        fn = {"pdf": _scenario_pdf, "synthetic": _scenario_synthetic, "embed_output": _scenario_embed_output}[name]
+        result = fn(*args)
+        result["peak_rss_mb"] = _peak_rss_mb()
+        conn.send({"ok": True, "result": result})
+    except Exception as e:
+        conn.send({"ok": False, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        import shutil
+
+        shutil.rmtree(data_dir, ignore_errors=True)
+        conn.close()
+
+
+def run_isolated(name: str, *args) -> Dict[str, Any]:
+    """Run one scenario in a fresh spawned process (clean caches, own peak RSS)."""
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(child, name, args))
+    proc.start()
+    child.close()
+    try:
+        msg = parent.recv()
+    except EOFError:
+        msg = {"ok": False, "error": f"scenario process died (exit code {proc.exitcode})"}
+    proc.join()
+    return msg["result"] if msg["ok"] else {"error": msg["error"]}
+
+
+# ----------------------------
+# COMPARE
+# ----------------------------
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in d.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print latency percentiles and throughputs that changed between two runs."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = _flatten(json.load(f)["results"])
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = _flatten(json.load(f)["results"])
+
+    watched = ("_ms", "_per_s", "seconds")
+    print(f"{'metric':70s} {'old':>12s} {'new':>12s} {'change':>8s}")
+    for key in sorted(set(old) & set(new)):
+        if not key.endswith(watched) or key.endswith("mean_ms") or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        print(f"{key:70s} {old[key]:12.3f} {new[key]:12.3f} {change:+7.1f}%")
+
+
+# ----------------------------
+# MAIN
+# ----------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF))
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="synthetic corpus sizes (chunks), '' = none")
+    parser.add_argument("--queries", type=int, default=200, help="queries per latency measurement")
+    parser.add_argument("-k", type=int, default=3, help="snippets per query (app default)")
+    parser.add_argument("--skip-pdf", action="store_true")
+    parser.add_argument(
+        "--embed-batches", default="256,4096,65536", help="batch sizes for the embed_output scenario, '' = skip"
+    )
+    parser.add_argument("--out", default=None, help="JSON output (default bench_results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from config import config
+
+    commit = _git_commit()
+    report: Dict[str, Any] = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            key: getattr(config, key)
+            for key in (
+                "INDEX_TYPE", "INDEX_COMPRESSION", "MAX_INDEX_MEMORY_MB", "EXACT_RERANK",
+                "IVF_NPROBE", "HNSW_EF_SEARCH", "BM25_ENABLED", "METADATA_FORMAT",
+                "CHUNK_SIZE", "CHUNK_OVERLAP", "INGEST_BATCH_SIZE", "INGEST_WORKERS",
+            )
+        },
+        "results": {},
+    }
+
+    if not args.skip_pdf:
+        if os.path.exists(args.pdf):
+            print(f"[pdf] {args.pdf}")
+            report["results"]["pdf"] = run_isolated("pdf", args.pdf, args.queries, args.k)
+        else:
+            print(f"[pdf] skipped, {args.pdf} not found")
+
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"[synthetic] {size} chunks")
+        report["results"][f"synthetic_{size}"] = run_isolated("synthetic", size, args.pdf, args.queries, args.k)
+
+    embed_batches = [int(s) for s in args.embed_batches.split(",") if s.strip()]
+    if embed_batches:
+        print(f"[embed_output] batches {embed_batches}")
+        report["results"]["embed_output"] = run_isolated("embed_output", embed_batches)
+
+    out = Path(args.out or ROOT / "bench_results" / f"{commit}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["results"].items():
+        if "error" in result:
+            print(f"{name}: ERROR {result['error']}")
+            continue
+        if name == "embed_output":
+            for batch, row in result.items():
+                if batch.startswith("batch_"):
+                    print(
+                        f"{name} {batch}: lists {row['lists']['seconds'] * 1000:.1f} ms / "
+                        f"{row['lists']['peak_alloc_mb']:.1f} MB, array {row['array']['seconds'] * 1000:.3f} ms / "
+                        f"{row['array']['peak_alloc_mb']:.3f} MB (saves {row['saved_seconds'] * 1000:.1f} ms, "
+                        f"{row['saved_alloc_mb']:.1f} MB per batch)"
+                    )
+            continue
+        q = result["query"]
+        print(
+            f"{name}: search p95 {q['index_search']['p95_ms']:.2f} ms, "
+            f"rerank p95 {q['rerank']['p95_ms']:.2f} ms, "
+            f"load p95 {q['load_index_and_meta']['p95_ms']:.1f} ms, "
+            f"peak RSS {result['peak_rss_mb']['self']:.0f} MB"
+        )
+        for batch, row in q.get("batch", {}).items():
+            print(
+                f"{name} {batch}: retrieve_many {row['retrieve_many_queries_per_s']:.0f} q/s vs "
+                f"retrieve loop {row['retrieve_loop_queries_per_s']:.0f} q/s ({row['speedup']:.2f}x), "
+                f"peak alloc {row['retrieve_many_peak_alloc_mb']:.1f} MB"
+            )
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
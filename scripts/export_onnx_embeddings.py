@@ -0,0 +1,151 @@
+# scripts/export_onnx_embeddings.py
+"""
+Export all-MiniLM-L6-v2 to ONNX (+ dynamic int8 quantization) and compare the
+embedding backends against the PyTorch reference.
+
+    python scripts/export_onnx_embeddings.py                 # export + compare
+    python scripts/export_onnx_embeddings.py --skip-export --threads 1,4
+
+For every backend / thread count it reports model load time, batch
+throughput (texts/s), single-query latency, the deviation from the torch
+vectors (1 - cosine, checked against COSINE_TOLERANCE) and how many of the
+torch top-10 neighbours each query keeps. Then select one with
+EMBEDDING_BACKEND=onnx | onnx-int8 (and EMBEDDING_THREADS).
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import config
+from models.embedding_backends import (
+    COSINE_TOLERANCE,
+    ONNX_FILES,
+    OnnxBackend,
+    TorchBackend,
+    export_onnx,
+)
+
+DEFAULT_PDF = ROOT / "data" / "uploaded" / "Terms of Service Twitter.pdf"
+
+QUERIES = [
+    "What is the minimum age to use the service?",
+    "Can I share my password with someone else?",
+    "How long is my data retained after I delete my account?",
+    "Who owns the content I post?",
+    "Can the company terminate my account without notice?",
+    "Which law governs disputes?",
+    "Am I allowed to scrape the service?",
+    "How are changes to these terms communicated?",
+]
+
+
+def _corpus(pdf: str, n: int):
+    """Chunks of the bundled PDF (repeated up to n), else synthetic sentences."""
+    texts = []
+    if Path(pdf).exists():
+        from utils.ingest import chunk_text, extract_text_from_pdf
+
+        texts = [c["text"] for c in chunk_text(extract_text_from_pdf(pdf), "bench")]
+    if not texts:
+        texts = [f"Policy clause {i}: users must not share credentials or personal data." for i in range(64)]
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def _measure(backend, corpus, queries):
+    backend.encode(corpus[:8])   # warm-up
+
+    t0 = time.perf_counter()
+    vectors = backend.encode(corpus)
+    batch_seconds = time.perf_counter() - t0
+
+    latencies = []
+    for q in queries * 4:
+        t0 = time.perf_counter()
+        backend.encode([q])
+        latencies.append(time.perf_counter() - t0)
+
+    return vectors, backend.encode(queries), {
+        "texts_per_s": len(corpus) / batch_seconds,
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "query_p95_ms": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def _agreement(ref_docs, ref_q, docs, q, k=10):
+    cos = np.sum(ref_docs * docs, axis=1)
+    ref_top = np.argsort(-(ref_q @ ref_docs.T), axis=1)[:, :k]
+    top = np.argsort(-(q @ docs.T), axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, top)])
+    return {
+        "max_1_minus_cos": float(1.0 - cos.min()),
+        "mean_1_minus_cos": float(1.0 - cos.mean()),
+        f"top{k}_overlap": float(overlap),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=config.EMBEDDING_ONNX_DIR, help="ONNX output directory")
+    parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF))
+    parser.add_argument("--texts", type=int, default=512, help="texts in the throughput corpus")
+    parser.add_argument("--threads", default="0", help="comma-separated intra-op thread counts (0 = default)")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        t0 = time.perf_counter()
+        out = export_onnx(args.out, quantize=not args.no_quantize)
+        print(f"Exported to {out} in {time.perf_counter() - t0:.1f}s")
+
+    corpus = _corpus(args.pdf, args.texts)
+    variants = [v for v in ONNX_FILES if (Path(args.out) / ONNX_FILES[v]).exists()]
+    results = []
+
+    for threads in [int(t) for t in args.threads.split(",")]:
+        t0 = time.perf_counter()
+        ref = TorchBackend(threads=threads)
+        load = time.perf_counter() - t0
+        ref_docs, ref_q, perf = _measure(ref, corpus, QUERIES)
+        results.append({"backend": "torch", "threads": threads, "load_s": load, **perf,
+                         **_agreement(ref_docs, ref_q, ref_docs, ref_q), "within_tolerance": True})
+
+        for variant in variants:
+            t0 = time.perf_counter()
+            backend = OnnxBackend(variant, model_dir=args.out, threads=threads)
+            load = time.perf_counter() - t0
+            docs, q, perf = _measure(backend, corpus, QUERIES)
+            agreement = _agreement(ref_docs, ref_q, docs, q)
+            results.append({
+                "backend": variant, "threads": threads, "load_s": load, **perf, **agreement,
+                "within_tolerance": agreement["max_1_minus_cos"] <= COSINE_TOLERANCE[variant],
+            })
+
+    torch_speed = {r["threads"]: r["texts_per_s"] for r in results if r["backend"] == "torch"}
+    print(f"\n{'backend':10s} {'thr':>3s} {'load s':>7s} {'texts/s':>9s} {'speedup':>7s} "
+          f"{'q p50 ms':>8s} {'max 1-cos':>10s} {'top10':>6s} ok")
+    for r in results:
+        print(
+            f"{r['backend']:10s} {r['threads']:3d} {r['load_s']:7.2f} {r['texts_per_s']:9.1f} "
+            f"{r['texts_per_s'] / torch_speed[r['threads']]:6.2f}x {r['query_p50_ms']:8.2f} "
+            f"{r['max_1_minus_cos']:10.2e} {r['top10_overlap']:6.2f} {'yes' if r['within_tolerance'] else 'NO'}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"texts": len(corpus), "tolerance": COSINE_TOLERANCE, "results": results}, f, indent=2)
+
+    if not all(r["within_tolerance"] for r in results):
+        sys.exit("Some backends exceed COSINE_TOLERANCE; do not serve an index built with torch from them.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# scripts/measure_startup.py
+"""
+Cold-start and time-to-first-answer, each measured in fresh interpreters.
+
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --runs 5 --think 2.0 --json startup.json
+
+import      seconds to `import app` / `import api`, and which heavy modules
+            (faiss, torch, sentence_transformers, langchain_groq,
+            langchain_text_splitters) are actually loaded afterwards
+first_answer
+            seconds from the first question to a finished answer
+            (LLM_PROVIDER=fake with zero delays, so only local work counts),
+            with the background warm-up off and on; `--think` is the
+            simulated time between start-up and the first question
+
+Run it on two commits to compare before / after; the query path needs a
+built index in DATA_DIR.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("faiss", "torch", "sentence_transformers", "langchain_groq", "langchain_text_splitters")
+
+IMPORT_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - t0
+# lazily imported modules sit in sys.modules as an unexecuted _LazyModule
+loaded = [m for m in {heavy!r} if m in sys.modules and type(sys.modules[m]).__name__ != "_LazyModule"]
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+ANSWER_PROBE = """
+import json, time
+t_start = time.perf_counter()
+from config import config
+from models.llm import get_chat_model
+from utils.response_formatter import build_system_prompt
+from utils.retriever import get_bm25_index, get_full_vectors, get_index_and_meta, retrieve
+from langchain_core.messages import HumanMessage, SystemMessage
+if {warmup}:
+    from utils.warmup import start_warmup
+    start_warmup()
+time.sleep({think})
+
+question = "Can I share my password with someone else?"
+t0 = time.perf_counter()
+index, metadata = get_index_and_meta()
+results = retrieve(question, index, metadata, k=3, vectors=get_full_vectors(), bm25=get_bm25_index())
+prompt = build_system_prompt(results)
+get_chat_model().invoke([SystemMessage(content=prompt), HumanMessage(content=question)])
+t1 = time.perf_counter()
+print(json.dumps({{"first_answer_s": t1 - t0, "since_start_s": t1 - t_start}}))
+"""
+
+
+def _probe(code: str, env_extra=None) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), **(env_extra or {}))
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _median(runs, key):
+    values = [r[key] for r in runs if key in r]
+    return statistics.median(values) if values else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between start-up and the first question")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    report = {"runs": args.runs, "think_s": args.think, "import": {}, "first_answer": {}}
+
+    for module in ("app", "api"):
+        runs = [_probe(IMPORT_PROBE.format(module=module, heavy=HEAVY)) for _ in range(args.runs)]
+        report["import"][module] = {
+            "median_s": _median(runs, "seconds"),
+            "heavy_loaded": runs[-1].get("loaded"),
+            "errors": [r["error"] for r in runs if "error" in r],
+        }
+
+    fake = {"LLM_PROVIDER": "fake", "FAKE_LLM_FIRST_TOKEN_DELAY": "0", "FAKE_LLM_TOKEN_DELAY": "0"}
+    for warmup in (False, True):
+        runs = [
+            _probe(ANSWER_PROBE.format(warmup=warmup, think=args.think), {**fake, "WARMUP_ENABLED": str(warmup).lower()})
+            for _ in range(args.runs)
+        ]
+        report["first_answer"]["warmup_on" if warmup else "warmup_off"] = {
+            "first_answer_median_s": _median(runs, "first_answer_s"),
+            "since_start_median_s": _median(runs, "since_start_s"),
+            "errors": [r["error"] for r in runs if "error" in r],
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
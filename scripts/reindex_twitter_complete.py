@@ -3,7 +3,8 @@ import os, sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from utils.ingest import index_documents
+from utils.ingest import get_last_ingest_stats, index_documents
+from utils.snapshots import snapshot_paths
 from config import config
 
 FILE_PATH = "data/uploaded/Terms of Service Twitter.pdf"  # your uploaded file path
@@ -14,6 +15,8 @@ if not os.path.exists(FILE_PATH):
 print("Starting ingestion for:", FILE_PATH)
 index, meta = index_documents([FILE_PATH], save_index=True, debug=True)
 print(f"Indexed {len(meta)} chunks.")
-print("Wrote index to:", config.VECTOR_STORE_PATH)
-print("Wrote metadata to:", config.METADATA_PATH)
+paths = snapshot_paths(version=get_last_ingest_stats()["snapshot"])
+print("Published snapshot:", get_last_ingest_stats()["snapshot"])
+print("Wrote index to:", paths["index"])
+print("Wrote metadata to:", paths["chunks"] if config.METADATA_FORMAT == "binary" else paths["metadata_json"])
 print("Debug file at:", Path(config.VECTOR_STORE_PATH).parent / "ingest_debug.json")
@@ -0,0 +1,72 @@
+# scripts/snapshots.py
+"""
+Inspect and manage the versioned index snapshots of a collection.
+
+    python scripts/snapshots.py list                       # versions, current one marked *
+    python scripts/snapshots.py verify [--version v000004] # re-check manifest checksums
+    python scripts/snapshots.py rollback [--to v000003]    # default: the previous version
+    python scripts/snapshots.py gc [--grace 0]             # drop expired retired versions
+
+--collection picks the collection (default: "default"). Running processes
+switch to the new CURRENT version on their next query.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.collection import DEFAULT_COLLECTION, validate_collection
+from utils.snapshots import current_version, gc_snapshots, list_snapshots, rollback_snapshot, verify_snapshot
+
+
+def _list(collection: str) -> None:
+    snapshots = list_snapshots(collection)
+    if not snapshots:
+        print(f"Collection '{collection}' has no snapshots.")
+        return
+    for s in snapshots:
+        if s.get("damaged"):
+            print(f"  {s['version']}  (manifest unreadable)")
+            continue
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["created"]))
+        size_mb = sum(f["size"] for f in s["files"].values()) / 1e6
+        print(
+            f"{'*' if s['current'] else ' '} {s['version']}  {created}  "
+            f"{s.get('chunks', '?')} chunks  {size_mb:.1f} MB  parent={s.get('parent')}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list", "verify", "rollback", "gc"])
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--version", default=None, help="version to verify (default: current)")
+    parser.add_argument("--to", default=None, help="version to roll back to (default: the previous one)")
+    parser.add_argument("--grace", type=float, default=None, help="seconds (default: SNAPSHOT_GRACE_SECONDS)")
+    parser.add_argument("--keep", type=int, default=None, help="retired versions kept (default: SNAPSHOT_KEEP)")
+    args = parser.parse_args()
+    collection = validate_collection(args.collection)
+
+    if args.command == "list":
+        _list(collection)
+    elif args.command == "verify":
+        version = args.version or current_version(collection)
+        if version is None:
+            sys.exit(f"Collection '{collection}' has no snapshots.")
+        problems = verify_snapshot(collection, version)
+        print(f"{version}: " + ("OK" if not problems else "; ".join(problems)))
+        sys.exit(1 if problems else 0)
+    elif args.command == "rollback":
+        try:
+            version = rollback_snapshot(collection, args.to)
+        except (ValueError, RuntimeError) as e:
+            sys.exit(str(e))
+        print(f"'{collection}' now serves {version}.")
+    else:
+        removed = gc_snapshots(collection, grace_seconds=args.grace, keep=args.keep)
+        print(f"Removed {len(removed)} snapshot(s): {', '.join(removed) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# scripts/test_answer_cache.py
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path so the local packages are imported.
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.answer_cache import AnswerCache
+
+vec = np.ones(8, dtype="float32") / np.sqrt(8)
+chunks_a = [("default", "a.pdf", 0), ("default", "a.pdf", 1)]
+chunks_b = [("hr", "a.pdf", 0), ("hr", "a.pdf", 1)]
+
+with tempfile.TemporaryDirectory() as tmp:
+    cache = AnswerCache(str(Path(tmp) / "answers.sqlite"))
+
+    # two callers searching different collections -> different index versions
+    cache.put(vec, chunks_a, "version-a", "answer a")
+    cache.put(vec, chunks_b, "version-b", "answer b")
+    for _ in range(3):
+        assert cache.get(vec, chunks_a, "version-a") == "answer a"
+        assert cache.get(vec, chunks_b, "version-b") == "answer b"
+    assert len(cache) == 2, len(cache)
+
+    # a newer snapshot of the same collection does not reuse the old answer
+    assert cache.get(vec, chunks_a, "version-a2") is None
+    # the same doc_id / chunk_id in another collection is a different key
+    assert AnswerCache.make_chunks_key(chunks_a) != AnswerCache.make_chunks_key(chunks_b)
+    cache.close()
+
+print("SUCCESS: answers for alternating index versions both survive.")
@@ -0,0 +1,179 @@
+# utils/answer_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from config import config
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers stored in a single SQLite file.
+
+    An entry is reused when a new question
+      - retrieved exactly the same set of chunks (collection/doc_id#chunk_id),
+      - was asked in the same response variant (e.g. "concise"),
+      - has cosine similarity >= `threshold` with the cached query embedding,
+      - and was answered from the same index version (the snapshots searched).
+
+    Entries for other index versions are left alone, so callers searching
+    different collections never evict each other; rows for superseded
+    snapshots simply stop matching and age out. Entries expire after
+    `ttl_seconds` (0 = never); least-recently-used rows are evicted once
+    `max_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.95,
+        ttl_seconds: float = 0,
+        max_entries: int = 5_000,
+    ):
+        self.path = str(path)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY,"
+            " index_version TEXT NOT NULL,"
+            " chunks_key BLOB NOT NULL,"
+            " variant TEXT NOT NULL,"
+            " vec BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_lookup ON answers(chunks_key, variant)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_used ON answers(used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    @staticmethod
+    def make_chunks_key(chunk_ids: Iterable[Tuple[str, str, int]]) -> bytes:
+        """Order-independent key of the retrieved (collection, doc_id, chunk_id) set."""
+        h = hashlib.blake2b(digest_size=16)
+        for collection, doc_id, chunk_id in sorted({(str(c), str(d), int(i)) for c, d, i in chunk_ids}):
+            h.update(collection.encode("utf-8"))
+            h.update(b"\0")
+            h.update(f"{doc_id}#{chunk_id}".encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get(
+        self,
+        query_vec: np.ndarray,
+        chunk_ids: Iterable[Tuple[str, str, int]],
+        index_version: str,
+        variant: str = "",
+    ) -> Optional[str]:
+        """Cached answer for a similar query over the same chunks, else None."""
+        q = np.asarray(query_vec, dtype="float32").ravel()
+        key = self.make_chunks_key(chunk_ids)
+        now = time.time()
+
+        with self._lock:
+            if self.ttl_seconds:
+                cur = self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+                self._count -= cur.rowcount
+
+            rows = self._conn.execute(
+                "SELECT id, vec, answer FROM answers"
+                " WHERE chunks_key = ? AND variant = ? AND index_version = ?",
+                (key, variant, index_version),
+            ).fetchall()
+
+            best_id, best_answer, best_sim = None, None, self.threshold
+            for row_id, blob, answer in rows:
+                # both sides are L2-normalized, so the dot product is the cosine
+                sim = float(np.frombuffer(blob, dtype="float32") @ q)
+                if sim >= best_sim:
+                    best_id, best_answer, best_sim = row_id, answer, sim
+
+            if best_id is not None:
+                self._conn.execute("UPDATE answers SET used = ? WHERE id = ?", (now, best_id))
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._conn.commit()
+
+        return best_answer
+
+    def put(
+        self,
+        query_vec: np.ndarray,
+        chunk_ids: Iterable[Tuple[str, str, int]],
+        index_version: str,
+        answer: str,
+        variant: str = "",
+    ) -> None:
+        vec = np.asarray(query_vec, dtype="float32").ravel().tobytes()
+        key = self.make_chunks_key(chunk_ids)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (index_version, chunks_key, variant, vec, answer, created, used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (index_version, key, variant, vec, answer, now, now),
+            )
+            self._count += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM answers WHERE id IN "
+            "(SELECT id FROM answers ORDER BY used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ------------------------
+# SHARED ANSWER CACHE (singleton)
+# ------------------------
+_cache_lock = threading.Lock()
+_answer_cache = [None]
+
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Opens the on-disk answer cache once (singleton).
+    """
+    with _cache_lock:
+        if _answer_cache[0] is None:
+            _answer_cache[0] = AnswerCache(
+                config.ANSWER_CACHE_PATH,
+                threshold=config.ANSWER_CACHE_THRESHOLD,
+                ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+            )
+        return _answer_cache[0]
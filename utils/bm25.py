@@ -0,0 +1,298 @@
+# utils/bm25.py
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from config import config
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Files inside the BM25 directory (all .npy, memory-mapped on load)
+_ARRAYS = ("terms", "term_offsets", "rows", "tfs", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens longer than 2 chars (same rule as the old overlap score)."""
+    return [w for w in _TOKEN_RE.findall(text.lower()) if len(w) > 2]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts, stored as a CSR inverted index:
+
+      postings of term t = rows[term_offsets[t] : term_offsets[t + 1]]
+                           tfs [term_offsets[t] : term_offsets[t + 1]]
+
+    Rows are metadata / FAISS positions, so both channels share ids.
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        term_offsets: np.ndarray,
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+    ):
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+
+        n = len(doc_len)
+        self.n_docs = n
+        avgdl = float(doc_len.mean()) if n else 0.0
+        k1, b = config.BM25_K1, config.BM25_B
+        # per-row length normalisation, precomputed once
+        self._norm = (k1 * (1.0 - b + b * doc_len / (avgdl or 1.0))).astype("float32")
+
+    # ----------------------------
+    # PERSIST
+    # ----------------------------
+    @classmethod
+    def load(cls, directory: Optional[Union[str, Path]] = None) -> "BM25Index":
+        """Memory-map a directory written by BM25Builder; postings are paged in per query term."""
+        directory = Path(directory or config.BM25_PATH)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        blob = np.asarray(arrays["terms"]).tobytes().decode("utf-8")
+        terms = blob.split("\n") if blob else []
+        # plain ndarray views of the maps: slicing an np.memmap per query term is several times slower
+        return cls(
+            terms, np.asarray(arrays["term_offsets"]), np.asarray(arrays["rows"]), np.asarray(arrays["tfs"]),
+            np.asarray(arrays["doc_len"]),
+        )
+
+    # ----------------------------
+    # QUERY
+    # ----------------------------
+    def _query_terms(self, query: str) -> List[Tuple[int, float]]:
+        """(term id, idf) of the distinct indexed query terms, rarest first."""
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        terms = []
+        for t in term_ids:
+            df = int(self.term_offsets[t + 1] - self.term_offsets[t])
+            terms.append((df, t, math.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))))
+        return [(t, idf) for _, t, idf in sorted(terms)]
+
+    def _postings_scores(self, terms: List[Tuple[int, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows in the postings of `terms` and their float64 score over those terms."""
+        if not terms:
+            return np.zeros(0, dtype="int32"), np.zeros(0, dtype="float64")
+
+        k1 = config.BM25_K1
+        all_rows, all_scores = [], []
+        for t, idf in terms:
+            start, end = self.term_offsets[t], self.term_offsets[t + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end]
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (k1 + 1.0) / (tfs + self._norm[rows]))
+
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=scores)
+
+    def _add_scores(self, terms: List[Tuple[int, float]], rows: np.ndarray, total: np.ndarray) -> None:
+        """Add the score of `terms` to `total` of the sorted `rows`, binary-searching each term's postings."""
+        k1 = config.BM25_K1
+        for t, idf in terms:
+            start, end = self.term_offsets[t], self.term_offsets[t + 1]
+            postings = self.rows[start:end]
+            pos = np.minimum(np.searchsorted(postings, rows), end - start - 1)
+            hit = np.flatnonzero(np.asarray(postings[pos]) == rows)
+            if len(hit):
+                tfs = np.asarray(self.tfs[start:end][pos[hit]])
+                total[hit] += idf * tfs * (k1 + 1.0) / (tfs + self._norm[rows[hit]])
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 scores of every row that shares at least one term with `query`.
+        Returns (rows, scores); one postings lookup per query term.
+        """
+        rows, scores = self._postings_scores(self._query_terms(query))
+        return rows, scores.astype("float32")
+
+    def score_rows(self, query: str, rows: np.ndarray) -> np.ndarray:
+        """BM25 scores of the given rows only (0 = no shared term), by binary search in the postings."""
+        rows = np.asarray(rows, dtype="int64")
+        order = np.argsort(rows, kind="stable")
+        total = np.zeros(len(rows), dtype="float64")
+        if len(rows):
+            sorted_total = np.zeros(len(rows), dtype="float64")
+            self._add_scores(self._query_terms(query), rows[order], sorted_total)
+            total[order] = sorted_total
+        return total.astype("float32")
+
+    def search(self, query: str, k: int, id_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (rows, scores) by BM25, best first (score desc, row asc);
+        id_mask restricts the result to rows where it is True. Same result as
+        top_k() over score(), without reading the postings of common terms
+        whole when they cannot change the top-k (MaxScore pruning):
+
+          1. rows of the rarest terms, scored in full, give a lower bound
+             `theta` on the final k-th best score;
+          2. a row matching none of terms[:j] scores at most the sum of
+             idf * (k1 + 1) over terms[j:]; for the smallest j where that is
+             below theta, only the postings of terms[:j] are enumerated;
+          3. the other terms are binary-searched for those rows, dropping
+             rows whose score so far plus that bound falls below theta.
+        """
+        terms = self._query_terms(query)
+        k1 = config.BM25_K1
+        rest = [0.0] * (len(terms) + 1)   # rest[j] = best score of a row matching terms[j:] only
+        for j in range(len(terms) - 1, -1, -1):
+            rest[j] = rest[j + 1] + terms[j][1] * (k1 + 1.0)
+
+        def scored(j: int, floor: float) -> Tuple[np.ndarray, np.ndarray]:
+            rows, total = self._postings_scores(terms[:j])
+            if id_mask is not None and len(rows):
+                keep = id_mask[rows]
+                rows, total = rows[keep], total[keep]
+            for i in range(j, len(terms)):
+                if floor > 0:
+                    keep = total + rest[i] >= floor
+                    rows, total = rows[keep], total[keep]
+                self._add_scores(terms[i:i + 1], rows, total)
+            return rows, total.astype("float32")
+
+        # 1) lower bound from the rarest terms that hold k rows between them
+        theta = 0.0
+        j, df = 0, 0
+        while j < len(terms) and df < k:
+            t = terms[j][0]
+            df += int(self.term_offsets[t + 1] - self.term_offsets[t])
+            j += 1
+        if j < len(terms):
+            rows, scores = scored(j, 0.0)
+            if len(rows) >= k:
+                theta = float(np.partition(scores, len(rows) - k)[len(rows) - k])
+        # slightly below theta, so float32 rounding of a final score never decides a tie
+        floor = theta * (1.0 - 1e-6)
+
+        # 2) + 3) enumerate only the terms a row must match to reach theta
+        essential = next((j for j in range(len(terms) + 1) if rest[j] < floor), len(terms))
+        return top_k(*scored(essential, floor), k)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+
+class BM25Builder:
+    """
+    Streaming BM25 index construction.
+
+    add() spills (term, row, tf) postings of each batch to raw files, so
+    memory holds only the vocabulary; finish() counting-sorts the spilled
+    postings by term in blocks into the CSR arrays read by BM25Index.
+    """
+
+    _BLOCK = 1 << 20  # postings per block in finish()
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vocab: Dict[str, int] = {}
+        self.n_docs = 0
+        self.n_postings = 0
+        self._spill = {
+            name: open(self.directory / f"{name}.raw", "wb")
+            for name in ("post_terms", "post_rows", "post_tfs", "doc_len")
+        }
+
+    def add(self, texts: Iterable[str]) -> None:
+        terms: List[int] = []
+        rows: List[int] = []
+        tfs: List[int] = []
+        lens: List[int] = []
+
+        for text in texts:
+            tokens = tokenize(text)
+            lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                rows.append(self.n_docs)
+                tfs.append(tf)
+            self.n_docs += 1
+
+        np.array(terms, dtype="int32").tofile(self._spill["post_terms"])
+        np.array(rows, dtype="int32").tofile(self._spill["post_rows"])
+        np.array(tfs, dtype="float32").tofile(self._spill["post_tfs"])
+        np.array(lens, dtype="float32").tofile(self._spill["doc_len"])
+        self.n_postings += len(terms)
+
+    def finish(self) -> None:
+        for f in self._spill.values():
+            f.close()
+
+        d = self.directory
+        n_terms = len(self.vocab)
+
+        def spilled(name: str, dtype: str) -> np.ndarray:
+            path = d / f"{name}.raw"
+            if not os.path.getsize(path):
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="r")
+
+        post_terms = spilled("post_terms", "int32")
+        post_rows = spilled("post_rows", "int32")
+        post_tfs = spilled("post_tfs", "float32")
+
+        # Pass 1: postings per term -> CSR offsets
+        counts = np.zeros(n_terms, dtype="int64")
+        for start in range(0, self.n_postings, self._BLOCK):
+            counts += np.bincount(post_terms[start : start + self._BLOCK], minlength=n_terms)
+        term_offsets = np.zeros(n_terms + 1, dtype="int64")
+        np.cumsum(counts, out=term_offsets[1:])
+
+        # Pass 2: stable scatter into place (rows stay ascending within a term)
+        rows_out = np.lib.format.open_memmap(d / "rows.npy", mode="w+", dtype="int32", shape=(self.n_postings,))
+        tfs_out = np.lib.format.open_memmap(d / "tfs.npy", mode="w+", dtype="float32", shape=(self.n_postings,))
+        cursor = term_offsets[:-1].copy()
+        for start in range(0, self.n_postings, self._BLOCK):
+            block_terms = np.asarray(post_terms[start : start + self._BLOCK])
+            order = np.argsort(block_terms, kind="stable")
+            sorted_terms = block_terms[order]
+            # rank of each posting among same-term postings of this block
+            first = np.searchsorted(sorted_terms, sorted_terms, side="left")
+            pos = cursor[sorted_terms] + (np.arange(len(order)) - first)
+            rows_out[pos] = np.asarray(post_rows[start : start + self._BLOCK])[order]
+            tfs_out[pos] = np.asarray(post_tfs[start : start + self._BLOCK])[order]
+            cursor += np.bincount(block_terms, minlength=n_terms)
+        rows_out.flush()
+        tfs_out.flush()
+        del rows_out, tfs_out, post_terms, post_rows, post_tfs
+
+        terms = [""] * n_terms
+        for term, i in self.vocab.items():
+            terms[i] = term
+        # terms never contain "\n" (they are \w+), so one joined blob avoids pickling
+        np.save(d / "terms.npy", np.frombuffer("\n".join(terms).encode("utf-8"), dtype="uint8"))
+        np.save(d / "term_offsets.npy", term_offsets)
+        np.save(d / "doc_len.npy", np.fromfile(d / "doc_len.raw", dtype="float32"))
+
+        for name in ("post_terms", "post_rows", "post_tfs", "doc_len"):
+            os.remove(d / f"{name}.raw")
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k of (rows, scores), score desc then row asc for stable ties."""
+    if len(rows) > k:
+        # ties at the k-th score are broken by row too, so any superset of the top-k gives the same result
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        tied = np.flatnonzero(scores == kth)
+        tied = tied[np.argsort(rows[tied], kind="stable")]
+        part = np.concatenate([np.flatnonzero(scores > kth), tied])[:k]
+        rows, scores = rows[part], scores[part]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
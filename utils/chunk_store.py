@@ -0,0 +1,365 @@
+# utils/chunk_store.py
+import json
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from config import config
+from utils.collection import DEFAULT_COLLECTION, collection_paths
+from utils.snapshots import snapshot_paths
+
+
+# Keys stored once per document instead of once per chunk
+DOC_FIELDS = ("doc_hash", "ingested_at")
+
+HEADER_FILE = "header.json"      # written last: its presence marks a complete store
+DOC_INDEX_FILE = "doc_index.npy"  # int32, row -> position in header["docs"]
+CHUNK_ID_FILE = "chunk_id.npy"    # int32
+OFFSETS_FILE = "text_offsets.npy" # int64, n + 1 byte offsets into text.bin
+TEXT_FILE = "text.bin"            # utf-8 chunk texts, concatenated
+DOC_ROWS_FILE = "doc_rows.npy"    # int32 row ids grouped by document (filter postings)
+DOC_ROW_OFFSETS_FILE = "doc_row_offsets.npy"  # int64, n_docs + 1 offsets into doc_rows
+MINHASH_FILE = "minhash.npy"      # uint32 (n, num_perm) MinHash signatures, see utils/dedup.py
+ALIASES_FILE = "aliases.npy"      # int32 (n_aliases, 3): row, doc position, chunk_id; sorted by row
+
+# Per-chunk keys that are not stored as extras
+CHUNK_COLUMNS = ("doc_id", "chunk_id", "text", "minhash")
+
+
+# ----------------------------
+# WRITE
+# ----------------------------
+def _raw_to_npy(raw_path: Path, npy_path: Path, dtype: str, count: int, width: int = 0) -> None:
+    """Prefix a raw little-endian array file with a .npy header (streamed copy)."""
+    shape = (count, width) if width else (count,)
+    header = {"descr": np.dtype(dtype).str, "fortran_order": False, "shape": shape}
+    with open(npy_path, "wb") as out:
+        np.lib.format.write_array_header_1_0(out, header)
+        with open(raw_path, "rb") as src:
+            shutil.copyfileobj(src, out)
+    os.remove(raw_path)
+
+
+class ChunkStoreWriter:
+    """
+    Streams chunk dicts ({doc_id, chunk_id, text, ...}) into a binary store.
+    Per-chunk columns go straight to disk, so memory does not grow with
+    the number of chunks written (apart from the per-document table).
+
+    Optional chunk keys: "minhash" (signature row, see utils/dedup.py) and
+    "aliases" ([{doc_id, chunk_id, ...}] near-duplicates folded into this chunk).
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        header_path = self.directory / HEADER_FILE
+        if header_path.exists():
+            header_path.unlink()  # store is incomplete until the new header lands
+
+        self.count = 0
+        self._offset = 0
+        self._docs: List[Dict[str, Any]] = []
+        self._doc_pos: Dict[str, int] = {}
+        self._extras: Dict[str, Dict[str, Any]] = {}
+        self._alias_rows: List[int] = []
+        self._alias_docs: List[int] = []
+        self._alias_chunk_ids: List[int] = []
+        self._minhash = None
+        self._minhash_width = 0
+
+        self._text = open(self.directory / TEXT_FILE, "wb")
+        self._doc_index = open(self.directory / (DOC_INDEX_FILE + ".raw"), "wb")
+        self._chunk_id = open(self.directory / (CHUNK_ID_FILE + ".raw"), "wb")
+        self._offsets = open(self.directory / (OFFSETS_FILE + ".raw"), "wb")
+        np.zeros(1, dtype="int64").tofile(self._offsets)
+
+    def add(self, chunk: Dict[str, Any]) -> None:
+        self.add_many([chunk])
+
+    def add_many(self, chunks: Iterable[Dict[str, Any]]) -> None:
+        """Append a batch; each column file gets one write per batch."""
+        doc_index: List[int] = []
+        chunk_ids: List[int] = []
+        offsets: List[int] = []
+        signatures: List[Optional[np.ndarray]] = []
+        first_row = self.count
+
+        for c in chunks:
+            pos = self._register_doc(c)
+            signatures.append(c.get("minhash"))
+
+            data = c["text"].encode("utf-8")
+            self._text.write(data)
+            self._offset += len(data)
+
+            doc_index.append(pos)
+            chunk_ids.append(int(c["chunk_id"]))
+            offsets.append(self._offset)
+
+            extra = {k: v for k, v in c.items() if k not in CHUNK_COLUMNS + DOC_FIELDS + ("aliases",)}
+            if extra:
+                self._extras[str(self.count)] = extra
+            for alias in c.get("aliases") or ():
+                self.add_alias(self.count, alias)
+            self.count += 1
+
+        np.array(doc_index, dtype="int32").tofile(self._doc_index)
+        np.array(chunk_ids, dtype="int32").tofile(self._chunk_id)
+        np.array(offsets, dtype="int64").tofile(self._offsets)
+        self._write_minhash(signatures, first_row)
+
+    def _register_doc(self, c: Dict[str, Any]) -> int:
+        doc_id = c["doc_id"]
+        if doc_id not in self._doc_pos:
+            self._doc_pos[doc_id] = len(self._docs)
+            self._docs.append({"doc_id": doc_id, **{f: c[f] for f in DOC_FIELDS if f in c}})
+        return self._doc_pos[doc_id]
+
+    def _write_minhash(self, signatures: List[Optional[np.ndarray]], first_row: int) -> None:
+        width = self._minhash_width or next((len(s) for s in signatures if s is not None), 0)
+        if not width:
+            return
+        if self._minhash is None:
+            # earlier rows had no signature: all-zero rows mean "unknown"
+            self._minhash_width = width
+            self._minhash = open(self.directory / (MINHASH_FILE + ".raw"), "wb")
+            np.zeros((first_row, width), dtype="uint32").tofile(self._minhash)
+
+        block = np.zeros((len(signatures), width), dtype="uint32")
+        for i, sig in enumerate(signatures):
+            if sig is not None:
+                block[i] = sig
+        block.tofile(self._minhash)
+
+    def add_alias(self, row: int, alias: Dict[str, Any]) -> None:
+        """
+        Record chunk `alias` ({doc_id, chunk_id, doc fields}) as a near-duplicate
+        folded into stored row `row`. Its document is registered, so it keeps
+        its doc hash and shows up in document filters. Only three ints per
+        alias are kept until close() writes them to aliases.npy.
+        """
+        self._alias_rows.append(row)
+        self._alias_docs.append(self._register_doc(alias))
+        self._alias_chunk_ids.append(int(alias["chunk_id"]))
+
+    def close(self) -> int:
+        """Finish the column files and write the header. Returns the chunk count."""
+        for f in (self._text, self._doc_index, self._chunk_id, self._offsets):
+            f.close()
+        if self._minhash is not None:
+            self._minhash.close()
+
+        d = self.directory
+        _raw_to_npy(d / (DOC_INDEX_FILE + ".raw"), d / DOC_INDEX_FILE, "int32", self.count)
+        _raw_to_npy(d / (CHUNK_ID_FILE + ".raw"), d / CHUNK_ID_FILE, "int32", self.count)
+        _raw_to_npy(d / (OFFSETS_FILE + ".raw"), d / OFFSETS_FILE, "int64", self.count + 1)
+
+        if self._minhash is not None:
+            _raw_to_npy(d / (MINHASH_FILE + ".raw"), d / MINHASH_FILE, "uint32", self.count, self._minhash_width)
+        elif (d / MINHASH_FILE).exists():
+            (d / MINHASH_FILE).unlink()
+
+        if self._alias_rows:
+            table = np.array([self._alias_rows, self._alias_docs, self._alias_chunk_ids], dtype="int32").T
+            np.save(d / ALIASES_FILE, table[np.argsort(table[:, 0], kind="stable")])
+        elif (d / ALIASES_FILE).exists():
+            (d / ALIASES_FILE).unlink()
+
+        # document -> rows postings (aliases included), so metadata filters never scan every row
+        docs = np.concatenate([np.load(d / DOC_INDEX_FILE), np.array(self._alias_docs, dtype="int32")])
+        rows = np.concatenate([np.arange(self.count, dtype="int32"), np.array(self._alias_rows, dtype="int32")])
+        order = np.argsort(docs, kind="stable")
+        counts = np.bincount(docs, minlength=len(self._docs))
+        np.save(d / DOC_ROWS_FILE, rows[order])
+        np.save(d / DOC_ROW_OFFSETS_FILE, np.concatenate([[0], np.cumsum(counts)]).astype("int64"))
+
+        header = {"version": 1, "count": self.count, "docs": self._docs, "extras": self._extras}
+        with open(d / HEADER_FILE, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+
+        return self.count
+
+
+class JsonChunkWriter:
+    """Same interface as ChunkStoreWriter for the legacy metadata.json format."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.count = 0
+        self._f = open(self.path, "w", encoding="utf-8")
+        self._f.write("[")
+
+    def add(self, chunk: Dict[str, Any]) -> None:
+        chunk = {k: v for k, v in chunk.items() if k != "minhash"}   # signatures need the binary store
+        self._f.write(",\n" if self.count else "\n")
+        self._f.write(json.dumps(chunk, ensure_ascii=False, indent=2))
+        self.count += 1
+
+    def add_many(self, chunks: Iterable[Dict[str, Any]]) -> None:
+        for c in chunks:
+            self.add(c)
+
+    def close(self) -> int:
+        self._f.write("\n]")
+        self._f.close()
+        return self.count
+
+
+def write_chunk_store(chunks: Iterable[Dict[str, Any]], directory: Union[str, Path]) -> int:
+    """
+    Write chunk dicts ({doc_id, chunk_id, text, ...}) as a compact binary store.
+    Returns the number of chunks written.
+    """
+    writer = ChunkStoreWriter(directory)
+    writer.add_many(chunks)
+    return writer.close()
+
+
+# ----------------------------
+# READ
+# ----------------------------
+class ChunkStore(Sequence):
+    """
+    Read-only, memory-mapped view of a chunk store.
+
+    Behaves like the list of chunk dicts it replaces: store[i] returns
+    {doc_id, chunk_id, text, ...}, but the text is only decoded for the rows
+    that are actually accessed.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        with open(directory / HEADER_FILE, "r", encoding="utf-8") as f:
+            header = json.load(f)
+
+        self.directory = directory
+        self.docs: List[Dict[str, Any]] = header["docs"]
+        self._extras: Dict[str, Dict[str, Any]] = header.get("extras", {})
+        self._count = header["count"]
+
+        self.doc_index = np.load(directory / DOC_INDEX_FILE, mmap_mode="r")
+        self.chunk_ids = np.load(directory / CHUNK_ID_FILE, mmap_mode="r")
+        self._offsets = np.load(directory / OFFSETS_FILE, mmap_mode="r")
+
+        # absent in stores written before metadata filtering existed
+        self._doc_rows = self._doc_row_offsets = None
+        if (directory / DOC_ROWS_FILE).exists():
+            self._doc_rows = np.load(directory / DOC_ROWS_FILE, mmap_mode="r" if self._count else None)
+            self._doc_row_offsets = np.load(directory / DOC_ROW_OFFSETS_FILE)
+
+        # MinHash signatures (None if written with DEDUP_ENABLED off or before it existed)
+        self.minhash = None
+        if (directory / MINHASH_FILE).exists() and self._count:
+            self.minhash = np.load(directory / MINHASH_FILE, mmap_mode="r")
+
+        # near-duplicates folded into rows (None if there are none); stores written
+        # before aliases.npy existed keep them in header["extras"] instead
+        self._aliases = None
+        if (directory / ALIASES_FILE).exists():
+            self._aliases = np.load(directory / ALIASES_FILE, mmap_mode="r")
+
+        if os.path.getsize(directory / TEXT_FILE):
+            self._text = np.memmap(directory / TEXT_FILE, dtype="uint8", mode="r")
+        else:
+            self._text = np.zeros(0, dtype="uint8")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def text_at(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._text[start:end].tobytes().decode("utf-8")
+
+    def doc_id_at(self, i: int) -> str:
+        return self.docs[int(self.doc_index[i])]["doc_id"]
+
+    def _alias_entry(self, pos: int, chunk_id: int) -> Dict[str, Any]:
+        return {"doc_id": self.docs[int(pos)]["doc_id"], "chunk_id": int(chunk_id)}
+
+    def aliases_at(self, i: int) -> List[Dict[str, Any]]:
+        """[{doc_id, chunk_id}, ...] near-duplicates folded into row `i`."""
+        if self._aliases is None:
+            return list(self._extras.get(str(i), {}).get("aliases", ()))
+        rows = self._aliases[:, 0]
+        lo, hi = np.searchsorted(rows, i, "left"), np.searchsorted(rows, i, "right")
+        return [self._alias_entry(pos, cid) for _, pos, cid in np.asarray(self._aliases[lo:hi])]
+
+    @property
+    def aliases(self) -> Dict[int, List[Dict[str, Any]]]:
+        """{row: [{doc_id, chunk_id}, ...]} for rows that near-duplicate chunks were folded into."""
+        if self._aliases is None:
+            return {int(row): extra["aliases"] for row, extra in self._extras.items() if extra.get("aliases")}
+        out: Dict[int, List[Dict[str, Any]]] = {}
+        for row, pos, cid in np.asarray(self._aliases):
+            out.setdefault(int(row), []).append(self._alias_entry(pos, cid))
+        return out
+
+    def rows_of_docs(self, positions: Iterable[int]) -> np.ndarray:
+        """Row ids of the documents at `positions` in self.docs."""
+        positions = list(positions)
+        if self._doc_rows is None:
+            hit = np.zeros(len(self.docs), dtype=bool)
+            hit[positions] = True
+            return np.flatnonzero(hit[np.asarray(self.doc_index)]) if self._count else np.zeros(0, dtype="int64")
+
+        offsets = self._doc_row_offsets
+        parts = [np.asarray(self._doc_rows[offsets[p] : offsets[p + 1]]) for p in positions]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype="int32")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("chunk index out of range")
+
+        doc = self.docs[int(self.doc_index[i])]
+        chunk = dict(doc)
+        chunk["chunk_id"] = int(self.chunk_ids[i])
+        chunk["text"] = self.text_at(i)
+        chunk.update(self._extras.get(str(i), {}))
+        if self._aliases is not None:
+            aliases = self.aliases_at(i)
+            if aliases:
+                chunk["aliases"] = aliases
+        return chunk
+
+
+def chunk_store_exists(directory: Union[str, Path, None] = None) -> bool:
+    return (Path(directory or config.CHUNK_STORE_DIR) / HEADER_FILE).exists()
+
+
+def metadata_stamp_path(collection: str = DEFAULT_COLLECTION) -> str:
+    """File whose mtime changes whenever the collection's legacy (pre-snapshot) metadata is rewritten."""
+    paths = collection_paths(collection)
+    if config.METADATA_FORMAT == "binary" and chunk_store_exists(paths["chunks"]):
+        return str(Path(paths["chunks"]) / HEADER_FILE)
+    return paths["metadata_json"]
+
+
+def load_metadata(
+    collection: str = DEFAULT_COLLECTION,
+    paths: Optional[Dict[str, str]] = None,
+) -> Union[ChunkStore, List[Dict[str, Any]]]:
+    """
+    Load a collection's chunk metadata in the configured format, from
+    `paths` (default: its published snapshot, see utils/snapshots.py).
+    Falls back to the legacy metadata.json when no binary store has been built yet.
+    """
+    paths = paths or snapshot_paths(collection)
+    if config.METADATA_FORMAT == "binary" and chunk_store_exists(paths["chunks"]):
+        return ChunkStore(paths["chunks"])
+
+    if not os.path.exists(paths["metadata_json"]):
+        raise FileNotFoundError("Metadata missing. Build index first.")
+
+    with open(paths["metadata_json"], "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,71 @@
+# utils/collection.py
+import os
+import re
+from pathlib import Path
+from typing import Dict, List
+
+from config import config
+
+
+# The pre-collections index (VECTOR_STORE_PATH, CHUNK_STORE_DIR, ...) is the
+# "default" collection; every other collection lives in COLLECTIONS_DIR/<name>/
+DEFAULT_COLLECTION = "default"
+
+# names the published snapshot inside a collection's snapshots directory (see utils/snapshots.py)
+POINTER_FILE = "CURRENT"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def validate_collection(name: str) -> str:
+    """Collection names double as directory names."""
+    if not name or not _NAME_RE.match(name):
+        raise ValueError(
+            f"Invalid collection name '{name}'. Use letters, digits, '_', '.' or '-' (max 64 chars)."
+        )
+    return name
+
+
+def collection_paths(collection: str = DEFAULT_COLLECTION) -> Dict[str, str]:
+    """
+    On-disk locations of one collection: its snapshots directory plus the
+    legacy flat files {index, vectors, chunks, metadata_json, bm25}, which
+    are only read until the collection's first snapshot is published.
+    """
+    if collection == DEFAULT_COLLECTION:
+        return {
+            "snapshots": config.SNAPSHOTS_DIR,
+            "index": config.VECTOR_STORE_PATH,
+            "vectors": config.VECTORS_PATH,
+            "chunks": config.CHUNK_STORE_DIR,
+            "metadata_json": config.METADATA_PATH,
+            "bm25": config.BM25_PATH,
+        }
+
+    base = Path(config.COLLECTIONS_DIR) / validate_collection(collection)
+    return {
+        "snapshots": str(base / "snapshots"),
+        "index": str(base / "faiss.index"),
+        "vectors": str(base / "vectors.f32"),
+        "chunks": str(base / "chunks"),
+        "metadata_json": str(base / "metadata.json"),
+        "bm25": str(base / "bm25"),
+    }
+
+
+def list_collections() -> List[str]:
+    """Collections that have a built index (default first)."""
+    names = []
+    if _is_built(collection_paths(DEFAULT_COLLECTION)):
+        names.append(DEFAULT_COLLECTION)
+
+    root = Path(config.COLLECTIONS_DIR)
+    if root.is_dir():
+        for d in sorted(root.iterdir()):
+            if _NAME_RE.match(d.name) and d.name != DEFAULT_COLLECTION and _is_built(collection_paths(d.name)):
+                names.append(d.name)
+    return names
+
+
+def _is_built(paths: Dict[str, str]) -> bool:
+    return os.path.exists(os.path.join(paths["snapshots"], POINTER_FILE)) or os.path.exists(paths["index"])
@@ -0,0 +1,187 @@
+# utils/context_assembler.py
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from utils.collection import DEFAULT_COLLECTION
+
+# Local BPE tokenizer (no network); falls back to a regex estimate if missing
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# ----------------------------
+# TOKEN COUNTING
+# ----------------------------
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_encoding = [None]
+
+
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    if _encoding[0] is None:
+        try:
+            _encoding[0] = tiktoken.get_encoding(config.CONTEXT_TOKENIZER)
+        except Exception:
+            # encoding files not available offline -> regex estimate
+            return None
+    return _encoding[0]
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` that fits in `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    enc = _get_encoding()
+    if enc is not None:
+        ids = enc.encode(text)
+        return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens])
+
+    for i, m in enumerate(_TOKEN_RE.finditer(text)):
+        if i == max_tokens:
+            return text[: m.start()].rstrip()
+    return text
+
+
+# ----------------------------
+# OVERLAP REMOVAL
+# ----------------------------
+def _overlap_len(prev: str, nxt: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `prev` that is also a prefix of `nxt`."""
+    tail = prev[-max_overlap:] if max_overlap else ""
+    for i in range(len(tail)):
+        if nxt.startswith(tail[i:]):
+            return len(tail) - i
+    return 0
+
+
+def _merge_groups(retrieved: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Group hits into runs of consecutive chunk_ids of the same document (of
+    the same collection: doc_ids are only unique within one).
+    Runs are ordered by their best-ranked member; chunks inside a run by chunk_id.
+    """
+    by_doc: Dict[Tuple[Optional[str], str], List[Tuple[int, Dict[str, Any]]]] = {}
+    for rank, r in enumerate(retrieved):
+        by_doc.setdefault((r.get("collection"), r["doc_id"]), []).append((rank, r))
+
+    runs: List[Tuple[int, List[Dict[str, Any]]]] = []
+    for hits in by_doc.values():
+        hits.sort(key=lambda h: h[1]["chunk_id"])
+        best, run = hits[0][0], [hits[0][1]]
+        for rank, r in hits[1:]:
+            if r["chunk_id"] == run[-1]["chunk_id"]:
+                best = min(best, rank)   # duplicate hit
+                continue
+            if r["chunk_id"] == run[-1]["chunk_id"] + 1:
+                run.append(r)
+                best = min(best, rank)
+            else:
+                runs.append((best, run))
+                best, run = rank, [r]
+        runs.append((best, run))
+
+    runs.sort(key=lambda x: x[0])
+    return [run for _, run in runs]
+
+
+def _run_parts(run: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(citation id, text) per chunk of a run, minus the text shared with the previous chunk."""
+    # chunks are stripped after splitting, so allow a little slack over CHUNK_OVERLAP
+    max_overlap = config.CHUNK_OVERLAP + 16
+    parts: List[Tuple[str, str]] = []
+    prev = None
+    for r in run:
+        text = r["text"]
+        if prev is not None:
+            cut = _overlap_len(prev, text, max_overlap)
+            if cut >= config.CONTEXT_MIN_OVERLAP:
+                text = text[cut:].lstrip()
+        parts.append((_cite(r), text))
+        prev = r["text"]
+    return parts
+
+
+# ----------------------------
+# CONTEXT ASSEMBLY
+# ----------------------------
+def _cite(r: Dict[str, Any]) -> str:
+    """
+    Citation id of a hit ("<collection>/<doc_id>#<chunk_id>" outside the
+    default collection), plus the near-duplicate chunks folded into it at ingest.
+    """
+    collection = r.get("collection")
+    prefix = f"{collection}/" if collection and collection != DEFAULT_COLLECTION else ""
+    cite = f"{prefix}{r['doc_id']}#{r['chunk_id']}"
+    aliases = r.get("aliases")
+    if aliases:
+        cite += " (same text: " + ", ".join(f"{prefix}{a['doc_id']}#{a['chunk_id']}" for a in aliases) + ")"
+    return cite
+
+
+def _snippet_line(cite: str, text: str) -> str:
+    return f"[Snippet ID: {cite}] {text}"
+
+
+def assemble_context(
+    retrieved: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the snippet section of the system prompt from retrieve() results.
+
+    - adjacent chunks of the same document are emitted together and the
+      overlapping span they share is sent only once
+    - every chunk keeps its own "[Snippet ID: <doc_id>#<chunk_id>]" marker
+      (prefixed with "<collection>/" outside the default collection), so
+      citations still point at real chunks (near-duplicates folded into
+      it at ingest are listed in the marker and can be cited as well)
+    - runs are added in retrieval order until `token_budget` tokens
+      (config.CONTEXT_TOKEN_BUDGET, 0 = unlimited); the chunk that crosses
+      the budget is truncated, everything after it is dropped
+
+    Returns (text, stats) with stats = {tokens_in, tokens_out, snippets_in, snippets_out}.
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    stats = {
+        "tokens_in": sum(count_tokens(_snippet_line(_cite(r), r["text"])) for r in retrieved),
+        "tokens_out": 0,
+        "snippets_in": len(retrieved),
+        "snippets_out": 0,
+    }
+
+    lines: List[str] = []
+    used = 0
+    full = False
+    for run in _merge_groups(retrieved):
+        for cite, text in _run_parts(run):
+            line = _snippet_line(cite, text)
+            cost = count_tokens(line)
+            if budget and used + cost > budget:
+                remaining = budget - used
+                if remaining >= config.CONTEXT_MIN_TAIL_TOKENS:
+                    lines.append(truncate_to_tokens(line, remaining))
+                    used = budget
+                    stats["snippets_out"] += 1
+                full = True
+                break
+            lines.append(line)
+            used += cost
+            stats["snippets_out"] += 1
+        if full:
+            break
+        lines.append("")   # blank line between runs
+
+    stats["tokens_out"] = used
+    return "\n".join(lines).rstrip("\n"), stats
@@ -0,0 +1,118 @@
+# utils/dedup.py
+"""
+Near-duplicate chunk detection with MinHash signatures and LSH banding.
+
+A chunk is reduced to the set of its word shingles (DEDUP_SHINGLE_SIZE
+consecutive words). Its MinHash signature (DEDUP_NUM_PERM values) estimates
+the Jaccard similarity of two shingle sets as the fraction of equal
+positions. Signatures are cut into DEDUP_BANDS bands; chunks that agree on
+a whole band share a bucket and become candidates, and a candidate counts
+as a duplicate when its estimated similarity is >= DEDUP_THRESHOLD.
+
+Signatures are stored with the chunk store (minhash.npy), so incremental
+ingests compare new chunks against the existing index without re-reading it.
+Changing DEDUP_NUM_PERM or DEDUP_SHINGLE_SIZE needs a full rebuild.
+"""
+import hashlib
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from config import config
+
+
+_WORD_RE = re.compile(r"\w+")
+_SEED = 1  # fixed: stored signatures must stay comparable across runs
+
+
+def shingle_hashes(text: str, size: int) -> np.ndarray:
+    """Stable 64-bit hashes of the distinct word `size`-grams of `text`."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams],
+        dtype="uint64",
+    )
+
+
+class MinHasher:
+    """num_perm multiply-shift hash functions; signature = per-function minimum."""
+
+    def __init__(self, num_perm: int, seed: int = _SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> Optional[np.ndarray]:
+        if hashes.size == 0:
+            return None
+        # uint64 arithmetic wraps, which is what multiply-shift hashing wants
+        h = (hashes[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)
+        return h.min(axis=0).astype("uint32")
+
+
+class NearDuplicateIndex:
+    """
+    LSH buckets over the signatures of rows kept so far.
+    find() returns the row a new chunk duplicates (or None); add() registers
+    a kept row. Signatures live in one growable (n, num_perm) uint32 buffer.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        shingle_size: Optional[int] = None,
+    ):
+        self.threshold = config.DEDUP_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm or config.DEDUP_NUM_PERM
+        self.bands = bands or config.DEDUP_BANDS
+        self.shingle_size = shingle_size or config.DEDUP_SHINGLE_SIZE
+        if self.num_perm % self.bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({self.num_perm}) must be a multiple of DEDUP_BANDS ({self.bands}).")
+        self.rows_per_band = self.num_perm // self.bands
+
+        self.hasher = MinHasher(self.num_perm)
+        self._buckets: List[dict] = [{} for _ in range(self.bands)]   # band hash -> [slot, ...]
+        self._sigs = np.zeros((1024, self.num_perm), dtype="uint32")
+        self._rows: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        return self.hasher.signature(shingle_hashes(text, self.shingle_size))
+
+    def _band_keys(self, sig: np.ndarray) -> List[int]:
+        return [hash(band.tobytes()) for band in sig.reshape(self.bands, self.rows_per_band)]
+
+    def find(self, sig: np.ndarray) -> Optional[int]:
+        """Row of the most similar kept chunk with similarity >= threshold, else None."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+        slots = np.fromiter(sorted(candidates), dtype="int64", count=len(candidates))
+        sims = np.mean(self._sigs[slots] == sig, axis=1)
+        best = int(np.argmax(sims))   # first (= earliest kept) slot among equals
+        return self._rows[slots[best]] if sims[best] >= self.threshold else None
+
+    def add(self, row: int, sig: np.ndarray) -> None:
+        slot = len(self._rows)
+        if slot == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.zeros_like(self._sigs)])
+        self._sigs[slot] = sig
+        self._rows.append(row)
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(key, []).append(slot)
+
+
+def format_dedup_report(duplicates: int, ratio: float, bytes_saved: Optional[int]) -> str:
+    saved = f", ~{bytes_saved / 1e6:.2f} MB of index + vectors saved" if bytes_saved else ""
+    return f"[dedup] {duplicates} near-duplicate chunks aliased ({ratio:.1%} of new chunks){saved}"
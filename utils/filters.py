@@ -0,0 +1,89 @@
+# utils/filters.py
+from datetime import date, datetime, time as dt_time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from utils.chunk_store import ChunkStore
+
+
+# Filter spec accepted by retrieve() / retrieve_collections():
+#   {"doc_ids": [...], "ingested_after": ts, "ingested_before": ts}
+# every key is optional; timestamps are unix seconds, after inclusive, before exclusive.
+# Restricting collections is done by choosing which collections to search.
+Timestamp = Union[int, float, date, datetime, None]
+
+
+def _to_ts(value: Timestamp) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime.combine(value, dt_time.min).timestamp()
+    return float(value)
+
+
+def make_filters(
+    doc_ids: Optional[Iterable[str]] = None,
+    ingested_after: Timestamp = None,
+    ingested_before: Timestamp = None,
+) -> Optional[Dict[str, Any]]:
+    """Normalized filter spec, or None when nothing is restricted."""
+    filters: Dict[str, Any] = {}
+    if doc_ids:
+        filters["doc_ids"] = sorted(set(doc_ids))
+    if ingested_after is not None:
+        filters["ingested_after"] = _to_ts(ingested_after)
+    if ingested_before is not None:
+        filters["ingested_before"] = _to_ts(ingested_before)
+    return filters or None
+
+
+def _doc_matches(doc: Dict[str, Any], filters: Dict[str, Any], doc_ids: Optional[set]) -> bool:
+    if doc_ids is not None and doc["doc_id"] not in doc_ids:
+        return False
+    if "ingested_after" in filters or "ingested_before" in filters:
+        ts = doc.get("ingested_at")
+        if ts is None:
+            # indexed before ingest dates were recorded: unknown date never matches a range
+            return False
+        if ts < filters.get("ingested_after", float("-inf")):
+            return False
+        if ts >= filters.get("ingested_before", float("inf")):
+            return False
+    return True
+
+
+def filter_mask(metadata: Sequence[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """
+    Boolean mask over metadata rows (= FAISS ids) matching `filters`, or None
+    when unfiltered. For a ChunkStore only the per-document table is checked
+    and matching rows come from the document postings written at ingest.
+    """
+    if not filters:
+        return None
+
+    doc_ids = set(filters["doc_ids"]) if filters.get("doc_ids") else None
+    mask = np.zeros(len(metadata), dtype=bool)
+
+    if isinstance(metadata, ChunkStore):
+        positions = [i for i, d in enumerate(metadata.docs) if _doc_matches(d, filters, doc_ids)]
+        mask[metadata.rows_of_docs(positions)] = True
+    else:
+        for i, m in enumerate(metadata):
+            mask[i] = _doc_matches(m, filters, doc_ids)
+
+    return mask
+
+
+def list_documents(metadata: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One {doc_id, doc_hash, ingested_at} entry per indexed document."""
+    if isinstance(metadata, ChunkStore):
+        return [dict(d) for d in metadata.docs]
+
+    docs: Dict[str, Dict[str, Any]] = {}
+    for m in metadata:
+        if m["doc_id"] not in docs:
+            docs[m["doc_id"]] = {k: m[k] for k in ("doc_id", "doc_hash", "ingested_at") if k in m}
+    return list(docs.values())
@@ -0,0 +1,106 @@
+# utils/history.py
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config import config
+from utils.context_assembler import count_tokens, truncate_to_tokens
+
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a compliance Q&A conversation.
+Merge the existing summary with the new turns into one short summary.
+Keep: the questions asked, the policy facts given in answers, and their citations ([doc_id#chunk_id]).
+Drop: greetings, repetition and wording details.
+Write at most {max_tokens} tokens of plain text.
+"""
+
+
+def new_history_state() -> Dict[str, Any]:
+    """Per-session summary cache: `summary` covers messages[:covered]."""
+    return {"summary": "", "covered": 0}
+
+
+def _transcript(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+
+
+def _fallback_summary(summary: str, messages: List[Dict[str, str]]) -> str:
+    """LLM-free summary: the earlier questions, used if the summarization call fails."""
+    asked = [m["content"].strip() for m in messages if m["role"] == "user"]
+    parts = [summary] if summary else []
+    if asked:
+        parts.append("Earlier questions: " + "; ".join(asked))
+    return "\n".join(parts)
+
+
+def summarize_turns(chat_model, summary: str, messages: List[Dict[str, str]]) -> str:
+    """Fold `messages` into the rolling `summary` with one LLM call."""
+    max_tokens = config.HISTORY_SUMMARY_MAX_TOKENS
+    prompt = SUMMARY_PROMPT.format(max_tokens=max_tokens)
+    body = f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{_transcript(messages)}"
+
+    try:
+        new_summary = chat_model.invoke([SystemMessage(content=prompt), HumanMessage(content=body)]).content.strip()
+    except Exception as e:
+        print(f"History summarization failed, using fallback: {e}")
+        new_summary = _fallback_summary(summary, messages)
+
+    return truncate_to_tokens(new_summary, max_tokens)
+
+
+def compact_history(
+    messages: List[Dict[str, str]],
+    state: Dict[str, Any],
+    chat_model=None,
+) -> Tuple[List[Dict[str, str]], str]:
+    """
+    Bound the conversation sent to the LLM.
+
+    - the last config.HISTORY_KEEP_TURNS turns (user + assistant pairs) and
+      the current question are kept verbatim
+    - older messages are folded into a rolling summary stored in `state`
+      (see new_history_state()); it is only re-summarized once
+      config.HISTORY_SUMMARY_REFRESH_TURNS more turns have aged out, until
+      then those few messages are sent verbatim
+    - summary + messages are capped at config.HISTORY_MAX_TOKENS by dropping
+      the oldest verbatim messages (never the current question), then by
+      truncating the summary
+
+    Returns (messages_to_send, summary).
+    """
+    keep = 2 * config.HISTORY_KEEP_TURNS + 1   # +1 = current question
+    older = messages[:-keep] if len(messages) > keep else []
+    recent = messages[len(older):]
+
+    # Messages can only disappear from the front if the chat was cleared
+    if state.get("covered", 0) > len(older):
+        state.update(new_history_state())
+
+    pending = older[state["covered"]:]
+    if chat_model is not None and len(pending) >= 2 * config.HISTORY_SUMMARY_REFRESH_TURNS:
+        state["summary"] = summarize_turns(chat_model, state["summary"], pending)
+        state["covered"] = len(older)
+        pending = []
+
+    summary: str = state["summary"]
+    window = pending + recent
+
+    budget = config.HISTORY_MAX_TOKENS
+    if budget:
+        costs = [count_tokens(m["content"]) for m in window]
+        total = count_tokens(summary) + sum(costs)
+        while total > budget and len(window) > 1:
+            total -= costs.pop(0)
+            window = window[1:]
+        if total > budget:
+            summary = truncate_to_tokens(summary, max(0, budget - costs[0]))
+
+    return window, summary
+
+
+def format_summary(summary: Optional[str]) -> str:
+    """Block appended to the system prompt (empty when there is no summary)."""
+    if not summary:
+        return ""
+    return f"\nSummary of the earlier conversation (for context only, not a policy source):\n{summary}\n"
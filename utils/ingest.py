@@ -1,12 +1,43 @@
 # utils/ingest.py
+from __future__ import annotations
+
 import os
 import json
 import re
+import time
+import shutil
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Callable, Optional, Iterator, Iterable, Sequence
 
 from config import config
-from models.embeddings import embed_texts
+from models.embeddings import embed_array, get_embedding_cache
+from utils.bm25 import BM25Builder
+from utils.tracing import span, traced
+from utils.collection import DEFAULT_COLLECTION, collection_paths, validate_collection
+from utils.dedup import NearDuplicateIndex, format_dedup_report
+from utils.snapshots import begin_snapshot, files_in, publish_snapshot, snapshot_paths
+from utils.chunk_store import (
+    DOC_FIELDS,
+    ChunkStore,
+    ChunkStoreWriter,
+    JsonChunkWriter,
+    chunk_store_exists,
+    load_metadata,
+)
+from utils.vector_index import (
+    add_blocks,
+    build_faiss_index,
+    format_recall_report,
+    index_is_lossy,
+    index_matches_config,
+    load_vectors,
+    recall_report,
+    reconstruct_all,
+)
 
 # PDF reading
 try:
@@ -14,40 +45,48 @@ try:
 except ImportError:
     PdfReader = None
 
-# Text splitter (LangChain 0.2+)
-try:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-except ImportError as e:
-    raise RuntimeError(
-        "langchain-text-splitters is required. Install with:\n\n"
-        "    pip install langchain-text-splitters\n"
-    ) from e
-
 import numpy as np
-import faiss
+
+from utils.lazy_import import lazy_import
+
+# imported on first use to keep app start-up fast
+faiss = lazy_import("faiss")
+
+
+def _text_splitter_cls():
+    """RecursiveCharacterTextSplitter, imported on first use (LangChain 0.2+)."""
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError as e:
+        raise RuntimeError(
+            "langchain-text-splitters is required. Install with:\n\n"
+            "    pip install langchain-text-splitters\n"
+        ) from e
+    return RecursiveCharacterTextSplitter
 
 
 # ----------------------------
 # TEXT EXTRACTION
 # ----------------------------
-def extract_text_from_pdf(path: str) -> str:
-    """Extract text from a PDF file using pypdf."""
+def _clean_page(txt: str) -> str:
+    t = txt.replace("\r", "\n")
+    t = re.sub(r"\n{2,}", "\n\n", t)
+    return t.strip()
+
+
+def _extract_pdf_pages(path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extract + clean pages [start, end) of a PDF. Runs inside pool workers."""
     if PdfReader is None:
         raise RuntimeError("pypdf is required to read PDFs. Install with: pip install pypdf")
 
     reader = PdfReader(path)
-    pages = []
-    for page in reader.pages:
-        txt = page.extract_text() or ""
-        pages.append(txt)
+    pages = reader.pages[start:end]
+    return [_clean_page(page.extract_text() or "") for page in pages]
 
-    cleaned = []
-    for p in pages:
-        t = p.replace("\r", "\n")
-        t = re.sub(r"\n{2,}", "\n\n", t)
-        cleaned.append(t.strip())
 
-    return "\n\n".join(cleaned)
+def extract_text_from_pdf(path: str) -> str:
+    """Extract text from a PDF file using pypdf."""
+    return "\n\n".join(_extract_pdf_pages(path))
 
 
 def extract_text_from_txt(path: str) -> str:
@@ -58,6 +97,118 @@ def extract_text_from_txt(path: str) -> str:
     return t.strip()
 
 
+# ----------------------------
+# PARALLEL EXTRACTION
+# ----------------------------
+def _extract_task(path: str, start: int, end: Optional[int]) -> Tuple[List[str], float]:
+    """One unit of pool work: a page range of a PDF, or a whole TXT file."""
+    t0 = time.perf_counter()
+    if Path(path).suffix.lower() == ".pdf":
+        parts = _extract_pdf_pages(path, start, end)
+    else:
+        parts = [extract_text_from_txt(path)]
+    return parts, time.perf_counter() - t0
+
+
+def _plan_tasks(path: str) -> List[Tuple[str, int, Optional[int]]]:
+    """Split large PDFs into page ranges of config.PDF_PAGES_PER_TASK."""
+    if Path(path).suffix.lower() != ".pdf" or PdfReader is None:
+        return [(path, 0, None)]
+
+    n_pages = len(PdfReader(path).pages)
+    step = max(1, config.PDF_PAGES_PER_TASK)
+    return [(path, start, min(start + step, n_pages)) for start in range(0, n_pages, step)] or [(path, 0, None)]
+
+
+def _run_inline(*task) -> Future:
+    """Same interface as pool.submit(_extract_task, ...), run in this process."""
+    fut: Future = Future()
+    try:
+        fut.set_result(_extract_task(*task))
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
+
+
+def extract_documents(paths: List[str], workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Extract text from many PDF/TXT files, spreading whole files and page
+    ranges of large PDFs over a process pool (config.INGEST_WORKERS).
+
+    Yields one dict per path, in input order:
+      { path, text, pages, seconds, error }
+    `seconds` is the summed extraction time of the file's tasks. A failing
+    file yields text=None and the error message instead of aborting the batch.
+    Only about 2 tasks per worker run ahead of the consumer, so memory does
+    not grow with the corpus when the caller is slower than extraction.
+    """
+    workers = workers or config.INGEST_WORKERS or os.cpu_count() or 1
+
+    plans: List[Tuple[str, Any]] = []
+    for path in paths:
+        try:
+            plans.append((path, _plan_tasks(path)))
+        except Exception as e:
+            plans.append((path, e))
+
+    n_tasks = sum(len(plan) for _, plan in plans if isinstance(plan, list))
+
+    def collect(submit, max_in_flight: int) -> Iterator[Dict[str, Any]]:
+        # At most `max_in_flight` tasks are submitted and not yet consumed, so
+        # extracted text cannot pile up ahead of the (slower) embedding stage
+        tasks = deque(
+            (i, task) for i, (_, plan) in enumerate(plans) if isinstance(plan, list) for task in plan
+        )
+        futures: List[List[Future]] = [[] for _ in plans]
+        in_flight = 0
+
+        def top_up() -> None:
+            nonlocal in_flight
+            while tasks and in_flight < max_in_flight:
+                i, task = tasks.popleft()
+                futures[i].append(submit(*task))
+                in_flight += 1
+
+        for i, (path, plan) in enumerate(plans):
+            result = {"path": path, "text": None, "pages": 0, "seconds": 0.0, "error": None}
+            if isinstance(plan, Exception):
+                result["error"] = str(plan)
+                yield result
+                continue
+
+            parts: List[str] = []
+            for k in range(len(plan)):
+                top_up()   # tasks are submitted in order, so this file's k-th one is in flight now
+                fut, futures[i][k] = futures[i][k], None
+                in_flight -= 1
+                try:
+                    task_parts, task_seconds = fut.result()
+                except Exception as e:
+                    result["error"] = result["error"] or str(e)
+                    continue
+                parts.extend(task_parts)
+                result["seconds"] += task_seconds
+            futures[i] = []
+
+            if result["error"] is None:
+                result["text"] = "\n\n".join(parts)
+                if Path(path).suffix.lower() == ".pdf":
+                    result["pages"] = len(parts)
+            yield result
+
+    # Pool start-up costs more than it saves for a single task
+    if workers <= 1 or n_tasks <= 1:
+        yield from collect(_run_inline, 1)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, n_tasks))
+    try:
+        yield from collect(lambda *task: pool.submit(_extract_task, *task), 2 * min(workers, n_tasks))
+    finally:
+        # a consumer that stops early (error, cancelled job) must not wait for the rest
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
 # ----------------------------
 # CHUNKING
 # ----------------------------
@@ -66,7 +217,7 @@ def chunk_text(text: str, doc_id: str) -> List[Dict[str, Any]]:
     Chunk text using RecursiveCharacterTextSplitter.
     Chunk size & overlap are in characters (from config).
     """
-    splitter = RecursiveCharacterTextSplitter(
+    splitter = _text_splitter_cls()(
         chunk_size=config.CHUNK_SIZE,          # e.g. 1200 chars
         chunk_overlap=config.CHUNK_OVERLAP,    # e.g. 200 chars
         separators=["\n\n", "\n", ".", " "],
@@ -91,77 +242,529 @@ def chunk_text(text: str, doc_id: str) -> List[Dict[str, Any]]:
 
 
 # ----------------------------
-# MAIN INGEST FUNCTION
+# DOCUMENT FINGERPRINTS
 # ----------------------------
-def index_documents(
-    file_paths: List[str],
-    save_index: bool = True,
-    debug: bool = False,
-) -> Tuple[faiss.Index, List[Dict[str, Any]]]:
-    """
-    Ingest PDF/TXT files, chunk them, embed chunks with HF embeddings,
-    build a FAISS L2 index and save index + metadata.
+def file_sha256(path: str) -> str:
+    """Content hash of a source file; used to skip unchanged documents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_existing_index(
+    collection: str = DEFAULT_COLLECTION,
+) -> Tuple[Optional[faiss.Index], Sequence[Dict[str, Any]], Optional[np.ndarray]]:
+    """Open the published index, metadata (lazy) and full-precision vectors, else (None, [], None)."""
+    paths = snapshot_paths(collection)
+    if not os.path.exists(paths["index"]):
+        return None, [], None
+    if not (chunk_store_exists(paths["chunks"]) or os.path.exists(paths["metadata_json"])):
+        return None, [], None
+
+    index = faiss.read_index(paths["index"])
+    metadata = load_metadata(collection, paths)
+
+    if index.ntotal != len(metadata):
+        raise RuntimeError(
+            f"Existing index has {index.ntotal} vectors but metadata has {len(metadata)} chunks. "
+            "Run a full rebuild (incremental=False)."
+        )
 
-    Returns:
-        (faiss_index, metadata_list)
+    vectors = load_vectors(index.d, paths["vectors"])
+    if vectors is None or len(vectors) != index.ntotal:
+        # indexes saved before the vector file existed were always flat, so this is exact
+        vectors = reconstruct_all(index)
+
+    return index, metadata, vectors
+
+
+def _indexed_hashes(metadata: Sequence[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    if isinstance(metadata, ChunkStore):
+        return {d["doc_id"]: d.get("doc_hash") for d in metadata.docs}
+    return {m["doc_id"]: m.get("doc_hash") for m in metadata}
+
+
+def _rows_of(metadata: Sequence[Dict[str, Any]], doc_ids: set) -> np.ndarray:
+    """Boolean mask over metadata rows belonging to `doc_ids` (no text decoding)."""
+    if isinstance(metadata, ChunkStore):
+        hit = np.array([d["doc_id"] in doc_ids for d in metadata.docs], dtype=bool)
+        return hit[np.asarray(metadata.doc_index)] if len(metadata) else np.zeros(0, dtype=bool)
+    return np.array([m["doc_id"] in doc_ids for m in metadata], dtype=bool)
+
+
+def _aliased_rows(metadata: Sequence[Dict[str, Any]], dropped: np.ndarray, removed: set) -> np.ndarray:
+    """Rows about to be dropped that still hold near-duplicates of surviving documents."""
+    keep = np.zeros(len(dropped), dtype=bool)
+    if isinstance(metadata, ChunkStore):
+        for row, aliases in metadata.aliases.items():
+            if dropped[row] and any(a["doc_id"] not in removed for a in aliases):
+                keep[row] = True
+    return keep
+
+
+# ----------------------------
+# STREAMING STAGES
+# ----------------------------
+def _chunk_stream(
+    extracted: Iterable[Dict[str, Any]],
+    docs: Dict[str, Tuple[str, str]],
+    files: Dict[str, Dict[str, Any]],
+    failed: set,
+    ingested_at: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """extract -> chunk: yields chunk dicts, recording per-file results as it goes."""
+    for result in extracted:
+        doc_id = Path(result["path"]).name
+        files[doc_id] = {k: result[k] for k in ("pages", "seconds", "error")}
+
+        if result["error"] is not None:
+            # Keep whatever version of this document is already indexed
+            failed.add(doc_id)
+            print(f"Extraction failed for {doc_id}: {result['error']}")
+            continue
+
+        for c in chunk_text(result["text"], doc_id):
+            c["doc_hash"] = docs[doc_id][1]
+            if ingested_at is not None:
+                c["ingested_at"] = ingested_at   # for ingest-date filters
+            yield c
+
+
+def _dedup_stream(
+    chunks: Iterable[Dict[str, Any]],
+    dedup: NearDuplicateIndex,
+    first_row: int,
+    aliases: Dict[int, List[Tuple[str, int, Dict[str, Any]]]],
+) -> Iterator[Dict[str, Any]]:
+    """
+    chunk -> chunk minus near-duplicates of kept ones. A duplicate is not
+    yielded (so never embedded or indexed) but recorded in aliases[row] of
+    the chunk it duplicates as (doc_id, chunk_id, doc fields), without its
+    text; yielded chunks become rows first_row, +1, ...
+    """
+    doc_fields: Dict[str, Dict[str, Any]] = {}   # shared by all duplicates of a document
+    row = first_row
+    for c in chunks:
+        sig = dedup.signature(c["text"])
+        if sig is not None:
+            match = dedup.find(sig)
+            if match is not None:
+                doc = doc_fields.setdefault(c["doc_id"], {f: c[f] for f in DOC_FIELDS if f in c})
+                aliases.setdefault(match, []).append((c["doc_id"], int(c["chunk_id"]), doc))
+                continue
+            dedup.add(row, sig)
+        c["minhash"] = sig
+        row += 1
+        yield c
+
+
+def _register_kept(dedup: NearDuplicateIndex, chunks: List[Dict[str, Any]], first_row: int) -> None:
+    """Add already indexed chunks to the LSH index (stored signature, else computed from the text)."""
+    for row, c in enumerate(chunks, start=first_row):
+        sig = c.get("minhash")
+        if sig is None or len(sig) != dedup.num_perm or not sig.any():
+            sig = c["minhash"] = dedup.signature(c["text"])
+        if sig is not None:
+            dedup.add(row, sig)
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _embed_stream(
+    batches: Iterable[List[Dict[str, Any]]],
+    timings: Optional[Dict[str, float]] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """chunk batches -> (chunks, normalized float32 embeddings); embed time summed into timings["embed"]."""
+    for batch in batches:
+        t0 = time.perf_counter()
+        # contiguous float32, already L2-normalized by the backend / cache
+        xb = embed_array([c["text"] for c in batch], use_cache=True)
+        if timings is not None:
+            timings["embed"] = timings.get("embed", 0.0) + time.perf_counter() - t0
+        yield batch, xb
+
+
+def _carry_over(chunk: Dict[str, Any], docs: Dict[str, Dict[str, Any]], removed: set) -> Dict[str, Any]:
+    """
+    An existing chunk as it is rewritten: aliases of `removed` documents are
+    dropped, and a chunk whose own document is removed is handed to its
+    first remaining alias (near-identical text, so its vector still fits).
+    """
+    chunk = dict(chunk)
+    aliases = [{**docs.get(a["doc_id"], {}), **a} for a in chunk.pop("aliases", ()) if a["doc_id"] not in removed]
+    if chunk["doc_id"] in removed and aliases:
+        owner, aliases = aliases[0], aliases[1:]
+        chunk = {**{k: v for k, v in chunk.items() if k not in DOC_FIELDS}, **owner}
+    if aliases:
+        chunk["aliases"] = aliases
+    return chunk
+
+
+def _copy_rows(
+    metadata: Sequence[Dict[str, Any]],
+    vectors: np.ndarray,
+    mask: np.ndarray,
+    removed: set = frozenset(),
+) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """Existing (chunks, vectors) batches for the rows selected by `mask` (see _carry_over)."""
+    rows = np.flatnonzero(mask)
+    docs = {d["doc_id"]: d for d in metadata.docs} if isinstance(metadata, ChunkStore) else {}
+    minhash = getattr(metadata, "minhash", None)
+    for start in range(0, len(rows), config.INGEST_BATCH_SIZE):
+        sel = rows[start : start + config.INGEST_BATCH_SIZE]
+        chunks = [_carry_over(metadata[int(r)], docs, removed) for r in sel]
+        if minhash is not None:
+            for c, sig in zip(chunks, np.asarray(minhash[sel])):
+                c["minhash"] = sig
+        yield chunks, np.asarray(vectors[sel], dtype="float32")
+
+
+class _IngestSink:
+    """
+    Final stage: appends each (chunks, vectors) batch to the staged metadata,
+    the raw float32 vector file and the BM25 postings. Memory stays bounded
+    by the batch size; the FAISS index is built afterwards from the vector file.
     """
-    all_chunks: List[Dict[str, Any]] = []
 
-    for path in file_paths:
-        path = str(path)
-        ext = Path(path).suffix.lower()
+    def __init__(self, paths: Dict[str, str]):
+        self.paths = paths
+        self.count = 0
+        self.dim: Optional[int] = None
 
-        if ext == ".pdf":
-            text = extract_text_from_pdf(path)
+        if config.METADATA_FORMAT == "binary":
+            self.meta = ChunkStoreWriter(paths["metadata"])
         else:
-            text = extract_text_from_txt(path)
+            self.meta = JsonChunkWriter(paths["metadata"])
+        self.bm25 = BM25Builder(paths["bm25"]) if config.BM25_ENABLED else None
+        self._vectors = open(paths["vectors"], "wb")
 
-        doc_id = Path(path).name
-        chunks = chunk_text(text, doc_id)
-        all_chunks.extend(chunks)
+    def add(self, chunks: List[Dict[str, Any]], xb: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = xb.shape[1]
+        self.meta.add_many(chunks)
+        if self.bm25 is not None:
+            self.bm25.add(c["text"] for c in chunks)
+        np.ascontiguousarray(xb, dtype="float32").tofile(self._vectors)
+        self.count += len(chunks)
 
-    if not all_chunks:
-        raise RuntimeError("No chunks produced from the provided documents.")
+    def add_alias(self, row: int, chunk: Dict[str, Any]) -> None:
+        self.meta.add_alias(row, chunk)
 
-    # Texts to embed
-    texts = [c["text"] for c in all_chunks]
+    def close(self) -> None:
+        self._vectors.close()
+        self.meta.close()
+        if self.bm25 is not None:
+            self.bm25.finish()
 
-    # Embed in batches to avoid memory issues
-    embeddings: List[List[float]] = []
-    batch_size = 32
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
-        embs = embed_texts(batch)
-        embeddings.extend(embs)
 
-    # Convert to numpy array
-    xb = np.array(embeddings, dtype="float32")
-    # Normalize for L2 similarity (optional but good practice)
-    faiss.normalize_L2(xb)
+class IngestCancelled(Exception):
+    """Raised by a progress callback to abort index_documents() before anything is published."""
 
-    dim = xb.shape[1]
-    index = faiss.IndexFlatL2(dim)
 
-    # ✅ Correct call: pass ONLY the matrix
-    index.add(xb)
+class _Progress:
+    """
+    Per-stage counters of one ingest, pushed to an optional callback as
+    {stage, files_total, files_done, pages, chunks, batches, chunks_embedded}.
+    Stage names match the tracing spans. The callback may raise
+    IngestCancelled; it is never called once publishing has started.
+    """
 
-    # Save index + metadata
-    if save_index:
-        data_dir = Path(config.VECTOR_STORE_PATH).parent
-        data_dir.mkdir(parents=True, exist_ok=True)
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]]):
+        self.callback = callback
+        self.state: Dict[str, Any] = {
+            "stage": "load_existing_index",
+            "files_total": 0, "files_done": 0, "pages": 0,
+            "chunks": 0, "batches": 0, "chunks_embedded": 0,
+        }
+
+    def update(self, stage: Optional[str] = None, **counts: int) -> None:
+        if stage is not None:
+            self.state["stage"] = stage
+        for key, n in counts.items():
+            self.state[key] += n
+        if self.callback is not None:
+            self.callback(dict(self.state))
+
+    def files(self, extracted: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for result in extracted:
+            self.update(files_done=1, pages=result["pages"])
+            yield result
+
+    def chunks(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for c in chunks:
+            self.state["chunks"] += 1   # reported with the next file / batch
+            yield c
 
-        faiss.write_index(index, config.VECTOR_STORE_PATH)
 
-        with open(config.METADATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(all_chunks, f, ensure_ascii=False, indent=2)
+# ----------------------------
+# STAGING / PUBLISH
+# ----------------------------
+def _staged_paths(directory: Path) -> Dict[str, str]:
+    """Where a build writes each artifact inside a snapshot (or scratch) directory."""
+    paths = files_in(directory)
+    return {
+        "index": paths["index"],
+        "vectors": paths["vectors"],
+        "metadata": paths["chunks"] if config.METADATA_FORMAT == "binary" else paths["metadata_json"],
+        "bm25": paths["bm25"],
+    }
 
-        if debug:
-            debug_info = {
-                "total_chunks": len(all_chunks),
-                "sample_first": all_chunks[0]["text"] if all_chunks else "",
-                "sample_last": all_chunks[-1]["text"] if all_chunks else "",
-            }
-            with open(data_dir / "ingest_debug.json", "w", encoding="utf-8") as df:
-                json.dump(debug_info, df, ensure_ascii=False, indent=2)
 
-    return index, all_chunks
+# Stats of the most recent index_documents() call (for UI / scripts)
+_last_ingest_stats: Dict[str, Any] = {}
+
+
+def get_last_ingest_stats() -> Dict[str, Any]:
+    return dict(_last_ingest_stats)
+
+
+# ----------------------------
+# MAIN INGEST FUNCTION
+# ----------------------------
+@traced("index_documents")
+def index_documents(
+    file_paths: List[str],
+    save_index: bool = True,
+    debug: bool = False,
+    incremental: bool = False,
+    prune: bool = False,
+    collection: str = DEFAULT_COLLECTION,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Tuple[faiss.Index, Sequence[Dict[str, Any]]]:
+    """
+    Ingest PDF/TXT files, chunk them, embed chunks with HF embeddings,
+    build a FAISS L2 index (config.INDEX_TYPE, vectors stored with
+    config.INDEX_COMPRESSION) and publish index + metadata + float32 vectors
+    + BM25 postings as the collection's next snapshot (utils/snapshots.py),
+    so readers switch to the new build in one step.
+
+    The pipeline streams: extract -> chunk -> embed in batches of
+    config.INGEST_BATCH_SIZE -> append metadata / vectors / BM25 postings,
+    then builds the index from the memory-mapped vector file. Peak memory is
+    bounded by the batch size (plus the index itself), not the corpus size.
+
+    incremental=True only extracts and embeds documents whose content hash
+    changed: new documents are appended, changed ones have their old rows
+    replaced. Indexed documents that are not in `file_paths` are kept unless
+    prune=True. The saved FAISS index is appended to when no row was dropped
+    and it still matches config.INDEX_TYPE / INDEX_COMPRESSION (else it is
+    rebuilt from the stored vectors). What it saves is extraction and
+    embedding: every run still writes a complete new snapshot (chunk store,
+    vector file, BM25 postings, index), so the IO is O(corpus).
+
+    collection: which collection to (re)build; each has its own index files
+    (see utils/collection.py), so other collections stay queryable meanwhile.
+
+    progress: optional callback receiving per-stage counters (see _Progress);
+    raising IngestCancelled from it aborts the run and discards the staged
+    files, leaving the published index untouched.
+
+    Returns:
+        (faiss_index, metadata) - metadata is a lazy ChunkStore when saved
+        in the binary format, otherwise a list of chunk dicts
+    """
+    validate_collection(collection)
+    report = _Progress(progress)
+    report.update()
+
+    # per-file extraction report: {doc_id: {pages, seconds, error}}
+    files: Dict[str, Dict[str, Any]] = {}
+    failed: set = set()
+
+    # doc_id -> (path, content hash)
+    docs: Dict[str, Tuple[str, str]] = {}
+    for path in file_paths:
+        path = str(path)
+        try:
+            docs[Path(path).name] = (path, file_sha256(path))
+        except OSError as e:
+            files[Path(path).name] = {"pages": 0, "seconds": 0.0, "error": str(e)}
+            failed.add(Path(path).name)
+
+    with span("load_existing_index", incremental=incremental, collection=collection):
+        index, metadata, vectors = _load_existing_index(collection) if incremental else (None, [], None)
+
+    indexed_hashes = _indexed_hashes(metadata)
+    unchanged = {d for d, (_, h) in docs.items() if indexed_hashes.get(d) == h}
+    stale = {d for d in docs if d in indexed_hashes and d not in unchanged}
+    # unreadable files count as failed, not deleted: their indexed version is kept
+    deleted = {d for d in indexed_hashes if d not in docs and d not in failed} if prune else set()
+
+    # Existing rows are kept in place (and the saved index reused) only if nothing is dropped;
+    # a dropped row that other documents' near-duplicates point at is kept for them
+    removed = stale | deleted
+    dropped = _rows_of(metadata, removed)
+    dropped &= ~_aliased_rows(metadata, dropped, removed)
+    reuse_index = index is not None and not dropped.any()
+    if not reuse_index:
+        index = None
+
+    # a saved build writes the collection's next snapshot (published in one step at the end),
+    # a dry run a scratch directory
+    stage_dir = begin_snapshot(collection) if save_index else Path(tempfile.mkdtemp(prefix="ingest-"))
+    staged = _staged_paths(stage_dir)
+    snapshot: Optional[str] = None
+
+    cache = get_embedding_cache() if config.EMBEDDING_CACHE_ENABLED else None
+    if cache is not None:
+        hits_before, misses_before = cache.hits, cache.misses
+
+    # near-duplicate detection needs the binary store (aliases are added after their row is written)
+    dedup = NearDuplicateIndex() if config.DEDUP_ENABLED and config.METADATA_FORMAT == "binary" else None
+    aliases: Dict[int, List[Tuple[str, int, Dict[str, Any]]]] = {}
+
+    recall: Optional[Dict[str, Any]] = None
+    sink = _IngestSink(staged)
+    try:
+        # 1) unchanged rows first, so a reused index keeps its ids
+        report.update("copy_unchanged_rows")
+        with span("copy_unchanged_rows") as s:
+            for chunks, xb in _copy_rows(metadata, vectors, ~dropped, removed):
+                if dedup is not None:
+                    _register_kept(dedup, chunks, sink.count)
+                sink.add(chunks, xb)
+            n_kept = sink.count
+            s.set(rows=n_kept)
+
+        # 2) new / changed documents: extract -> chunk -> embed -> append
+        # (stages are interleaved generators, so their times are span attributes)
+        with span("extract_chunk_embed") as s:
+            todo = [path for doc_id, (path, _) in docs.items() if doc_id not in unchanged]
+            report.update("extract_chunk_embed", files_total=len(todo))
+            stage_seconds: Dict[str, float] = {"write": 0.0}
+            extracted = report.files(extract_documents(todo))
+            chunks = report.chunks(_chunk_stream(extracted, docs, files, failed, int(time.time())))
+            if dedup is not None:
+                chunks = _dedup_stream(chunks, dedup, sink.count, aliases)
+            for batch, xb in _embed_stream(_batched(chunks, config.INGEST_BATCH_SIZE), stage_seconds):
+                t0 = time.perf_counter()
+                sink.add(batch, xb)
+                stage_seconds["write"] += time.perf_counter() - t0
+                report.update(batches=1, chunks_embedded=len(batch))
+            n_embedded = sink.count - n_kept
+            n_duplicates = sum(len(dups) for dups in aliases.values())
+            for row, dups in aliases.items():
+                for doc_id, chunk_id, doc in dups:
+                    sink.add_alias(row, {"doc_id": doc_id, "chunk_id": chunk_id, **doc})
+            s.set(
+                files=len(todo),
+                chunks=n_embedded,
+                duplicates=n_duplicates,
+                extract_seconds_total=sum(files[Path(p).name]["seconds"] for p in todo if Path(p).name in files),
+                embed_seconds=stage_seconds.get("embed", 0.0),
+                write_seconds=stage_seconds["write"],
+            )
+
+        # 3) changed documents that failed to extract keep their old rows
+        # (minus rows already kept for aliases; their own duplicates stay unaliased)
+        retry = stale & failed
+        stale -= failed
+        if retry:
+            for chunks, xb in _copy_rows(metadata, vectors, _rows_of(metadata, retry) & dropped):
+                sink.add(chunks, xb)
+
+        sink.close()
+
+        if sink.count == 0:
+            raise RuntimeError("No chunks produced from the provided documents.")
+
+        # 4) FAISS index from the memory-mapped vector file
+        report.update("build_index")
+        # a changed INDEX_TYPE / INDEX_COMPRESSION (or an "auto" encoding outgrown) means a fresh index
+        if reuse_index and not index_matches_config(index, sink.count):
+            reuse_index, index = False, None
+        all_vectors = load_vectors(sink.dim, staged["vectors"])
+        with span("build_index", reuse=reuse_index, vectors=sink.count):
+            if reuse_index:
+                add_blocks(index, all_vectors, start=n_kept)
+            else:
+                index = build_faiss_index(all_vectors)
+        if not reuse_index and (config.INDEX_TYPE != "flat" or index_is_lossy(index)):
+            with span("recall_report"):
+                recall = recall_report(index, all_vectors)
+            print(format_recall_report(recall))
+        del all_vectors
+
+        # FAISS ids are metadata positions; never save a mismatched pair
+        if index.ntotal != sink.count:
+            raise RuntimeError(f"Index/metadata mismatch: {index.ntotal} vectors vs {sink.count} chunks.")
+
+        # last chance to cancel: nothing below reports progress
+        report.update("save_and_publish")
+        if save_index:
+            with span("save_and_publish") as s:
+                faiss.write_index(index, staged["index"])
+                snapshot = publish_snapshot(
+                    collection, stage_dir, {"chunks": sink.count, "metadata_format": config.METADATA_FORMAT}
+                )
+                s.set(snapshot=snapshot)
+                result_meta = load_metadata(collection, snapshot_paths(collection, snapshot))
+        else:
+            if config.METADATA_FORMAT == "binary":
+                result_meta = list(ChunkStore(staged["metadata"]))
+            else:
+                with open(staged["metadata"], "r", encoding="utf-8") as f:
+                    result_meta = json.load(f)
+    finally:
+        # after a publish the staging directory has become the snapshot, so this is a no-op
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+    # what the skipped duplicates would have cost: their vectors plus their share of the index file
+    dedup_ratio = n_duplicates / (n_duplicates + n_embedded) if n_duplicates else 0.0
+    dedup_bytes_saved = None
+    if n_duplicates and save_index and index.ntotal:
+        per_row = os.path.getsize(snapshot_paths(collection, snapshot)["index"]) / index.ntotal + 4 * index.d
+        dedup_bytes_saved = int(n_duplicates * per_row)
+    if dedup is not None:
+        print(format_dedup_report(n_duplicates, dedup_ratio, dedup_bytes_saved))
+
+    cache_hits = cache_misses = 0
+    if cache is not None:
+        cache_hits = cache.hits - hits_before
+        cache_misses = cache.misses - misses_before
+
+    _last_ingest_stats.clear()
+    _last_ingest_stats.update(
+        {
+            "docs_added": len([d for d in docs if d not in indexed_hashes and d not in failed]),
+            "docs_failed": len(failed),
+            "docs_updated": len(stale),
+            "docs_unchanged": len(unchanged),
+            "docs_removed": len(deleted),
+            "chunks_embedded": n_embedded,
+            "chunks_deduplicated": n_duplicates,
+            "dedup_ratio": dedup_ratio,
+            "dedup_bytes_saved": dedup_bytes_saved,
+            "embedding_cache_hits": cache_hits,
+            "embedding_cache_misses": cache_misses,
+            "total_chunks": len(result_meta),
+            "collection": collection,
+            "snapshot": snapshot,
+            "recall": recall,
+            "files": files,
+        }
+    )
+
+    if save_index and debug:
+        debug_info = {
+            "total_chunks": len(result_meta),
+            "sample_first": result_meta[0]["text"] if len(result_meta) else "",
+            "sample_last": result_meta[-1]["text"] if len(result_meta) else "",
+            "stats": get_last_ingest_stats(),
+        }
+        data_dir = Path(collection_paths(collection)["index"]).parent
+        with open(data_dir / "ingest_debug.json", "w", encoding="utf-8") as df:
+            json.dump(debug_info, df, ensure_ascii=False, indent=2)
+
+    return index, result_meta
@@ -0,0 +1,326 @@
+# utils/ingest_jobs.py
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from utils.collection import DEFAULT_COLLECTION, validate_collection
+from utils.ingest import IngestCancelled, get_last_ingest_stats, index_documents
+from utils.snapshots import pid_alive
+
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_PROGRESS_INTERVAL = 0.5  # seconds between progress writes / cancel checks of a running job
+
+_COLUMNS = (
+    "id", "collection", "paths", "incremental", "prune", "state", "progress", "stats",
+    "error", "cancel_requested", "worker", "created", "started", "finished",
+)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class IngestJobQueue:
+    """
+    Persistent FIFO of index_documents() jobs stored in a single SQLite file.
+
+    Any process that opens the queue (the Streamlit app, the API) runs one
+    worker thread; a job is claimed atomically, and never while another job
+    of the same collection is running, so builds of one collection are
+    serialized across processes. A running job writes its per-stage progress
+    (see utils.ingest._Progress) to its row, where the UI / API poll it.
+
+    cancel() drops a queued job at once; a running one stops at its next
+    progress report and its staged files are discarded. A job publishes the
+    collection only when it has finished, so cancelled or failed jobs leave
+    the live index untouched. Jobs left running by a process that died are
+    queued again when the next worker on the same host starts.
+    """
+
+    def __init__(self, path: str, poll_seconds: float = 1.0, keep: int = 200):
+        self.path = str(path)
+        self.poll_seconds = poll_seconds
+        self.keep = keep
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        # autocommit; claim() opens its own write transaction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " collection TEXT NOT NULL,"
+            " paths TEXT NOT NULL,"
+            " incremental INTEGER NOT NULL,"
+            " prune INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"
+            " progress TEXT,"
+            " stats TEXT,"
+            " error TEXT,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " created REAL NOT NULL,"
+            " started REAL,"
+            " finished REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, id)")
+
+    # ------------------------
+    # Rows
+    # ------------------------
+    @staticmethod
+    def _to_job(row: tuple) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["paths"] = json.loads(job["paths"])
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else {}
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        job["incremental"] = bool(job["incremental"])
+        job["prune"] = bool(job["prune"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def _select(self, where: str = "", params: tuple = (), limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs {where} ORDER BY id DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_job(r) for r in rows]
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        jobs = self._select("WHERE id = ?", (int(job_id),))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, limit: int = 20, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent jobs first."""
+        if collection is None:
+            return self._select(limit=limit)
+        return self._select("WHERE collection = ?", (collection,), limit=limit)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: n for state, n in rows}
+
+    # ------------------------
+    # Producer side
+    # ------------------------
+    def submit(
+        self,
+        paths: List[str],
+        collection: str = DEFAULT_COLLECTION,
+        incremental: bool = True,
+        prune: bool = False,
+    ) -> Dict[str, Any]:
+        """Queue an ingest of `paths` into `collection`; returns the new job."""
+        validate_collection(collection)
+        paths = [os.path.abspath(str(p)) for p in paths]
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (collection, paths, incremental, prune, state, created)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (collection, json.dumps(paths), int(incremental), int(prune), QUEUED, time.time()),
+            )
+            job_id = cur.lastrowid
+            if self.keep:
+                self._conn.execute(
+                    f"DELETE FROM jobs WHERE state IN {FINISHED} AND id NOT IN"
+                    f" (SELECT id FROM jobs WHERE state IN {FINISHED} ORDER BY id DESC LIMIT ?)",
+                    (self.keep,),
+                )
+        self._wake.set()
+        return self.get(job_id)
+
+    def cancel(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job now, or ask a running one to stop. Returns the job (None if unknown)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET state = ?, cancel_requested = 1, finished = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), int(job_id), QUEUED),
+            )
+            if not cur.rowcount:
+                self._conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (int(job_id), RUNNING)
+                )
+        return self.get(job_id)
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job has finished (or `timeout` passed); returns its latest state."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["state"] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(min(self.poll_seconds, _PROGRESS_INTERVAL))
+
+    # ------------------------
+    # Worker side
+    # ------------------------
+    def start_worker(self) -> bool:
+        """Start this process's worker thread (once); returns True if this call started it."""
+        with self._lock:
+            if self._worker is not None:
+                return False
+            self._worker = threading.Thread(target=self._work, name="ingest-worker", daemon=True)
+        self._recover()
+        self._worker.start()
+        return True
+
+    def _recover(self) -> None:
+        """Re-queue jobs whose worker process on this host is gone."""
+        host = self.worker_id.rsplit(":", 1)[0]
+        for job in self._select("WHERE state = ?", (RUNNING,)):
+            worker_host, _, pid = (job["worker"] or ":").rpartition(":")
+            if worker_host == host and pid.isdigit() and not pid_alive(int(pid)):
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, worker = NULL, started = NULL, progress = NULL"
+                        " WHERE id = ? AND state = ?",
+                        (QUEUED, job["id"], RUNNING),
+                    )
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Oldest queued job whose collection is not being built elsewhere, marked running."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE state = ? AND collection NOT IN"
+                    " (SELECT collection FROM jobs WHERE state = ?) ORDER BY id LIMIT 1",
+                    (QUEUED, RUNNING),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, started = ? WHERE id = ?",
+                        (RUNNING, self.worker_id, time.time(), row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None if row is None else self.get(row[0])
+
+    def _finish(self, job_id: int, state: str, stats: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, stats = ?, error = ?, finished = ? WHERE id = ?",
+                (state, json.dumps(stats, default=_json_default) if stats is not None else None, error,
+                 time.time(), job_id),
+            )
+
+    def _report(self, job_id: int, progress: Dict[str, Any]) -> bool:
+        """Store progress; returns True if cancellation was requested."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _settle(self, job_id: int, state: str, stats: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """
+        _finish() that keeps trying while the database is locked: a job left
+        running by a live worker would block its collection's queue for good.
+        """
+        while True:
+            try:
+                self._finish(job_id, state, stats=stats, error=error)
+                return
+            except sqlite3.OperationalError as e:
+                print(f"Could not record ingest job {job_id} as {state}, retrying: {e}")
+                time.sleep(self.poll_seconds)
+            except Exception as e:
+                # e.g. stats that do not serialize: keep the job from staying running
+                print(f"Could not record ingest job {job_id} as {state}: {e}")
+                state, stats, error = FAILED, None, f"Could not record the result: {e}"
+
+    def _run(self, job: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        """Runs the job; returns the (state, stats, error) to record for it."""
+        job_id = job["id"]
+        last = {"stage": None, "at": 0.0}
+
+        def on_progress(state: Dict[str, Any]) -> None:
+            now = time.monotonic()
+            if state["stage"] == last["stage"] and now - last["at"] < _PROGRESS_INTERVAL:
+                return
+            last.update(stage=state["stage"], at=now)
+            if self._report(job_id, state):
+                raise IngestCancelled(f"Ingest job {job_id} cancelled.")
+
+        t0 = time.perf_counter()
+        try:
+            # imported here: utils.retriever pulls in the search stack, which the queue itself does not need
+            from utils.retriever import invalidate_index_cache
+
+            index_documents(
+                job["paths"], save_index=True, incremental=job["incremental"], prune=job["prune"],
+                collection=job["collection"], progress=on_progress,
+            )
+            invalidate_index_cache(job["collection"])
+            stats = get_last_ingest_stats()
+            stats["seconds"] = time.perf_counter() - t0
+        except IngestCancelled:
+            return CANCELLED, None, None
+        except Exception as e:
+            print(f"Ingest job {job_id} failed: {e}")
+            return FAILED, None, str(e)
+        return DONE, stats, None
+
+    def _work(self) -> None:
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                # e.g. another process holds the write lock for longer than the timeout
+                print(f"Ingest queue busy: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            try:
+                outcome = self._run(job)
+            except Exception as e:
+                print(f"Ingest job {job['id']} failed: {e}")
+                outcome = (FAILED, None, str(e))
+            self._settle(job["id"], *outcome)
+
+
+# ------------------------
+# SINGLETON
+# ------------------------
+_queue_lock = threading.Lock()
+_job_queue = [None]
+
+
+def get_job_queue(start_worker: bool = True) -> IngestJobQueue:
+    """
+    Opens the on-disk job queue once per process (singleton) and, unless
+    start_worker=False, starts the process's worker thread.
+    """
+    with _queue_lock:
+        if _job_queue[0] is None:
+            _job_queue[0] = IngestJobQueue(
+                config.INGEST_JOBS_PATH,
+                poll_seconds=config.INGEST_JOB_POLL_SECONDS,
+                keep=config.INGEST_JOBS_KEEP,
+            )
+        queue = _job_queue[0]
+    if start_worker:
+        queue.start_worker()
+    return queue
@@ -0,0 +1,55 @@
+# utils/lazy_import.py
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+
+class _LazyModule(ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    The real import goes through importlib.import_module under a lock, so
+    threads touching the module for the first time at once (warm-up, the
+    Streamlit script, the ingest worker, the retrieval pool) all wait for the
+    one complete import instead of seeing a half-initialised module, which
+    importlib.util.LazyLoader allows on Python <= 3.11.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_load(self) -> ModuleType:
+        module: Optional[ModuleType] = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        # only reached for names not set on the stand-in itself
+        return getattr(self._lazy_load(), attr)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Module object for `name` whose code only runs on first attribute access,
+    so importing our modules does not pay for faiss / torch up front.
+    Raises ImportError immediately if the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named '{name}'")
+    return _LazyModule(name)
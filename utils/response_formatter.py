@@ -1,6 +1,15 @@
 # utils/response_formatter.py
+import re
 
-def build_system_prompt(retrieved):
+from utils.context_assembler import assemble_context
+
+
+def build_system_prompt(retrieved, token_budget=None, stats=None):
+    """
+    Strict answering instructions followed by the retrieved snippets, merged
+    and trimmed to the token budget by assemble_context().
+    Pass a dict as `stats` to receive its token / snippet counts.
+    """
     system = """
 You are a Compliance Policy Assistant. 
 Answer ONLY using the information from the provided policy snippets. 
@@ -19,10 +28,18 @@ STRICT RULES FOR ANSWERING:
 Below are the policy snippets:
 """
 
-    # Add all retrieved snippets to the system prompt
-    for r in retrieved:
-        system += f"\n[Snippet ID: {r['doc_id']}#{r['chunk_id']}] {r['text']}\n"
+    context, context_stats = assemble_context(retrieved, token_budget=token_budget)
+    if stats is not None:
+        stats.update(context_stats)
 
-    return system
+    return system + "\n" + context + "\n"
 
 
+def clean_response(text):
+    """
+    Remove accidental repeated newlines, parentheses, messy chunks
+    from an LLM answer. Safe to call on a partial (streaming) answer.
+    """
+    text = re.sub(r"\s{3,}", "\n\n", text)
+    text = re.sub(r"\((Snippet ID.*?)\)", "", text)
+    return text
@@ -1,127 +1,587 @@
 # utils/retriever.py
+from __future__ import annotations
+
+import contextvars
+import hashlib
 import os
-import json
-from typing import List, Dict, Any, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import numpy as np
-import faiss
 
 from config import config
-from models.embeddings import embed_texts
-import re
+from models.embeddings import embed_array
+from utils.bm25 import BM25Index, tokenize
+from utils.chunk_store import load_metadata, metadata_stamp_path
+from utils.collection import DEFAULT_COLLECTION, collection_paths, list_collections
+from utils.snapshots import current_version, snapshot_paths, verify_snapshot
+from utils.lazy_import import lazy_import
+from utils.tracing import span
+from utils.filters import filter_mask, list_documents
+from utils.vector_index import exact_rerank, index_is_lossy, load_vectors, search_index
+
+# imported on first use to keep app start-up fast
+faiss = lazy_import("faiss")
 
 
 # -----------------------
 # LOAD INDEX & METADATA
 # -----------------------
-def load_index_and_meta() -> Tuple[faiss.Index, List[Dict[str, Any]]]:
-    if not os.path.exists(config.VECTOR_STORE_PATH):
-        raise FileNotFoundError("FAISS index missing. Build index first.")
+def load_index_and_meta(
+    collection: str = DEFAULT_COLLECTION,
+    version: Optional[str] = None,
+) -> Tuple[faiss.Index, List[Dict[str, Any]]]:
+    """
+    Index and metadata of one snapshot (default: the published one), so the
+    pair always comes from the same build.
+    """
+    version = version or current_version(collection)
+    paths = snapshot_paths(collection, version)
+    if not os.path.exists(paths["index"]):
+        if collection == DEFAULT_COLLECTION:
+            raise FileNotFoundError("FAISS index missing. Build index first.")
+        raise FileNotFoundError(f"FAISS index for collection '{collection}' missing. Build it first.")
 
-    if not os.path.exists(config.METADATA_PATH):
-        raise FileNotFoundError("Metadata missing. Build index first.")
+    if version is not None:
+        # sizes only: full checksums are for rollback / scripts/snapshots.py verify
+        problems = verify_snapshot(collection, version, checksums=False)
+        if problems:
+            raise RuntimeError(f"Snapshot {version} of '{collection}' is damaged: " + "; ".join(problems))
 
-    index = faiss.read_index(config.VECTOR_STORE_PATH)
+    # Memory-mapped ChunkStore (or the legacy JSON list); raises FileNotFoundError if missing
+    metadata = load_metadata(collection, paths)
 
-    with open(config.METADATA_PATH, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    index = faiss.read_index(paths["index"])
+    if index.ntotal != len(metadata):
+        raise RuntimeError(
+            f"Index of '{collection}' has {index.ntotal} vectors but its metadata {len(metadata)} chunks."
+        )
 
     return index, metadata
 
 
 # -----------------------
-# SIMPLE LEXICAL SCORE
+# SHARED INDEX STORE
 # -----------------------
-def _keyword_overlap(query: str, text: str) -> int:
+_store_lock = threading.Lock()   # guards the two dicts below, never held while loading
+# process-wide cache shared by every Streamlit session, one entry per collection:
+# {collection: {"stamp", "version", "index", "metadata", "vectors", "bm25"}}
+# An entry is one snapshot; a query holds on to the entry it started with.
+_index_stores: Dict[str, Dict[str, Any]] = {}
+# one lock per collection, so reloading one collection never blocks queries on another
+_collection_locks: Dict[str, threading.Lock] = {}
+
+
+def _collection_lock(collection: str) -> threading.Lock:
+    with _store_lock:
+        return _collection_locks.setdefault(collection, threading.Lock())
+
+
+def _index_files_stamp(collection: str = DEFAULT_COLLECTION) -> Union[str, Tuple[Tuple[int, int], ...]]:
+    """
+    The published snapshot version (changes on every publish / rollback), or
+    for a collection without snapshots (mtime_ns, size) of its legacy files.
+    """
+    version = current_version(collection)
+    if version is not None:
+        return version
+
+    paths = collection_paths(collection)
+    stamp = []
+    for path in (paths["index"], metadata_stamp_path(collection)):
+        st = os.stat(path)
+        stamp.append((st.st_mtime_ns, st.st_size))
+    for path in (paths["vectors"], paths["bm25"]):
+        if os.path.exists(path):
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _load_store(collection: str = DEFAULT_COLLECTION) -> Dict[str, Any]:
     """
-    Count overlapping unique words between query and text.
-    Used as a lexical bonus on top of semantic similarity.
+    The collection's cache entry, read once per process and only re-read when
+    another snapshot is published, so the per-query cost is reading the
+    CURRENT pointer. Everything in the entry belongs to one snapshot; callers
+    that need several parts for one query should take them from one entry.
     """
-    q_words = set(re.findall(r"\w+", query.lower()))
-    t_words = set(re.findall(r"\w+", text.lower()))
-    q_words = {w for w in q_words if len(w) > 2}
-    t_words = {w for w in t_words if len(w) > 2}
-    return len(q_words & t_words)
+    try:
+        stamp = _index_files_stamp(collection)
+    except FileNotFoundError:
+        # Let load_index_and_meta raise its usual, more specific error
+        load_index_and_meta(collection)
+        raise
+
+    with _collection_lock(collection):
+        store = _index_stores.get(collection)
+        if store is None or store["stamp"] != stamp:
+            version = stamp if isinstance(stamp, str) else None
+            with span("index_reload", collection=collection, snapshot=version):
+                paths = snapshot_paths(collection, version)
+                index, metadata = load_index_and_meta(collection, version)
+                store = {
+                    "stamp": stamp,
+                    "version": version,
+                    "index": index,
+                    "metadata": metadata,
+                    "vectors": load_vectors(index.d, paths["vectors"]),
+                    "bm25": BM25Index.load(paths["bm25"]) if os.path.exists(paths["bm25"]) else None,
+                }
+            _index_stores[collection] = store
+        return store
+
+
+def get_snapshot(collection: str = DEFAULT_COLLECTION) -> Dict[str, Any]:
+    """
+    The shared {"version", "index", "metadata", "vectors", "bm25"} of the
+    collection's published snapshot. A query that needs several of them
+    should pin one snapshot this way rather than call the getters below
+    one by one, which may straddle a publish.
+    """
+    return _load_store(collection)
+
+
+def get_index_and_meta(collection: str = DEFAULT_COLLECTION) -> Tuple[faiss.Index, List[Dict[str, Any]]]:
+    """Return the shared (index, metadata) pair of a collection."""
+    store = _load_store(collection)
+    return store["index"], store["metadata"]
+
+
+def get_full_vectors(collection: str = DEFAULT_COLLECTION):
+    """
+    Memory-mapped full-precision vectors matching the shared index
+    (None if the index was built before they were saved).
+    """
+    return _load_store(collection)["vectors"]
+
+
+def get_bm25_index(collection: str = DEFAULT_COLLECTION):
+    """
+    BM25 inverted index matching the shared FAISS index
+    (None if the index was built before it was saved).
+    """
+    return _load_store(collection)["bm25"]
+
+
+def get_index_version(
+    collections: Optional[List[str]] = None,
+    snapshots: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Short fingerprint of the index files currently on disk, over `collections`
+    (default: all of them). Changes on every rebuild; used to invalidate
+    derived caches (e.g. answers).
+
+    Pass the `snapshots` filled in by retrieve_collections() instead to get
+    the fingerprint of the snapshots a query actually searched, which stays
+    right when a publish lands after the search.
+    """
+    if snapshots is not None:
+        stamp = sorted(snapshots.items())
+    else:
+        names = list_collections() if collections is None else collections
+        stamp = [(c, _index_files_stamp(c)) for c in sorted(names)]
+    return hashlib.blake2b(repr(stamp).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def get_documents(collection: str = DEFAULT_COLLECTION) -> List[Dict[str, Any]]:
+    """Documents indexed in a collection ({doc_id, doc_hash, ingested_at}), e.g. for filter pickers."""
+    return list_documents(_load_store(collection)["metadata"])
+
+
+def invalidate_index_cache(collection: Optional[str] = None) -> None:
+    """Drop a shared collection (or all of them) so the next access reloads from disk."""
+    with _store_lock:
+        if collection is None:
+            _index_stores.clear()
+        else:
+            _index_stores.pop(collection, None)
+
+
+# -----------------------
+# BATCH HELPERS
+# -----------------------
+def _rank_in_group(groups: np.ndarray) -> np.ndarray:
+    """0-based position of each element within its run of equal values in sorted `groups`."""
+    return np.arange(len(groups)) - np.searchsorted(groups, groups, side="left")
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, wanted: np.ndarray, default: float) -> np.ndarray:
+    """values[keys == w] for each w of `wanted` (keys sorted, unique), `default` where absent."""
+    if not len(keys):
+        return np.full(len(wanted), default, dtype="float64")
+    pos = np.clip(np.searchsorted(keys, wanted), 0, len(keys) - 1)
+    return np.where(keys[pos] == wanted, values[pos], default)
+
+
+def _hit(m: Dict[str, Any], score: float, semantic: float, lexical: float) -> Dict[str, Any]:
+    return {
+        "score": score,
+        "semantic_score": semantic,
+        "lexical_score": lexical,
+        "doc_id": m["doc_id"],
+        "chunk_id": m["chunk_id"],
+        "text": m["text"],
+        "aliases": m.get("aliases", []),
+    }
+
+
+# -----------------------
+# HYBRID FUSION (BM25 + FAISS)
+# -----------------------
+def _fuse_rrf(
+    queries: List[str],
+    q_arr: np.ndarray,
+    distances: np.ndarray,
+    indices: np.ndarray,
+    bm25: BM25Index,
+    metadata: List[Dict[str, Any]],
+    vectors: np.ndarray,
+    search_k: int,
+    k: int,
+    id_mask: np.ndarray = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Reciprocal rank fusion of the FAISS ranking and an independent BM25 ranking,
+    for a batch of queries (row i of q_arr / distances / indices is queries[i]):
+      score(row) = sum over channels of 1 / (RRF_K + rank)
+    so an exact-term match outside the FAISS shortlist can still be returned.
+    id_mask: metadata filter; BM25 hits outside it are dropped like FAISS ones.
+
+    BM25 stays sparse and per query: its top search_k come from the postings
+    (BM25Index.search) and the FAISS rows are scored by binary search
+    (BM25Index.score_rows), so only rows that can make the fused top-k are
+    kept and memory is O(batch * search_k) plus the postings read for one
+    query. Ranks, fused scores and the top-k run over the whole batch.
+    """
+    n = len(metadata)
+    n_q = len(queries)
+
+    # semantic channel: first occurrence of each row per query, rank = order in the FAISS list
+    q_idx = np.repeat(np.arange(n_q), indices.shape[1])
+    rows = indices.reshape(-1).astype("int64")
+    valid = (rows >= 0) & (rows < n)
+    sem_keys = q_idx[valid] * n + rows[valid]
+    sem_d = distances.reshape(-1)[valid].astype("float64")
+    _, first = np.unique(sem_keys, return_index=True)
+    first.sort()
+    sem_keys, sem_d = sem_keys[first], sem_d[first]
+    sem_q = sem_keys // n
+    sem_rank = _rank_in_group(sem_q) + 1
+    bounds = np.searchsorted(sem_q, np.arange(n_q + 1))
+
+    # lexical channel: best search_k BM25 rows per query (score desc, row asc), plus
+    # the BM25 score of each FAISS row -- together every row the fused top-k can hold
+    lex_keys, lex_rank, known_keys, known_scores = [], [], [], []
+    for qi, query in enumerate(queries):
+        top_rows, top_scores = bm25.search(query, search_k, id_mask)
+        top_keys = qi * n + top_rows.astype("int64")
+        sem_rows = sem_keys[bounds[qi]:bounds[qi + 1]] - qi * n
+        lex_keys.append(top_keys)
+        lex_rank.append(np.arange(1, len(top_rows) + 1))
+        known_keys += [top_keys, qi * n + sem_rows]
+        sem_scores = bm25.score_rows(query, sem_rows)
+        if id_mask is not None:
+            sem_scores[~id_mask[sem_rows]] = 0.0
+        known_scores += [top_scores, sem_scores]
+    lex_keys, lex_rank = np.concatenate(lex_keys), np.concatenate(lex_rank)
+    known_keys, first = np.unique(np.concatenate(known_keys), return_index=True)
+    known_scores = np.concatenate(known_scores)[first].astype("float64")
+
+    # fuse, then the k best keys of each query (score desc, row asc)
+    keys, inverse = np.unique(np.concatenate([sem_keys, lex_keys]), return_inverse=True)
+    fused = np.bincount(inverse, weights=1.0 / (config.RRF_K + np.concatenate([sem_rank, lex_rank])))
+    top_q, top_rows = keys // n, keys % n
+    order = np.lexsort((top_rows, -fused, top_q))
+    order = order[_rank_in_group(top_q[order]) < k]
+    keys, fused, top_q, top_rows = keys[order], fused[order], top_q[order], top_rows[order]
+
+    # semantic distance: from the FAISS list, else exact against the full vectors
+    sem_order = np.argsort(sem_keys)
+    dist = _lookup(sem_keys[sem_order], sem_d[sem_order], keys, np.nan)
+    missing = np.isnan(dist)
+    if missing.any() and vectors is not None and len(vectors) == n:
+        diff = np.asarray(vectors[top_rows[missing]], dtype="float32") - q_arr[top_q[missing]]
+        dist[missing] = np.einsum("ij,ij->i", diff, diff)
+    semantic = np.where(np.isnan(dist), 0.0, 1.0 / (1.0 + np.nan_to_num(dist)))
+    lexical = _lookup(known_keys, known_scores, keys, 0.0)
+
+    results: List[List[Dict[str, Any]]] = [[] for _ in range(n_q)]
+    for qi, row, score, sem, lx in zip(
+        top_q.tolist(), top_rows.tolist(), fused.tolist(), semantic.tolist(), lexical.tolist()
+    ):
+        results[qi].append(_hit(metadata[row], score, sem, lx))
+    return results
+
+
+# -----------------------
+# LEGACY LEXICAL RE-RANK
+# -----------------------
+def _rerank_overlap(
+    queries: List[str],
+    semantic: np.ndarray,
+    indices: np.ndarray,
+    metadata: List[Dict[str, Any]],
+    k: int,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Re-rank the FAISS shortlist of each query by semantic score + weighted
+    keyword overlap (unique words longer than 2 chars shared with the query).
+    Used when no BM25 index is available. Only the overlap counts are
+    per candidate; normalization, scoring and top-k run over the batch.
+    """
+    LEXICAL_WEIGHT = 0.3  # tune if needed
+
+    valid = (indices >= 0) & (indices < len(metadata))
+    chunks: Dict[int, Dict[str, Any]] = {}   # each shortlisted row read / tokenized once per batch
+    words: Dict[int, set] = {}
+    lexical = np.zeros(indices.shape, dtype="float64")
+    for qi, query in enumerate(queries):
+        q_words = set(tokenize(query))
+        for j in np.flatnonzero(valid[qi]).tolist():
+            row = int(indices[qi, j])
+            if row not in chunks:
+                chunks[row] = metadata[row]
+                words[row] = set(tokenize(chunks[row]["text"]))
+            lexical[qi, j] = len(q_words & words[row])
+
+    max_lex = np.where(valid, lexical, 0.0).max(axis=1, keepdims=True) if indices.size else lexical
+    score = semantic + LEXICAL_WEIGHT * lexical / np.where(max_lex > 0, max_lex, 1.0)
+    order = np.argsort(np.where(valid, -score, np.inf), axis=1, kind="stable")[:, :k]
+
+    results: List[List[Dict[str, Any]]] = []
+    for qi in range(len(queries)):
+        hits = []
+        for j in order[qi].tolist():
+            if not valid[qi, j]:
+                break
+            m = chunks[int(indices[qi, j])]
+            hits.append(_hit(m, float(score[qi, j]), float(semantic[qi, j]), int(lexical[qi, j])))
+        results.append(hits)
+    return results
 
 
 # -----------------------
 # RETRIEVE TOP-K CHUNKS
 # -----------------------
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Query embeddings as an L2-normalized (n, dim) float32 matrix (normalized by the backend)."""
+    return embed_array(list(queries))
+
+
+def retrieve_many(
+    queries: List[str],
+    index: faiss.Index,
+    metadata: List[Dict[str, Any]],
+    k: int = None,
+    nprobe: int = None,
+    ef_search: int = None,
+    vectors: np.ndarray = None,
+    bm25: BM25Index = None,
+    query_vectors: np.ndarray = None,
+    filters: Dict[str, Any] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Batched retrieve(): all queries are embedded in one encode call and
+    searched with a single index.search over the full query matrix; exact
+    rerank, rank fusion and top-k selection run as NumPy operations over the
+    batch, BM25 as one sparse postings lookup per query (see _fuse_rrf /
+    _rerank_overlap).
+
+    Returns one result list per query (empty for blank queries), each in the
+    same format as retrieve(). retrieve() itself goes through this function,
+    so single and batched results are produced by the same code path.
+
+    query_vectors: precomputed embed_queries(queries) output (one row per
+    query), so callers that also need the embedding encode only once.
+
+    filters: see utils/filters.py (doc_ids, ingest-date range). They become
+    an ID bitmap that FAISS checks during the scan, so no over-fetching.
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    live = [i for i, q in enumerate(queries) if q and q.strip()]
+    if not live:
+        return results
+
+    k = k or config.MAX_RETRIEVALS
+
+    id_mask = filter_mask(metadata, filters)
+    if id_mask is not None and not id_mask.any():
+        return results
+
+    # --- 1. Embed queries and search with FAISS ---
+    if query_vectors is None:
+        with span("embed_query", queries=len(live)):
+            q_arr = embed_queries([queries[i] for i in live])
+    else:
+        q_arr = np.asarray(query_vectors, dtype="float32").reshape(len(queries), -1)[live]
+
+    # Fetch more than k to allow better re-ranking
+    search_k = max(k * 2, 12)
+
+    rerank = (
+        config.EXACT_RERANK
+        and vectors is not None
+        and len(vectors) == index.ntotal
+        and index_is_lossy(index)
+    )
+    fetch_k = search_k * config.RERANK_FACTOR if rerank else search_k
+
+    with span("faiss_search", queries=len(live), fetch_k=fetch_k, filtered=id_mask is not None):
+        distances, indices = search_index(
+            index, q_arr, fetch_k, nprobe=nprobe, ef_search=ef_search, id_mask=id_mask
+        )
+
+    if rerank:
+        with span("exact_rerank", candidates=fetch_k):
+            distances, indices = exact_rerank(q_arr, indices, vectors, search_k)
+
+    use_bm25 = bm25 is not None and len(bm25) == len(metadata)
+    # L2 distance -> similarity-like score (smaller dist => higher score)
+    semantic = 1.0 / (1.0 + distances.astype("float64"))
+
+    # --- 2. Lexical channel + fusion, over the whole batch ---
+    live_queries = [queries[i] for i in live]
+    with span("lexical_rerank", method="bm25_rrf" if use_bm25 else "overlap", queries=len(live)):
+        if use_bm25:
+            ranked = _fuse_rrf(
+                live_queries, q_arr, distances, indices, bm25, metadata, vectors, search_k, k, id_mask,
+            )
+        else:
+            ranked = _rerank_overlap(live_queries, semantic, indices, metadata, k)
+    for qi, hits in zip(live, ranked):
+        results[qi] = hits
+
+    return results
+
+
 def retrieve(
     query: str,
     index: faiss.Index,
     metadata: List[Dict[str, Any]],
     k: int = None,
+    nprobe: int = None,
+    ef_search: int = None,
+    vectors: np.ndarray = None,
+    bm25: BM25Index = None,
+    query_vector: np.ndarray = None,
+    filters: Dict[str, Any] = None,
 ) -> List[Dict[str, Any]]:
     """
     Retrieve top-k chunks using:
       1) FAISS semantic similarity
-      2) Lexical overlap re-ranking
+      2) BM25 lexical search, fused with (1) by reciprocal rank fusion
+         (falls back to lexical-overlap re-ranking of the FAISS shortlist
+         when no BM25 index is given, e.g. for indexes built before it existed)
+    nprobe / ef_search override config.IVF_NPROBE / config.HNSW_EF_SEARCH
+    for IVF / HNSW indexes (ignored for flat).
+    vectors: full-precision vectors (see get_full_vectors()); when the index is
+    compressed, an over-fetched candidate list is re-scored exactly against them.
+    query_vector: precomputed embed_queries([query])[0] (skips re-encoding).
+    filters: restrict to matching chunks, e.g. make_filters(doc_ids=[...]).
     Returns list of:
-      { score, semantic_score, lexical_score, doc_id, chunk_id, text }
+      { score, semantic_score, lexical_score, doc_id, chunk_id, text, aliases }
+    (aliases: near-duplicate chunks folded into this one at ingest)
     """
-    if not query or not query.strip():
-        return []
-
-    k = k or config.MAX_RETRIEVALS
+    return retrieve_many(
+        [query], index, metadata, k=k, nprobe=nprobe, ef_search=ef_search,
+        vectors=vectors, bm25=bm25,
+        query_vectors=None if query_vector is None else np.asarray(query_vector)[None, :],
+        filters=filters,
+    )[0]
 
-    # --- 1. Embed query and search with FAISS ---
-    q_emb = embed_texts([query])[0]
-    q_arr = np.array(q_emb, dtype="float32").reshape(1, -1)
-    faiss.normalize_L2(q_arr)
 
-    # Fetch more than k to allow better re-ranking
-    search_k = max(k * 2, 12)
-
-    distances, indices = index.search(q_arr, search_k)
+# -----------------------
+# MULTI-COLLECTION FAN-OUT
+# -----------------------
+_fanout_pool: List[Optional[ThreadPoolExecutor]] = [None]
 
-    candidates = []
-    for dist, idx in zip(distances[0], indices[0]):
-        if idx < 0 or idx >= len(metadata):
-            continue
 
-        m = metadata[idx]
-        # L2 distance -> similarity-like score (smaller dist => higher score)
-        semantic_score = 1.0 / (1.0 + float(dist))
+def _get_fanout_pool() -> ThreadPoolExecutor:
+    with _store_lock:
+        if _fanout_pool[0] is None:
+            workers = config.COLLECTION_SEARCH_WORKERS or min(8, os.cpu_count() or 1)
+            _fanout_pool[0] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collection-search")
+        return _fanout_pool[0]
 
-        candidates.append({
-            "semantic_score": semantic_score,
-            "doc_id": m["doc_id"],
-            "chunk_id": m["chunk_id"],
-            "text": m["text"],
-        })
 
-    if not candidates:
-        return []
+def _merge_collections(per_collection: Dict[str, List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """
+    Merge per-collection top-k lists into one top-k.
+    Fused scores are rank-based within a collection, so the pooled hits are
+    re-fused: ranked once by semantic_score (comparable across collections,
+    they share one embedding model) and once by lexical_score (hits with a
+    lexical match only), then combined by reciprocal rank fusion.
+    """
+    pooled = [hit for hits in per_collection.values() for hit in hits]
+    if len(per_collection) <= 1:
+        return pooled[:k]
 
-    # --- 2. Compute lexical overlap for all candidates ---
-    for c in candidates:
-        c["lexical_score"] = _keyword_overlap(query, c["text"])
+    fused = [0.0] * len(pooled)
+    by_semantic = sorted(range(len(pooled)), key=lambda i: -pooled[i]["semantic_score"])
+    by_lexical = sorted(
+        (i for i in range(len(pooled)) if pooled[i]["lexical_score"] > 0),
+        key=lambda i: -pooled[i]["lexical_score"],
+    )
+    for ranking in (by_semantic, by_lexical):
+        for rank, i in enumerate(ranking, start=1):
+            fused[i] += 1.0 / (config.RRF_K + rank)
 
-    max_lex = max(c["lexical_score"] for c in candidates) or 1
+    top = sorted(range(len(pooled)), key=lambda i: (-fused[i], -pooled[i]["semantic_score"]))[:k]
+    return [{**pooled[i], "score": fused[i]} for i in top]
 
-    # --- 3. Combine scores ---
-    LEXICAL_WEIGHT = 0.3  # tune if needed
 
-    for c in candidates:
-        lexical_norm = c["lexical_score"] / max_lex
-        c["score"] = c["semantic_score"] + LEXICAL_WEIGHT * lexical_norm
+def retrieve_collections(
+    query: str,
+    collections: Optional[List[str]] = None,
+    k: int = None,
+    nprobe: int = None,
+    ef_search: int = None,
+    query_vector: np.ndarray = None,
+    filters: Dict[str, Any] = None,
+    snapshots: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    retrieve() across several collections (default: every built one).
+    The query is embedded once, each collection is searched on the fan-out
+    thread pool (config.COLLECTION_SEARCH_WORKERS) against its own shared
+    index, and the per-collection top-k lists are merged into one top-k.
+    Each result carries a "collection" key next to the usual retrieve() fields.
+    If `snapshots` is given, it is filled with {collection: snapshot stamp}
+    of the snapshots searched (see get_index_version()).
+    """
+    names = list_collections() if not collections else list(dict.fromkeys(collections))
+    if not names:
+        raise FileNotFoundError("FAISS index missing. Build index first.")
+    if not query or not query.strip():
+        return []
 
-    # --- 4. Sort and keep top-k ---
-    candidates.sort(key=lambda x: x["score"], reverse=True)
+    k = k or config.MAX_RETRIEVALS
+    if query_vector is None:
+        with span("embed_query", queries=1):
+            query_vector = embed_queries([query])[0]
 
-    top = candidates[:k]
+    def search(collection: str) -> List[Dict[str, Any]]:
+        with span("collection_search", collection=collection):
+            store = get_snapshot(collection)
+            if snapshots is not None:
+                snapshots[collection] = store["stamp"]
+            hits = retrieve(
+                query, store["index"], store["metadata"], k=k, nprobe=nprobe, ef_search=ef_search,
+                vectors=store["vectors"], bm25=store["bm25"], query_vector=query_vector,
+                filters=filters,
+            )
+        for hit in hits:
+            hit["collection"] = collection
+        return hits
 
-    # For UI backwards compatibility, keep only required keys + extra debug
-    results: List[Dict[str, Any]] = []
-    for c in top:
-        results.append({
-            "score": c["score"],
-            "semantic_score": c["semantic_score"],
-            "lexical_score": c["lexical_score"],
-            "doc_id": c["doc_id"],
-            "chunk_id": c["chunk_id"],
-            "text": c["text"],
-        })
+    if len(names) == 1:
+        return search(names[0])
 
-    return results
+    pool = _get_fanout_pool()
+    # copy_context() so the per-collection spans land in the caller's trace
+    futures = {c: pool.submit(contextvars.copy_context().run, search, c) for c in names}
+    per_collection = {c: f.result() for c, f in futures.items()}
+    with span("merge_collections", collections=len(names)):
+        return _merge_collections(per_collection, k)
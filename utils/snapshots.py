@@ -0,0 +1,315 @@
+# utils/snapshots.py
+"""
+Versioned, immutable index snapshots of a collection.
+
+    <snapshots>/v000001/     faiss.index, vectors.f32, chunks/ or metadata.json, bm25/, manifest.json
+    <snapshots>/v000002/
+    <snapshots>/CURRENT      name of the published version
+    <snapshots>/.staging-<host>_<pid>-<random>/
+                             snapshot being written by one index_documents() call
+
+A build writes a complete snapshot into its own staging directory, so
+overlapping builds of a collection (e.g. scripts bypassing the job queue)
+never touch each other's files; publish_snapshot() adds a
+manifest (file sizes + sha256), renames it to the next version and swaps
+CURRENT with os.replace, so readers switch from one whole snapshot to the
+next and never see a new index next to old metadata. A reader resolves
+CURRENT once and keeps using that version's files (memory-mapped) until its
+next reload; superseded versions are therefore only deleted by
+gc_snapshots() once they have been retired for SNAPSHOT_GRACE_SECONDS, and
+the newest SNAPSHOT_KEEP of them stay for rollback_snapshot().
+
+Collections built before snapshots existed are read from their flat legacy
+paths (see utils/collection.py) until their first publish.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import config
+from utils.collection import DEFAULT_COLLECTION, POINTER_FILE, collection_paths
+
+
+MANIFEST_FILE = "manifest.json"
+RETIRED_FILE = ".retired"     # mtime = when the version stopped being CURRENT
+STAGING_PREFIX = ".staging-"   # + "<host>_<pid>-<random>", see begin_snapshot()
+
+# file names inside a snapshot, keyed like collection_paths()
+SNAPSHOT_FILES = {
+    "index": "faiss.index",
+    "vectors": "vectors.f32",
+    "chunks": "chunks",
+    "metadata_json": "metadata.json",
+    "bm25": "bm25",
+}
+
+_VERSION_RE = re.compile(r"^v(\d{6,})$")
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def snapshot_root(collection: str = DEFAULT_COLLECTION) -> Path:
+    return Path(collection_paths(collection)["snapshots"])
+
+
+def files_in(directory: Path) -> Dict[str, str]:
+    """Snapshot file paths inside `directory`, keyed like collection_paths()."""
+    return {key: str(Path(directory) / name) for key, name in SNAPSHOT_FILES.items()}
+
+
+def current_version(collection: str = DEFAULT_COLLECTION) -> Optional[str]:
+    """Published version of the collection, or None before its first snapshot."""
+    try:
+        with open(snapshot_root(collection) / POINTER_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_paths(collection: str = DEFAULT_COLLECTION, version: Optional[str] = None) -> Dict[str, str]:
+    """
+    Files of `version` (default: the published one). Falls back to the
+    legacy flat paths when the collection has no snapshot yet.
+    """
+    version = version or current_version(collection)
+    if version is None:
+        paths = collection_paths(collection)
+        return {key: paths[key] for key in SNAPSHOT_FILES}
+    return files_in(snapshot_root(collection) / version)
+
+
+def _versions(root: Path) -> List[str]:
+    if not root.is_dir():
+        return []
+    return sorted((d.name for d in root.iterdir() if _VERSION_RE.match(d.name)), key=lambda v: int(v[1:]))
+
+
+def read_manifest(collection: str, version: str) -> Dict[str, Any]:
+    with open(snapshot_root(collection) / version / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_snapshots(collection: str = DEFAULT_COLLECTION) -> List[Dict[str, Any]]:
+    """Manifests of every stored version, oldest first, with "current" and "retired" (ts or None)."""
+    root = snapshot_root(collection)
+    current = current_version(collection)
+    out = []
+    for version in _versions(root):
+        try:
+            manifest = read_manifest(collection, version)
+        except (OSError, ValueError):
+            manifest = {"version": version, "damaged": True}
+        retired = root / version / RETIRED_FILE
+        manifest["current"] = version == current
+        manifest["retired"] = retired.stat().st_mtime if retired.exists() and version != current else None
+        out.append(manifest)
+    return out
+
+
+# ----------------------------
+# CHECKSUMS
+# ----------------------------
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_table(directory: Path) -> Dict[str, Dict[str, Any]]:
+    """{relative path: {size, sha256}} of every file below `directory`."""
+    table = {}
+    for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+        rel = path.relative_to(directory).as_posix()
+        if rel not in (MANIFEST_FILE, RETIRED_FILE):
+            table[rel] = {"size": path.stat().st_size, "sha256": _sha256(path)}
+    return table
+
+
+def verify_snapshot(collection: str, version: str, checksums: bool = True) -> List[str]:
+    """
+    Problems found in a stored version (empty list = intact). With
+    checksums=False only presence and sizes are checked, which is cheap
+    enough to do on every load.
+    """
+    directory = snapshot_root(collection) / version
+    try:
+        manifest = read_manifest(collection, version)
+    except (OSError, ValueError) as e:
+        return [f"manifest unreadable: {e}"]
+
+    problems = []
+    for rel, expected in manifest["files"].items():
+        path = directory / rel
+        if not path.is_file():
+            problems.append(f"{rel}: missing")
+        elif path.stat().st_size != expected["size"]:
+            problems.append(f"{rel}: size {path.stat().st_size} != {expected['size']}")
+        elif checksums and _sha256(path) != expected["sha256"]:
+            problems.append(f"{rel}: checksum mismatch")
+    return problems
+
+
+# ----------------------------
+# WRITE / PUBLISH
+# ----------------------------
+def begin_snapshot(collection: str = DEFAULT_COLLECTION) -> Path:
+    """
+    New, empty staging directory for a snapshot of `collection`, private to
+    this build. Directories left by builds whose process died are removed
+    by gc_snapshots().
+    """
+    root = snapshot_root(collection)
+    root.mkdir(parents=True, exist_ok=True)
+    owner = f"{socket.gethostname()}_{os.getpid()}"
+    return Path(tempfile.mkdtemp(dir=root, prefix=f"{STAGING_PREFIX}{owner}-"))
+
+
+def _abandoned_staging(root: Path) -> List[Path]:
+    """Staging directories of builds on this host whose process is gone."""
+    if not root.is_dir():
+        return []
+    host = socket.gethostname()
+    out = []
+    for d in root.iterdir():
+        if not (d.is_dir() and d.name.startswith(STAGING_PREFIX)):
+            continue
+        owner = d.name[len(STAGING_PREFIX):].rsplit("-", 1)[0]
+        owner_host, _, pid = owner.rpartition("_")
+        if owner_host == host and pid.isdigit() and not pid_alive(int(pid)):
+            out.append(d)
+    return out
+
+
+def _swap_pointer(root: Path, version: str) -> None:
+    """Atomically point CURRENT at `version`, marking the previous version retired."""
+    previous = None
+    try:
+        previous = (root / POINTER_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        pass
+
+    tmp = root / f"{POINTER_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root / POINTER_FILE)
+
+    (root / version / RETIRED_FILE).unlink(missing_ok=True)
+    if previous and previous != version and (root / previous).is_dir():
+        (root / previous / RETIRED_FILE).touch()
+
+
+def publish_snapshot(collection: str, staging: Path, info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Seal the staged snapshot (manifest with checksums), move it to the next
+    version and make it CURRENT; then collect expired versions. Returns the
+    new version name.
+    """
+    root = snapshot_root(collection)
+    manifest = {
+        "collection": collection,
+        "created": time.time(),
+        "parent": current_version(collection),
+        **(info or {}),
+        "files": _file_table(staging),
+    }
+
+    existing = _versions(root)
+    number = int(existing[-1][1:]) + 1 if existing else 1
+    while True:
+        version = f"v{number:06d}"
+        manifest["version"] = version
+        with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(staging, root / version)
+            break
+        except OSError:
+            if not (root / version).exists():
+                raise
+            number += 1   # taken by a concurrent writer
+
+    _swap_pointer(root, version)
+    gc_snapshots(collection)
+    return version
+
+
+def rollback_snapshot(collection: str = DEFAULT_COLLECTION, version: Optional[str] = None) -> str:
+    """
+    Make an earlier version CURRENT again (default: the newest one older than
+    the current version) after verifying its checksums. Returns its name.
+    """
+    root = snapshot_root(collection)
+    current = current_version(collection)
+    if version is None:
+        older = [v for v in _versions(root) if current is None or int(v[1:]) < int(current[1:])]
+        if not older:
+            raise ValueError(f"No earlier snapshot of collection '{collection}' to roll back to.")
+        version = older[-1]
+    elif not (root / version).is_dir():
+        raise ValueError(f"Collection '{collection}' has no snapshot {version}.")
+
+    problems = verify_snapshot(collection, version)
+    if problems:
+        raise RuntimeError(f"Snapshot {version} of '{collection}' is damaged: " + "; ".join(problems))
+
+    _swap_pointer(root, version)
+    return version
+
+
+def gc_snapshots(
+    collection: str = DEFAULT_COLLECTION,
+    grace_seconds: Optional[float] = None,
+    keep: Optional[int] = None,
+) -> List[str]:
+    """
+    Delete retired versions beyond the newest `keep` once they have been
+    retired for `grace_seconds` (long enough for in-flight queries on them
+    to finish), and staging directories of builds that died. Returns the
+    deleted version names.
+    """
+    grace_seconds = config.SNAPSHOT_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    keep = config.SNAPSHOT_KEEP if keep is None else keep
+
+    root = snapshot_root(collection)
+    for staging in _abandoned_staging(root):
+        shutil.rmtree(staging, ignore_errors=True)
+
+    current = current_version(collection)
+    retired = [v for v in _versions(root) if v != current]
+    now = time.time()
+
+    removed = []
+    for version in retired[: max(0, len(retired) - keep)]:
+        marker = root / version / RETIRED_FILE
+        # versions without a marker were never published (or predate it): treat them as retired now
+        if not marker.exists():
+            marker.touch()
+        if now - marker.stat().st_mtime < grace_seconds:
+            continue
+        try:
+            shutil.rmtree(root / version)
+        except OSError as e:
+            # e.g. files still mapped by a reader on Windows; retried by the next gc
+            print(f"Could not remove snapshot {version} of '{collection}': {e}")
+            continue
+        removed.append(version)
+    return removed
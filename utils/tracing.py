@@ -0,0 +1,242 @@
+# utils/tracing.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import config
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+
+# ----------------------------
+# SPANS
+# ----------------------------
+class Span:
+    """One timed stage. Times are wall-clock nanoseconds (OpenTelemetry style)."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned outside a trace or with tracing disabled."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request (a chat turn, an ingest run, an API call)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+    @property
+    def root(self) -> Optional[Span]:
+        return next((s for s in self.spans if s.parent_id is None), None)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """
+        Spans in start order as {stage, depth, ms, share}; `share` is the
+        fraction of the root span's duration.
+        """
+        depth: Dict[Optional[str], int] = {None: -1}
+        total = self.root.duration_ms if self.root else 0.0
+        rows = []
+        # parents start no later and end no earlier than their children
+        for s in sorted(self.spans, key=lambda s: (s.start_ns, -s.end_ns)):
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1
+            rows.append({
+                "stage": s.name,
+                "depth": depth[s.span_id],
+                "ms": s.duration_ms,
+                "share": s.duration_ms / total if total else 0.0,
+            })
+        return rows
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Time a stage of the active trace. Outside a trace (or with
+    config.TRACING_ENABLED off) this costs one ContextVar lookup.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP
+        return
+
+    parent = _current_span.get()
+    s = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(s)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    Open a trace whose root span is `name`; its spans are exported when it
+    ends. Inside an existing trace this is just a nested span.
+    Yields the Trace (None when tracing is disabled).
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        with span(name, **attributes):
+            yield outer
+        return
+
+    if not config.TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        export_trace(trace)
+
+
+def traced(name: str):
+    """Decorator: run the function inside start_trace(name)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_trace(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ----------------------------
+# EXPORT
+# ----------------------------
+_jsonl_lock = threading.Lock()
+
+
+def _export_jsonl(trace: Trace, path: str) -> None:
+    """One JSON object per span."""
+    lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in trace.spans)
+    with _jsonl_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """OTLP/HTTP JSON payload (ExportTraceServiceRequest) for one trace."""
+    spans = []
+    for s in trace.spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,   # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        if "error" in s.attributes:
+            item["status"] = {"code": 2, "message": str(s.attributes["error"])}
+        spans.append(item)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": config.TRACE_SERVICE_NAME}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "compliance-helper"}, "spans": spans}],
+        }]
+    }
+
+
+def _post_otlp(payload: Dict[str, Any], endpoint: str) -> None:
+    try:
+        requests.post(endpoint, json=payload, timeout=2)
+    except Exception as e:
+        print(f"OTLP export to {endpoint} failed: {e}")
+
+
+def export_trace(trace: Trace) -> None:
+    """Write to config.TRACE_JSONL_PATH and/or POST to config.TRACE_OTLP_ENDPOINT."""
+    if config.TRACE_JSONL_PATH:
+        try:
+            _export_jsonl(trace, config.TRACE_JSONL_PATH)
+        except OSError as e:
+            print(f"Trace export to {config.TRACE_JSONL_PATH} failed: {e}")
+
+    if config.TRACE_OTLP_ENDPOINT and requests is not None:
+        # never block the request on the collector
+        threading.Thread(
+            target=_post_otlp, args=(to_otlp(trace), config.TRACE_OTLP_ENDPOINT), daemon=True
+        ).start()
+
@@ -0,0 +1,369 @@
+# utils/vector_index.py
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from utils.lazy_import import lazy_import
+
+# imported on first use to keep app start-up fast
+faiss = lazy_import("faiss")
+
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+# ordered from most precise / largest to smallest
+ENCODINGS = ("none", "fp16", "sq8", "pq")
+
+
+# ----------------------------
+# ENCODING / MEMORY BUDGET
+# ----------------------------
+def _pq_m(dim: int) -> int:
+    """Largest sub-quantizer count <= config.PQ_M that divides `dim`."""
+    m = min(config.PQ_M, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def bytes_per_vector(dim: int, encoding: str, index_type: Optional[str] = None) -> int:
+    """Approximate resident bytes per vector for an encoding + index type."""
+    code = {
+        "none": 4 * dim,
+        "fp16": 2 * dim,
+        "sq8": dim,
+        "pq": _pq_m(dim),
+    }[encoding]
+
+    index_type = (index_type or config.INDEX_TYPE).lower()
+    if index_type == "ivf":
+        code += 8                          # stored id per entry
+    elif index_type == "hnsw":
+        code += 4 * 2 * config.HNSW_M      # level-0 neighbour links
+    return code
+
+
+def choose_encoding(n_vectors: int, dim: int, index_type: Optional[str] = None) -> str:
+    """
+    Resolve config.INDEX_COMPRESSION. "auto" picks the most precise encoding
+    whose estimated size fits in config.MAX_INDEX_MEMORY_MB.
+    """
+    encoding = config.INDEX_COMPRESSION.lower()
+    if encoding != "auto":
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown INDEX_COMPRESSION '{encoding}'. Expected 'auto' or one of {ENCODINGS}.")
+        return encoding
+
+    budget = config.MAX_INDEX_MEMORY_MB * 1024 * 1024
+    for candidate in ENCODINGS:
+        if n_vectors * bytes_per_vector(dim, candidate, index_type) <= budget:
+            return candidate
+
+    print(
+        f"Warning: {n_vectors} vectors do not fit in MAX_INDEX_MEMORY_MB={config.MAX_INDEX_MEMORY_MB} "
+        "even with PQ; using PQ anyway."
+    )
+    return "pq"
+
+
+def _factory_encoding(encoding: str, n_vectors: int, dim: int) -> str:
+    if encoding == "none":
+        return "Flat"
+    if encoding == "fp16":
+        return "SQfp16"
+    if encoding == "sq8":
+        return "SQ8"
+    # PQ codebooks need at least 2**nbits training points
+    nbits = max(1, min(8, int(math.log2(max(n_vectors, 2)))))
+    return f"PQ{_pq_m(dim)}x{nbits}"
+
+
+def index_is_lossy(index: faiss.Index) -> bool:
+    """True when stored vectors are compressed, i.e. search distances are approximate."""
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    return not isinstance(inner, (faiss.IndexFlat, faiss.IndexIVFFlat))
+
+
+def _index_type_of(index: faiss.Index) -> str:
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_matches_config(index: faiss.Index, n_vectors: int) -> bool:
+    """
+    True when `index` is what a full rebuild of `n_vectors` would produce now:
+    config.INDEX_TYPE, with the encoding choose_encoding() picks. Incremental
+    ingestion only appends to an index that matches.
+    """
+    index_type = config.INDEX_TYPE.lower()
+    return (
+        _index_type_of(index) == index_type
+        and _encoding_of(index) == choose_encoding(n_vectors, index.d, index_type)
+    )
+
+
+# ----------------------------
+# BUILD
+# ----------------------------
+def _ivf_nlist(n_vectors: int) -> int:
+    """
+    Clamp the configured nlist so every list gets enough training points
+    (FAISS wants ~39 points per centroid).
+    """
+    return max(1, min(config.IVF_NLIST, n_vectors // 39))
+
+
+def build_faiss_index(
+    xb: np.ndarray,
+    index_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> faiss.Index:
+    """
+    Build (train + add) a FAISS L2 index over normalized float32 vectors.
+
+    index_type:
+      - "flat": exact brute-force search
+      - "ivf":  IVF, nlist trained with k-means on `xb`
+      - "hnsw": HNSW graph
+    encoding (vector storage): "none" (float32), "fp16", "sq8" or "pq";
+    defaults to choose_encoding().
+    """
+    index_type = (index_type or config.INDEX_TYPE).lower()
+    n, dim = xb.shape
+    encoding = encoding or choose_encoding(n, dim, index_type)
+
+    # Train on a row sample so `xb` can be a memory-mapped file larger than RAM
+    n_train = min(n, config.INDEX_TRAIN_SAMPLE)
+    storage = _factory_encoding(encoding, n_train, dim)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim) if encoding == "none" else faiss.index_factory(dim, storage)
+    elif index_type == "ivf":
+        index = faiss.index_factory(dim, f"IVF{_ivf_nlist(n_train)},{storage}")
+    elif index_type == "hnsw":
+        hnsw = f"HNSW{config.HNSW_M}" if encoding == "none" else f"HNSW{config.HNSW_M},{storage}"
+        index = faiss.index_factory(dim, hnsw)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+    else:
+        raise ValueError(f"Unknown INDEX_TYPE '{index_type}'. Expected one of {INDEX_TYPES}.")
+
+    if not index.is_trained:
+        if n_train < n:
+            rows = np.sort(np.random.default_rng(0).choice(n, n_train, replace=False))
+            index.train(np.ascontiguousarray(xb[rows]))
+        else:
+            index.train(np.ascontiguousarray(xb))
+
+    add_blocks(index, xb)
+    return index
+
+
+def add_blocks(index: faiss.Index, xb: np.ndarray, start: int = 0) -> None:
+    """index.add(xb[start:]) in blocks of config.INDEX_ADD_BLOCK rows."""
+    for i in range(start, xb.shape[0], config.INDEX_ADD_BLOCK):
+        index.add(np.ascontiguousarray(xb[i : i + config.INDEX_ADD_BLOCK]))
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return all stored vectors of `index`, in id order."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# ----------------------------
+# FULL-PRECISION VECTOR FILE
+# Raw float32 rows aligned with FAISS ids; used for exact rerank and rebuilds
+# ----------------------------
+def load_vectors(dim: int, path: Optional[str] = None) -> Optional[np.ndarray]:
+    """Memory-map the vector file as an (n, dim) float32 array, or None if missing."""
+    path = path or config.VECTORS_PATH
+    if not os.path.exists(path):
+        return None
+    n = os.path.getsize(path) // (4 * dim)
+    if n == 0:
+        return np.zeros((0, dim), dtype="float32")
+    return np.memmap(path, dtype="float32", mode="r", shape=(n, dim))
+
+
+def exact_rerank(
+    xq: np.ndarray,
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    block: int = 64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score candidate `ids` (nq, n_candidates; -1 = empty slot) with exact
+    L2 distances to the queries `xq` (nq, dim) and return the best k per
+    query as (distances, ids), shaped like index.search output.
+    """
+    nq = xq.shape[0]
+    out_d = np.full((nq, k), np.inf, dtype="float32")
+    out_i = np.full((nq, k), -1, dtype="int64")
+
+    for start in range(0, nq, block):
+        cand = ids[start : start + block]
+        valid = cand >= 0
+        cand_vecs = np.asarray(vectors[np.where(valid, cand, 0)])      # (b, c, dim)
+        diffs = cand_vecs - xq[start : start + block, None, :]
+        dists = np.einsum("bcd,bcd->bc", diffs, diffs)
+        dists[~valid] = np.inf
+
+        order = np.argsort(dists, axis=1, kind="stable")[:, :k]
+        top_d = np.take_along_axis(dists, order, axis=1)
+        top_i = np.where(np.isfinite(top_d), np.take_along_axis(cand, order, axis=1), -1)
+
+        out_d[start : start + block, : order.shape[1]] = top_d
+        out_i[start : start + block, : order.shape[1]] = top_i
+
+    return out_d, out_i
+
+
+# ----------------------------
+# SEARCH PARAMETERS
+# ----------------------------
+def make_id_selector(id_mask: np.ndarray) -> faiss.IDSelector:
+    """IDSelectorBitmap accepting the ids where `id_mask` (bool, one per id) is True."""
+    bits = np.packbits(np.asarray(id_mask, dtype=bool), bitorder="little")
+    sel = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))   # length in bytes
+    sel.referenced_objects = [bits]   # FAISS only keeps the raw pointer
+    return sel
+
+
+def make_search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    id_mask: Optional[np.ndarray] = None,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query search knobs for approximate indexes (None for unfiltered flat).
+    Passed to index.search(..., params=...) so the shared index is never mutated.
+    id_mask restricts the search to the selected ids inside FAISS.
+    """
+    sel = make_id_selector(id_mask) if id_mask is not None else None
+    extra = {"sel": sel} if sel is not None else {}
+
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe or config.IVF_NPROBE, **extra)
+
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or config.HNSW_EF_SEARCH, **extra)
+
+    return faiss.SearchParameters(**extra) if sel is not None else None
+
+
+def search_index(
+    index: faiss.Index,
+    xq: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    id_mask: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    index.search with per-query parameters. With id_mask, non-matching ids are
+    skipped during the scan (ID selector), so a filtered query costs about the
+    same as an unfiltered one. Index types that reject selectors fall back to
+    post-filtering a shortlist enlarged by 2 x ntotal / matching ids.
+    """
+    params = make_search_params(index, nprobe=nprobe, ef_search=ef_search, id_mask=id_mask)
+    try:
+        return index.search(xq, k, params=params)
+    except RuntimeError:
+        if id_mask is None:
+            raise
+
+    n_match = max(1, int(np.count_nonzero(id_mask)))
+    fetch = min(index.ntotal, 2 * k * -(-index.ntotal // n_match))
+    distances, ids = index.search(xq, fetch, params=make_search_params(index, nprobe=nprobe, ef_search=ef_search))
+
+    keep = (ids >= 0) & id_mask[np.maximum(ids, 0)]
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :k]
+    kept = np.take_along_axis(keep, order, axis=1)
+    out_d = np.where(kept, np.take_along_axis(distances, order, axis=1), np.inf).astype("float32")
+    out_i = np.where(kept, np.take_along_axis(ids, order, axis=1), -1)
+    if out_d.shape[1] < k:
+        pad = k - out_d.shape[1]
+        out_d = np.pad(out_d, ((0, 0), (0, pad)), constant_values=np.inf)
+        out_i = np.pad(out_i, ((0, 0), (0, pad)), constant_values=-1)
+    return out_d, out_i
+
+
+# ----------------------------
+# RECALL REPORT
+# ----------------------------
+def recall_report(index: faiss.Index, xb: np.ndarray, k: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Measure recall@k of `index` against exact search, using a sample of the
+    indexed vectors as queries.
+    """
+    k = min(k or config.RECALL_REPORT_K, xb.shape[0])
+    n_queries = min(config.RECALL_REPORT_QUERIES, xb.shape[0])
+
+    rng = np.random.default_rng(0)
+    xq = np.ascontiguousarray(xb[np.sort(rng.choice(xb.shape[0], n_queries, replace=False))])
+
+    # Exact top-k, merged block by block so `xb` may be memory-mapped
+    t0 = time.perf_counter()
+    best_d = np.full((n_queries, 0), np.inf, dtype="float32")
+    best_i = np.zeros((n_queries, 0), dtype="int64")
+    for start in range(0, xb.shape[0], config.INDEX_ADD_BLOCK):
+        block = np.ascontiguousarray(xb[start : start + config.INDEX_ADD_BLOCK])
+        d, i = faiss.knn(xq, block, min(k, block.shape[0]))
+        best_d = np.hstack([best_d, d])
+        best_i = np.hstack([best_i, i + start])
+        order = np.argsort(best_d, axis=1, kind="stable")[:, :k]
+        best_d = np.take_along_axis(best_d, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+    exact_ids = best_i
+    exact_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    _, approx_ids = index.search(xq, k, params=make_search_params(index))
+    approx_ms = (time.perf_counter() - t0) * 1000
+
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx_ids.tolist(), exact_ids.tolist()))
+
+    return {
+        "index": type(faiss.downcast_index(index)).__name__,
+        "memory_mb": index.ntotal * bytes_per_vector(xb.shape[1], _encoding_of(index)) / (1024 * 1024),
+        "k": k,
+        "queries": n_queries,
+        "recall": hits / float(n_queries * k),
+        "exact_ms_per_query": exact_ms / n_queries,
+        "index_ms_per_query": approx_ms / n_queries,
+    }
+
+
+def _encoding_of(index: faiss.Index) -> str:
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "none"
+
+
+def format_recall_report(report: Dict[str, Any]) -> str:
+    return (
+        f"[{report['index']}, ~{report['memory_mb']:.1f} MB] "
+        f"recall@{report['k']} = {report['recall']:.3f} "
+        f"over {report['queries']} queries | "
+        f"{report['index_ms_per_query']:.3f} ms/query vs exact {report['exact_ms_per_query']:.3f} ms/query"
+    )
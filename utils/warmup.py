@@ -0,0 +1,69 @@
+# utils/warmup.py
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+# ------------------------
+# BACKGROUND WARM-UP (once per process)
+# ------------------------
+_warmup_lock = threading.Lock()
+# {"state": "running" | "done", "seconds": {step: s}, "skipped": {step: reason}}
+_warmup_state: Dict[str, Any] = {}
+
+
+def _step(name: str, fn: Callable[[], Any]) -> None:
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # nothing to warm (e.g. no index yet) or a real error the first query will report
+        _warmup_state["skipped"][name] = str(e)
+    _warmup_state["seconds"][name] = time.perf_counter() - t0
+
+
+def _warm() -> None:
+    # imported here so starting the thread costs nothing on the caller's side
+    from models.embeddings import embed_array
+    from models.llm import get_chat_model
+    from utils.context_assembler import count_tokens
+    from utils.collection import list_collections
+    from utils.retriever import get_index_and_meta
+
+    def load_indexes():
+        names = list_collections()
+        if not names:
+            raise FileNotFoundError("FAISS index missing. Build index first.")
+        for name in names:
+            get_index_and_meta(name)
+
+    t0 = time.perf_counter()
+    _step("index", load_indexes)
+    # model load + one dummy encode, so the first real query skips the one-off inference setup
+    _step("embedding_model", lambda: embed_array(["warm-up"]))
+    _step("tokenizer", lambda: count_tokens("warm-up"))
+    _step("llm_client", get_chat_model)
+    _warmup_state["seconds"]["total"] = time.perf_counter() - t0
+    _warmup_state["state"] = "done"
+
+
+def start_warmup() -> bool:
+    """
+    Load the index, embedding model and tokenizer in a daemon thread while the
+    UI renders. Later calls are no-ops; returns True if this call started it.
+    Queries arriving meanwhile simply wait on the same singleton locks.
+    """
+    with _warmup_lock:
+        if _warmup_state:
+            return False
+        _warmup_state.update(state="running", seconds={}, skipped={})
+    threading.Thread(target=_warm, name="warmup", daemon=True).start()
+    return True
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    return {
+        "state": _warmup_state.get("state", "not started"),
+        "seconds": dict(_warmup_state.get("seconds", {})),
+        "skipped": dict(_warmup_state.get("skipped", {})),
+    }